@@ -0,0 +1,65 @@
+"""Fan-out of commands to many devices: threads vs a single event loop
+
+Usage:
+    python -m benchmarks.async_fanout
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, process_time
+
+from loguru import logger
+
+from src.fake_device import LoopbackDevices
+from src.connectors import AsyncBaseConnection
+
+COMMAND = "system identity print"
+
+
+def run_threaded(connections: list, commands: int) -> int:
+    def session(connection):
+        for _ in range(commands):
+            connection.send_command(COMMAND)
+
+    with ThreadPoolExecutor(len(connections)) as executor:
+        list(executor.map(session, connections))
+        return threading.active_count()
+
+
+def run_async(connections: list, commands: int) -> int:
+    async def session(connection):
+        for _ in range(commands):
+            await connection.send_command(COMMAND)
+
+    async def fan_out():
+        await asyncio.gather(*(session(AsyncBaseConnection(connection)) for connection in connections))
+        return threading.active_count()
+
+    return asyncio.run(fan_out())
+
+
+def measure(devices: LoopbackDevices, run, sessions: int, commands: int):
+    connections = [devices.connect() for _ in range(sessions)]
+    start_wall, start_cpu = perf_counter(), process_time()
+    threads = run(connections, commands)
+    wall, cpu = perf_counter() - start_wall, process_time() - start_cpu
+    for connection in connections:
+        connection.close_connection()
+    return wall, cpu, threads
+
+
+def main():
+    logger.disable("")
+    devices = LoopbackDevices(latency=0.02)
+    commands = 5
+    print(f"{'sessions':>8} {'mode':>8} {'wall s':>8} {'cpu s':>8} {'cmd/s':>8} {'threads':>8}")
+    for sessions in (10, 100, 300):
+        for mode, run in (("threads", run_threaded), ("asyncio", run_async)):
+            wall, cpu, threads = measure(devices, run, sessions, commands)
+            rate = sessions * commands / wall
+            print(f"{sessions:>8} {mode:>8} {wall:>8.2f} {cpu:>8.2f} {rate:>8.0f} {threads:>8}")
+    devices.stop()
+
+
+if __name__ == "__main__":
+    main()
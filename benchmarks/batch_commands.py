@@ -0,0 +1,37 @@
+"""Batch of configuration commands: one by one vs pipelined
+
+Usage:
+    python -m benchmarks.batch_commands
+"""
+from time import perf_counter
+
+from loguru import logger
+
+from src.fake_device import LoopbackDevices
+
+COMMANDS = [f"ip address add address=10.0.{index // 256}.{index % 256}/32 interface=lo" for index in range(200)]
+
+
+def main():
+    logger.disable("")
+    latency = 0.02
+    devices = LoopbackDevices(latency=latency, responses=dict.fromkeys(COMMANDS, ""))
+    connection = devices.connect()
+
+    print(f"{len(COMMANDS)} commands, round trip {latency * 1000:.0f} ms")
+    start = perf_counter()
+    for command in COMMANDS:
+        connection.send_command(command)
+    print(f"{'one by one':>16}: {perf_counter() - start:6.2f} s")
+
+    for depth in (4, 16, 64):
+        start = perf_counter()
+        connection.send_commands(COMMANDS, pipeline_depth=depth)
+        print(f"{f'pipelined x{depth}':>16}: {perf_counter() - start:6.2f} s")
+
+    connection.close_connection()
+    devices.stop()
+
+
+if __name__ == "__main__":
+    main()
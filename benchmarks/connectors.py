@@ -0,0 +1,114 @@
+"""Connector benchmark suite against the local fake devices
+
+Reports per connection kind: connect time, commands/s, p50/p99 latency of a
+command, pipelined commands/s and bytes/s on a large output. For SSH also
+the time of the transparent reconnect once the server dropped the session
+and of a restart with the full validation. Runs
+offline.
+
+Usage:
+    python -m benchmarks.connectors [--commands 200] [--latency 0.005] [--json reports/bench.json]
+"""
+import json
+import logging
+from argparse import ArgumentParser
+from collections.abc import Callable
+from statistics import mean, quantiles
+from time import perf_counter
+
+from loguru import logger
+
+from src.connectors import BaseConnection, SerialConnection, SSHConnection, SSHMode
+from src.fake_device import FakeSerialDevice, FakeSSHServer
+
+COMMAND = "system identity print"
+LARGE_OUTPUT_COMMAND = "export"
+
+
+def timed(function: Callable, *args) -> float:
+    start = perf_counter()
+    function(*args)
+    return perf_counter() - start
+
+
+def benchmark_connection(
+    connect: Callable[[], BaseConnection], commands: int, connects: int, pipelined: bool = True,
+    drop_sessions: Callable[[], None] | None = None
+) -> dict[str, float]:
+    """Runs the benchmark on the connections created by `connect`"""
+    connect_times = []
+    for _ in range(connects):
+        BaseConnection.clear_validation_cache()  # every connect validates the device fully
+        connection = connect()
+        connect_times.append(timed(connection.open_connection))
+        connection.close_connection()
+
+    connection = connect()
+    connection.open_connection()
+    latencies = [timed(connection.send_command, COMMAND) for _ in range(commands)]
+    results = {
+        "connect_s": mean(connect_times),
+        "commands_per_s": commands / sum(latencies),
+        "p50_ms": quantiles(latencies, n=100)[49] * 1000,
+        "p99_ms": quantiles(latencies, n=100)[98] * 1000,
+    }
+    if pipelined:
+        results["pipelined_commands_per_s"] = commands / timed(connection.send_commands, [COMMAND] * commands)
+
+    start = perf_counter()
+    size = len(connection.send_command(LARGE_OUTPUT_COMMAND, timeout=120))
+    results["large_output_mb_per_s"] = size / (perf_counter() - start) / 1e6
+
+    if drop_sessions is not None:
+        drop_sessions()
+        connection.send_command(COMMAND)
+        results["reconnect_s"] = connection.reconnect_times[-1]
+        BaseConnection.clear_validation_cache()
+        results["restart_full_validation_s"] = timed(connection.restart_connection)
+
+    connection.close_connection()
+    return results
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=200, help="Commands per latency run")
+    parser.add_argument("--connects", type=int, default=5, help="Connections per connect time run")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake device latency in seconds")
+    parser.add_argument("--output-size", type=int, default=8 * 1024 * 1024, help="Large output size in bytes")
+    parser.add_argument("--json", help="Path to save the results to")
+    args = parser.parse_args()
+
+    logger.disable("")
+    logging.getLogger("paramiko").setLevel(logging.WARNING)
+
+    results = {}
+    with FakeSSHServer(latency=args.latency, output_size=args.output_size) as server:
+        results["ssh_shell"] = benchmark_connection(
+            lambda: SSHConnection(server.host, server.username, server.password, server.port),
+            args.commands, args.connects, drop_sessions=server.drop_sessions
+        )
+        results["ssh_exec"] = benchmark_connection(
+            lambda: SSHConnection(server.host, server.username, server.password, server.port, mode=SSHMode.EXEC),
+            args.commands, args.connects, drop_sessions=server.drop_sessions
+        )
+
+    # The serial console login waits for quiet periods, keep the run short
+    with FakeSerialDevice(latency=args.latency, bandwidth=None, output_size=args.output_size) as device:
+        results["serial_pty"] = benchmark_connection(
+            lambda: SerialConnection(device.port, device.username, device.password),
+            args.commands, connects=1
+        )
+
+    metrics = list(next(iter(results.values())))
+    print(f"{'connection':<12}" + "".join(f"{metric:>26}" for metric in metrics))
+    for name, values in results.items():
+        print(f"{name:<12}" + "".join(f"{values.get(metric, float('nan')):>26.3f}" for metric in metrics))
+
+    if args.json:
+        with open(args.json, "w") as fobj:
+            json.dump(results, fobj, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""SFTP file transfer benchmark against the in-process fake SSH server
+
+Reports the MB/s of uploads and downloads done one request at a time, as
+a plain SFTP client loop does, and with `FileTransfer` (pipelined writes,
+prefetched reads). The link latency of the fake server stands for the
+round trip to the device. The fleet run uploads to several servers at once,
+with and without a bandwidth cap. Runs offline.
+
+Usage:
+    python -m benchmarks.file_transfer [--size-mb 16] [--latency 0.005] [--devices 4] [--json reports/transfer.json]
+"""
+import json
+import logging
+import os
+from argparse import ArgumentParser
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter
+
+from loguru import logger
+
+from src.connectors import FileTransfer, RateLimiter, SSHConnection
+from src.connectors.file_transfer import CHUNK_SIZE
+from src.fake_device import FakeSSHServer
+
+MB = 1024 * 1024
+
+
+def throughput(size: int, transfer: Callable[[], object]) -> float:
+    """Runs the transfer and returns its MB/s"""
+    start = perf_counter()
+    transfer()
+    return size / MB / (perf_counter() - start)
+
+
+def sequential_upload(connection: SSHConnection, local_path: Path, remote_path: str):
+    """Waits for the acknowledgement of every write"""
+    with open(local_path, "rb") as source, connection.sftp.open(remote_path, "wb") as target:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+            target.write(chunk)
+
+
+def sequential_download(connection: SSHConnection, remote_path: str, local_path: Path):
+    """Waits for the response of every read"""
+    with connection.sftp.open(remote_path, "rb") as source, open(local_path, "wb") as target:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+            target.write(chunk)
+
+
+def connect(server: FakeSSHServer) -> SSHConnection:
+    connection = SSHConnection(server.host, server.username, server.password, server.port)
+    connection.open_connection()
+    return connection
+
+
+def benchmark_single(size: int, latency: float, local_path: Path) -> dict[str, float]:
+    with FakeSSHServer(link_latency=latency) as server:
+        connection = connect(server)
+        transfer = FileTransfer(connection)
+        results = {
+            "sequential_upload_mb_s": throughput(size, lambda: sequential_upload(connection, local_path, "seq.bin")),
+            "sequential_download_mb_s": throughput(
+                size, lambda: sequential_download(connection, "seq.bin", local_path.with_suffix(".seq"))
+            ),
+            "upload_mb_s": throughput(size, lambda: transfer.upload(local_path, "fw.bin", verify=False)),
+            "verified_upload_mb_s": throughput(size, lambda: transfer.upload(local_path, "fw.bin")),
+            "download_mb_s": throughput(size, lambda: transfer.download("fw.bin", local_path.with_suffix(".dl"))),
+        }
+        connection.close_connection()
+    return results
+
+
+def benchmark_fleet(size: int, latency: float, devices: int, bandwidth: float | None, local_path: Path) -> float:
+    """Uploads to all the devices at once, returns the combined MB/s"""
+    servers = [FakeSSHServer(link_latency=latency) for _ in range(devices)]
+    for server in servers:
+        server.start()
+    connections = [connect(server) for server in servers]
+    rate_limiter = None if bandwidth is None else RateLimiter(bandwidth)
+    threads = [
+        Thread(target=FileTransfer(connection, rate_limiter).upload, args=(local_path,), kwargs={"verify": False})
+        for connection in connections
+    ]
+
+    def upload_all():
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    result = throughput(size * devices, upload_all)
+    for connection, server in zip(connections, servers):
+        connection.close_connection()
+        server.stop()
+    return result
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=16, help="File size in MB")
+    parser.add_argument("--latency", type=float, default=0.005, help="Link latency of the fake server in seconds")
+    parser.add_argument("--devices", type=int, default=4, help="Devices of the fleet run")
+    parser.add_argument("--bandwidth-mb", type=float, default=8.0, help="Bandwidth cap of the fleet run in MB/s")
+    parser.add_argument("--json", help="Path to save the results to")
+    args = parser.parse_args()
+
+    logger.disable("")
+    logging.getLogger("paramiko").setLevel(logging.WARNING)
+
+    size = args.size_mb * MB
+    with TemporaryDirectory() as directory:
+        local_path = Path(directory) / "fw.bin"
+        local_path.write_bytes(os.urandom(size))
+        results = benchmark_single(size, args.latency, local_path)
+        results["fleet_upload_mb_s"] = benchmark_fleet(size, args.latency, args.devices, None, local_path)
+        results["fleet_capped_upload_mb_s"] = benchmark_fleet(
+            size, args.latency, args.devices, args.bandwidth_mb * MB, local_path
+        )
+
+    print(f"{args.size_mb} MB, {args.latency * 1000:.1f} ms link latency, {args.devices} devices in the fleet")
+    for name, value in results.items():
+        print(f"{name:<28}{value:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w") as fobj:
+            json.dump(results, fobj, indent=2)
+
+
+if __name__ == "__main__":
+    main()
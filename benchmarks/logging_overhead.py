@@ -0,0 +1,88 @@
+"""Logging overhead per command
+
+Runs the same commands against a loopback device with the logging off, on
+INFO and DEBUG, written directly or enqueued, and reports the time each
+setting adds to a command. Also compares the eager f-string formatting of a
+disabled DEBUG message with the deferred formatting.
+
+Usage:
+    python -m benchmarks.logging_overhead [--commands 2000] [--output-size 4096]
+"""
+import os
+from argparse import ArgumentParser
+from time import perf_counter
+
+from loguru import logger
+
+from config.loggers import DEFAULT_LOG_FORMAT, configure_loggers, stdout_logger
+from src.fake_device import LoopbackDevices
+
+COMMAND = "system resource print"
+
+
+def time_commands(connection, commands: int) -> float:
+    start = perf_counter()
+    for _ in range(commands):
+        connection.send_command(COMMAND)
+    return (perf_counter() - start) / commands
+
+
+def log_to_null(level: str | None, enqueue: bool = False):
+    """Writes the logs of the level to /dev/null, disables them if not set"""
+    logger.remove()
+    if level is None:
+        logger.disable("")
+        return
+    logger.enable("")
+    logger.add(open(os.devnull, "w"), level=level, format=DEFAULT_LOG_FORMAT, enqueue=enqueue)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=2000, help="Commands per setting")
+    parser.add_argument("--output-size", type=int, default=4096, help="Response size in bytes")
+    args = parser.parse_args()
+
+    configure_loggers()  # the benchmark replaces the configured sinks
+    response = "x" * args.output_size
+    devices = LoopbackDevices(responses={COMMAND: response})
+    connection = devices.connect()
+
+    settings = {
+        "off": (None, False),
+        "INFO": ("INFO", False),
+        "INFO enqueued": ("INFO", True),
+        "DEBUG": ("DEBUG", False),
+        "DEBUG enqueued": ("DEBUG", True),
+    }
+    results = {}
+    for name, (level, enqueue) in settings.items():
+        log_to_null(level, enqueue)
+        time_commands(connection, 100)  # warm up
+        results[name] = time_commands(connection, args.commands)
+        logger.complete()
+
+    print(f"{args.commands} commands, {args.output_size} byte responses")
+    for name, seconds in results.items():
+        overhead = (seconds - results["off"]) * 1e6
+        print(f"{name:>16}: {seconds * 1e6:8.1f} us/command, logging {overhead:+8.1f} us")
+
+    log_to_null("INFO")
+    data = response * 16
+    start = perf_counter()
+    for _ in range(args.commands):
+        stdout_logger.debug(f"Raw response: <{data}>")
+    eager = (perf_counter() - start) / args.commands
+    start = perf_counter()
+    for _ in range(args.commands):
+        stdout_logger.debug("Raw response: <{}>", data)
+    deferred = (perf_counter() - start) / args.commands
+    print(f"disabled DEBUG of {len(data)} bytes: f-string {eager * 1e6:.2f} us, deferred {deferred * 1e6:.2f} us")
+
+    logger.remove()
+    connection.close_connection()
+    devices.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Print output parsing time
+
+Generates a routing table, terse ARP entries and as-value DHCP leases with
+the given number of rows and reports the parsing time of each layout, also
+with the command sent to a loopback device.
+
+Usage:
+    python -m benchmarks.print_parser [--rows 50000] [--repeat 5]
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+
+from loguru import logger
+
+from config.loggers import configure_loggers
+from src.device_lib.command_tree import compile_commands
+from src.device_lib.device_lib import Command
+from src.device_lib.print_parser import parse_print
+from src.fake_device import LoopbackDevices
+
+
+def routing_table(rows: int) -> str:
+    width = len(str(rows))
+    lines = [
+        "Flags: D - DYNAMIC; A - ACTIVE; c - CONNECT, s - STATIC, b - BGP",
+        "Columns: DST-ADDRESS, GATEWAY, ROUTING-TABLE, DISTANCE",
+        f"{'#':<{width + 5}}DST-ADDRESS       GATEWAY        ROUTING-TABLE  DISTANCE",
+    ]
+    for row in range(rows):
+        address = f"10.{row >> 16 & 255}.{row >> 8 & 255}.{row & 255}/32"
+        lines.append(f"{row:<{width}} DAb {address:<17} 192.168.0.1    main                 20")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def arp_terse(rows: int) -> str:
+    lines = ["Flags: X - disabled, I - invalid, H - DHCP, D - dynamic, P - published, C - complete"]
+    for row in range(rows):
+        lines.append(
+            f"{row:>2} DC address=10.{row >> 8 & 255}.{row & 255}.1 mac-address=48:8F:5A:{row >> 8 & 255:02X}:"
+            f"{row & 255:02X}:01 interface=bridge published=no"
+        )
+    return "\r\n".join(lines) + "\r\n"
+
+
+def leases_as_value(rows: int) -> str:
+    return ";".join(
+        f".id=*{row:x};address=10.1.{row >> 8 & 255}.{row & 255};mac-address=48:8F:5A:00:{row & 255:02X}:01;"
+        f"status=bound;host-name=host {row}"
+        for row in range(rows)
+    ) + "\r\n"
+
+
+def time_parse(text: str, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        records = parse_print(text)
+        best = min(best, perf_counter() - start)
+    return best, len(records)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000, help="Rows of each output")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per layout, the best one is reported")
+    args = parser.parse_args()
+
+    outputs = {
+        "table (ip route print)": routing_table(args.rows),
+        "terse (ip arp print terse)": arp_terse(args.rows),
+        "as-value (dhcp-server lease)": leases_as_value(args.rows),
+    }
+    for name, text in outputs.items():
+        seconds, records = time_parse(text, args.repeat)
+        print(f"{name:>30}: {records} records of {len(text) / 1e6:.1f} MB in {seconds * 1e3:7.1f} ms, "
+              f"{seconds / records * 1e6:.2f} us/record")
+
+    configure_loggers()
+    logger.remove()  # the response is not written to the console
+    devices = LoopbackDevices(responses={"ip route print": outputs["table (ip route print)"]})
+    connection = devices.connect()
+    command = Command(compile_commands({"ip": {"route": {"print": None}}}), connection).ip.route.print
+    start = perf_counter()
+    response = command()
+    received = perf_counter() - start
+    start = perf_counter()
+    parse_print(response)
+    parsed = perf_counter() - start
+    print(f"{'loopback ip route print':>30}: received in {received * 1e3:7.1f} ms, parsed in {parsed * 1e3:7.1f} ms")
+    connection.close_connection()
+    devices.stop()
+
+
+if __name__ == "__main__":
+    main()
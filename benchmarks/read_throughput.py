@@ -0,0 +1,100 @@
+"""Throughput of the shell read functions on large outputs
+
+Compares the legacy byte by byte reader with the buffered reader of
+`BaseConnection` on synthetic RouterOS `print` output served from memory.
+
+Usage:
+    python -m benchmarks.read_throughput
+"""
+import re
+from time import perf_counter
+
+from src.connectors.base_connection import BaseConnection
+
+PROMPT = b"[admin@MikroTik] > "
+LINE = b" 0   ;;; uplink\r\n     chain=forward action=accept protocol=tcp dst-port=443 \r\n"
+
+
+class MemoryConnection(BaseConnection):
+    """Connection serving a fixed payload in chunks, as a device would"""
+
+    def __init__(self, payload: bytes, chunk_size: int = 4096):
+        super().__init__()
+        self.prompt = self.SHELL_PROMPT
+        self.payload = payload
+        self.chunk_size = chunk_size
+        self.position = 0
+
+    def open_connection(self):
+        pass
+
+    def close_connection(self):
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+    def output_available(self) -> bool:
+        return self.position < len(self.payload)
+
+    def get_read_timeout(self) -> float:
+        return 0
+
+    def set_read_timeout(self, timeout: float):
+        pass
+
+    def write(self, data: str):
+        pass
+
+    def read(self, count: int = 1) -> bytes:
+        count = min(count, self.chunk_size)
+        data = self.payload[self.position:self.position + count]
+        self.position += len(data)
+        return data
+
+    def _wait_for_shutdown(self, deadline: float):
+        pass
+
+    def _wait_for_boot(self, deadline: float):
+        pass
+
+
+def legacy_read_until_regexp(connection: BaseConnection, expected: str) -> str:
+    """The reader used before the receive buffer was introduced"""
+    regexp = re.compile(expected)
+    output = b""
+    while True:
+        output += connection.read(1)
+        try:
+            if regexp.search(output.decode()):
+                return output.decode()
+        except UnicodeDecodeError:
+            pass
+
+
+def make_payload(size: int) -> bytes:
+    return LINE * (size // len(LINE)) + PROMPT
+
+
+def measure(read, size: int) -> float:
+    """Returns the throughput in MB/s"""
+    connection = MemoryConnection(make_payload(size))
+    start = perf_counter()
+    read(connection)
+    elapsed = perf_counter() - start
+    return size / elapsed / 1e6
+
+
+def main():
+    print(f"{'size':>10} {'legacy MB/s':>12} {'buffered MB/s':>14}")
+    for size in (16 * 1024, 64 * 1024, 2 * 1024 * 1024, 16 * 1024 * 1024):
+        # The legacy reader is quadratic, anything bigger takes minutes
+        legacy = "-"
+        if size <= 64 * 1024:
+            legacy = f"{measure(lambda conn: legacy_read_until_regexp(conn, conn.prompt), size):.3f}"
+        buffered = measure(lambda conn: conn.read_until_prompt(timeout=60), size)
+        print(f"{size:>10} {legacy:>12} {buffered:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
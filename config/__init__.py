@@ -1,3 +1,4 @@
 from config.device_secrets import DeviceSecrets
-from config.loggers import stderr_logger, stdout_logger
+from config.loggers import set_paramiko_log_level, stderr_logger, stdout_logger
 from config.paths import FrameworkPaths
+from config.yaml_cache import load_yaml
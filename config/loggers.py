@@ -1,9 +1,10 @@
+import logging
+import os
 from collections.abc import Callable
 from enum import Enum
+from functools import cache
 from sys import stderr, stdout
 
-from loguru import logger
-
 
 class LoggerName(Enum):
     STDOUT = "stdout"
@@ -32,25 +33,70 @@ def create_filter(name: LoggerName) -> Callable[[dict], bool]:
 DEFAULT_LOG_FORMAT = "{time} {level: <8} | {message}"
 DEFAULT_LOG_LEVEL = LogLevel.INFO
 
-# 2 loggers that can be used in tests. This will allow to create 3 separate
-# categories in allure report (one is general logger by default)
-logger.configure(
-    handlers=[
-        {
-            "sink": stdout,
-            "level": DEFAULT_LOG_LEVEL.value,
-            "format": DEFAULT_LOG_FORMAT,
-            "filter": create_filter(LoggerName.STDOUT)
-        },
-        {
-            "sink": stderr,
-            "level": DEFAULT_LOG_LEVEL.value,
-            "format": DEFAULT_LOG_FORMAT,
-            "filter": create_filter(LoggerName.STDERR)
-        }
-    ]
-)
-
-
-stdout_logger = logger.bind(name=LoggerName.STDOUT)
-stderr_logger = logger.bind(name=LoggerName.STDERR)
+LOG_LEVEL = LogLevel(os.getenv("FRAMEWORK_LOG_LEVEL", DEFAULT_LOG_LEVEL.value).upper())
+# Messages are written by a background thread, logging doesn't block on the sinks
+LOG_ENQUEUE = os.getenv("FRAMEWORK_LOG_ENQUEUE", "0").lower() in ("1", "true", "yes")
+# paramiko logs every packet on DEBUG
+PARAMIKO_LOG_LEVEL = LogLevel(os.getenv("FRAMEWORK_PARAMIKO_LOG_LEVEL", LogLevel.WARNING.value).upper())
+
+
+@cache
+def configure_loggers():
+    """Imports and configures loguru, once on the first log message
+    :return:
+        - logger: The configured loguru logger
+    """
+    from loguru import logger
+
+    # 2 loggers that can be used in tests. This will allow to create 3 separate
+    # categories in allure report (one is general logger by default)
+    logger.configure(
+        handlers=[
+            {
+                "sink": stdout,
+                "level": LOG_LEVEL.value,
+                "format": DEFAULT_LOG_FORMAT,
+                "filter": create_filter(LoggerName.STDOUT),
+                "enqueue": LOG_ENQUEUE
+            },
+            {
+                "sink": stderr,
+                "level": LOG_LEVEL.value,
+                "format": DEFAULT_LOG_FORMAT,
+                "filter": create_filter(LoggerName.STDERR),
+                "enqueue": LOG_ENQUEUE
+            }
+        ]
+    )
+    return logger
+
+
+def set_paramiko_log_level(level: LogLevel = PARAMIKO_LOG_LEVEL):
+    """Sets the level of the paramiko logs printed to stderr
+    :param level: The log level, `FRAMEWORK_PARAMIKO_LOG_LEVEL` by default
+    """
+    if not logging.getLogger().handlers:
+        logging.basicConfig()
+    level = {LogLevel.TRACE: LogLevel.DEBUG, LogLevel.SUCCESS: LogLevel.INFO}.get(level, level)
+    logging.getLogger("paramiko").setLevel(level.value)
+
+
+class LazyLogger:
+    """Logger bound to `name` which configures loguru on the first use, so
+    importing the framework doesn't pay for it
+    """
+
+    __slots__ = ("_name", "_logger")
+
+    def __init__(self, name: LoggerName):
+        self._name = name
+        self._logger = None
+
+    def __getattr__(self, attribute: str):
+        if self._logger is None:
+            self._logger = configure_loggers().bind(name=self._name)
+        return getattr(self._logger, attribute)
+
+
+stdout_logger = LazyLogger(LoggerName.STDOUT)
+stderr_logger = LazyLogger(LoggerName.STDERR)
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from tempfile import gettempdir
 
 
 class FrameworkPaths:
@@ -7,6 +8,9 @@ class FrameworkPaths:
     CONFIG_DIR = FRAMEWORK_ROOT / "config"
     RESOURCES_DIR = FRAMEWORK_ROOT / "resources"
     REPORTS_DIR = FRAMEWORK_ROOT / "reports"
+    CACHE_DIR = Path(os.getenv("FRAMEWORK_CACHE_DIR", REPORTS_DIR / ".cache"))
+    # shared by all the framework processes of the host, like the devices
+    LOCK_DIR = Path(os.getenv("FRAMEWORK_LOCK_DIR", Path(gettempdir()) / "framework_device_locks"))
 
     DEVICES_YAML = RESOURCES_DIR / "devices.yaml"
     COMMANDS_YAML = RESOURCES_DIR / "console_commands.yaml"
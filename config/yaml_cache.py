@@ -0,0 +1,93 @@
+"""Cache of the parsed yaml resources
+
+Parsing the large inventory and command yaml files is slow, so the parsed
+data is pickled under `FrameworkPaths.CACHE_DIR` and reused while the file
+is unchanged. The cache is checked by the file mtime and size first and by
+the hash of the content if they differ, e.g. after a git checkout.
+"""
+import os
+import pickle
+from hashlib import blake2b
+from pathlib import Path
+from tempfile import mkstemp
+from typing import Any
+
+from config.loggers import stdout_logger
+from config.paths import FrameworkPaths
+
+CACHE_VERSION = 1
+
+
+def load_yaml(path: Path, cache_dir: Path | None = None, use_cache: bool = True) -> Any:
+    """Loads the yaml file through the parse cache
+    :param path: The path of the yaml file
+    :param cache_dir: The directory of the cache files,
+        `FrameworkPaths.CACHE_DIR` if not set
+    :param use_cache: Parse the file every time if disabled
+    :return:
+        - data: The parsed yaml
+    """
+    path = Path(path).resolve()
+    if not use_cache:
+        return parse_yaml(path.read_bytes())
+
+    cache_dir = FrameworkPaths.CACHE_DIR if cache_dir is None else cache_dir
+
+    cache_path = cache_dir / f"{path.stem}-{blake2b(str(path).encode(), digest_size=8).hexdigest()}.pickle"
+    stat = path.stat()
+    entry = _read_entry(cache_path)
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        return entry[3]
+
+    content = path.read_bytes()
+    digest = blake2b(content).hexdigest()
+    data = entry[3] if entry is not None and entry[2] == digest else parse_yaml(content)
+    _write_entry(cache_path, (stat.st_mtime_ns, stat.st_size, digest, data))
+    return data
+
+
+def parse_yaml(content: bytes) -> Any:
+    """Parses the yaml with libyaml if available
+    :param content: The yaml document
+    :return:
+        - data: The parsed yaml
+    """
+    import yaml
+
+    return yaml.load(content, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def _read_entry(cache_path: Path) -> tuple[int, int, str, Any] | None:
+    """Reads the (mtime, size, digest, data) entry of the cache file
+    :return:
+        - entry: The entry or None if the file is missing or broken
+    """
+    try:
+        with cache_path.open("rb") as fobj:
+            version, entry = pickle.load(fobj)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError, EOFError, pickle.UnpicklingError) as error:
+        stdout_logger.debug("Ignoring the broken yaml cache {}: {}", cache_path, error)
+        return None
+    return entry if version == CACHE_VERSION else None
+
+
+def _write_entry(cache_path: Path, entry: tuple[int, int, str, Any]):
+    """Writes the entry to a temporary file renamed over the cache file, so
+    concurrent workers never read a partially written cache
+    """
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporary_path = mkstemp(dir=cache_path.parent, prefix=f".{cache_path.name}.")
+    except OSError as error:
+        stdout_logger.debug("Failed to write the yaml cache {}: {}", cache_path, error)
+        return
+
+    try:
+        with os.fdopen(fd, "wb") as fobj:
+            pickle.dump((CACHE_VERSION, entry), fobj, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+    except OSError as error:
+        stdout_logger.debug("Failed to write the yaml cache {}: {}", cache_path, error)
+        Path(temporary_path).unlink(missing_ok=True)
@@ -1,11 +1,62 @@
+"""Connections to the devices
+
+The connection classes pulling in paramiko and pyserial are imported on the
+first access, e.g. `from src.connectors import SSHConnection` or
+`ConnectionType.SSH.connection_class()`.
+"""
 from enum import Enum
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-from src.connectors.base_connection import BaseConnection
+from src.connectors.base_connection import BaseConnection, SyncMode, Validation
+from src.connectors.captured_output import CapturedOutput
+from src.connectors.connection_pool import ConnectionPool, PoolStats
 from src.connectors.exceptions import NoSuchConnectionTypeError
-from src.connectors.serial_connection import SerialConnection
-from src.connectors.ssh_connection import SSHConnection
+from src.connectors.file_transfer import FileTransfer, RateLimiter, TransferResult
+from src.connectors.metrics import METRICS, MetricsRegistry
+from src.connectors.reboot import RebootReport
+
+if TYPE_CHECKING:
+    from src.connectors.async_connection import (
+        AsyncBaseConnection,
+        AsyncSerialConnection,
+        AsyncSSHConnection
+    )
+    from src.connectors.serial_connection import SerialConnection
+    from src.connectors.ssh_connection import SSHConnection, SSHMode
+
+_LAZY_ATTRIBUTES = {
+    "AsyncBaseConnection": "src.connectors.async_connection",
+    "AsyncSerialConnection": "src.connectors.async_connection",
+    "AsyncSSHConnection": "src.connectors.async_connection",
+    "SerialConnection": "src.connectors.serial_connection",
+    "SSHConnection": "src.connectors.ssh_connection",
+    "SSHMode": "src.connectors.ssh_connection",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_LAZY_ATTRIBUTES})
 
 
 class ConnectionType(Enum):
     SSH = "ssh"
     SERIAL = "serial"
+
+    def connection_class(self, asynchronous: bool = False) -> type:
+        """Imports the connection class of the type
+        :param asynchronous: Whether to get the asyncio counterpart
+        :return:
+            - connection_class: The connection class
+        """
+        name = {ConnectionType.SSH: "SSHConnection", ConnectionType.SERIAL: "SerialConnection"}[self]
+        return __getattr__(f"Async{name}" if asynchronous else name)
@@ -0,0 +1,182 @@
+"""Asyncio connection libraries
+
+The blocking connections do the connection specific reads and writes, while
+waiting for the output is done by the event loop watching their file
+descriptors. Hundreds of sessions can wait for responses in a single loop.
+The exchanges are the steps of `BaseConnection`, see `Steps`, driven by the
+loop instead of blocking calls.
+Opening and closing the connection (handshake, login) run in the default
+executor.
+"""
+import asyncio
+from collections.abc import Callable
+from typing import TypeVar
+
+from config import stdout_logger
+from src.connectors.base_connection import BaseConnection, Steps, SyncMode
+from src.connectors.serial_connection import SerialConnection
+from src.connectors.ssh_connection import SSHConnection
+
+T = TypeVar("T")
+
+
+class AsyncBaseConnection:
+    """Asyncio counterpart of `BaseConnection` wrapping a blocking connection"""
+
+    def __init__(self, connection: BaseConnection):
+        self.connection = connection
+        self.lock = asyncio.Lock()
+
+    async def open_connection(self):
+        """Opens the connection"""
+        await self._run_blocking(self.connection.open_connection)
+
+    async def close_connection(self):
+        """Closes the connection"""
+        await self._run_blocking(self.connection.close_connection)
+
+    def is_connected(self) -> bool:
+        """Checks the connection status"""
+        return self.connection.is_connected()
+
+    async def write(self, data: str):
+        """Writes the data to the shell
+        :param data: Data to write to the shell
+        """
+        await self._run_blocking(self.connection.write, data)
+
+    async def writeln(self, data: str = ""):
+        """Writes the data to the shell with a newline
+        :param data: Data to write to the shell
+        """
+        await self._run_steps(self.connection._writeln_steps(data))
+
+    async def send_command(
+        self, command: str, timeout: float = 15, strip: bool = True, sync_mode: SyncMode | None = None
+    ) -> str:
+        """Sends a command and waits for the response within the desired
+        timeout. See `BaseConnection.send_command`
+        :param command: The string command
+        :param timeout: The timeout before the prompt is read
+        :param sync_mode: The way to find the end of the response
+        :return:
+            - response: The returned output
+        """
+        sync_mode = sync_mode or self.connection.sync_mode
+        async with self.lock:
+            stdout_logger.info("=> {}", command)
+            if sync_mode is SyncMode.SENTINEL:
+                response = await self._run_steps(self.connection._sentinel_exchange_steps(command, timeout))
+            else:
+                response = await self._run_steps(self.connection._quiet_period_exchange_steps(command, timeout))
+
+        response = response.strip() if strip else response
+        stdout_logger.info("=< {}", response)
+
+        return response
+
+    async def read_until(self, expected: str, timeout: float = 5) -> str:
+        """Reads the shell until the expected string
+        :param expected: The expected string
+        :param timeout: The timeout
+        :return:
+            - output: The read output
+        :raise:
+            - ReadTimeout: If the expected string is not read in time
+        """
+        return await self._run_steps(self.connection._read_until_steps(expected, timeout))
+
+    async def read_until_prompt(self, timeout: float = 5) -> str:
+        """Reads the shell until the shell prompt
+        :param timeout: The timeout
+        :return:
+            - output: The read output
+        :raise:
+            - ReadTimeout: If the prompt is not read in time
+        """
+        output, _ = await self._run_steps(self.connection._prompt_steps(timeout))
+        return output
+
+    async def clear_output_buffer(self, timeout: float = 0.5):
+        """Clears the output buffer by reading until nothing arrives for
+        `timeout` seconds
+        :param timeout: The timeout
+        """
+        await self._run_steps(self.connection._clear_steps(timeout))
+
+    async def _run_steps(self, steps: Steps[T]) -> T:
+        """Drives the steps of an exchange of the connection on the event
+        loop, see `BaseConnection._run_steps`
+        """
+        reply = None
+        while True:
+            try:
+                step = steps.send(reply)
+            except StopIteration as stop:
+                return stop.value
+            if isinstance(step, str):
+                await self.write(step)
+                reply = None
+            else:
+                reply = await self.wait_for_output(step)
+
+    async def wait_for_output(self, timeout: float) -> bool:
+        """Waits until the connection becomes readable or the timeout passes
+        :param timeout: The timeout in seconds
+        :return:
+            - ready: False if nothing arrived within the timeout
+        """
+        if self.connection.output_available():
+            return True
+
+        fileno = self.connection.fileno()
+        if fileno is None:
+            await asyncio.sleep(min(timeout, self.connection.POLL_INTERVAL))
+            return self.connection.output_available()
+
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(fileno, lambda: ready.done() or ready.set_result(True))
+        try:
+            return await asyncio.wait_for(ready, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            loop.remove_reader(fileno)
+
+    @staticmethod
+    async def _run_blocking(function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+class AsyncSSHConnection(AsyncBaseConnection):
+    """Asyncio library to enable connection to the device through SSH"""
+
+    def __init__(
+        self, ip_address: str, username: str, password: str | None = None,
+        port: int = 22, timeout: float = 10
+    ):
+        super().__init__(SSHConnection(ip_address, username, password, port, timeout))
+
+    async def write(self, data: str):
+        """Writes the data to the shell without blocking the loop, waiting
+        while the channel window is full
+        :param data: Data to write to the shell
+        """
+        shell = self.connection.shell
+        data = data.encode()
+        while data:
+            if shell.send_ready():
+                data = data[shell.send(data):]
+            else:
+                await asyncio.sleep(self.connection.POLL_INTERVAL)
+
+
+class AsyncSerialConnection(AsyncBaseConnection):
+    """Asyncio library to enable connection to the device through serial"""
+
+    def __init__(
+        self, port: int, username: str, password: str | None = None,
+        baudrate: int = 115200, timeout: float = 2
+    ):
+        super().__init__(SerialConnection(port, username, password, baudrate, timeout))
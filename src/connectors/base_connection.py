@@ -1,10 +1,187 @@
+import random
 import re
 from abc import ABC, abstractmethod
-from threading import Lock
-from time import time
+from collections import deque
+from codecs import getincrementaldecoder
+from collections.abc import Callable, Generator, Iterator
+from enum import Enum
+from pathlib import Path
+from selectors import EVENT_READ, DefaultSelector
+from threading import Lock, local
+from time import monotonic, sleep
+from typing import TypeVar
 
 from config import stdout_logger
-from src.connectors.exceptions import ReadTimeoutError
+from src.connectors.captured_output import CapturedOutput
+from src.connectors.exceptions import (
+    ConnectionClosedError,
+    ConnectionTestError,
+    ReadTimeoutError,
+    RebootTimeoutError
+)
+from src.connectors.metrics import METRICS, CommandMetrics, Phase
+from src.connectors.prompt_matcher import PromptMatcher
+from src.connectors.reboot import RebootReport
+from src.connectors.sentinel import SentinelTracker
+
+T = TypeVar("T")
+# The steps of an exchange, shared by the blocking and the asyncio
+# connections: a yielded number is the seconds to wait for output, answered
+# with whether it arrived, a yielded string is the data to write
+Steps = Generator[float | str, bool | None, T]
+
+
+class ReceiveBuffer:
+    """Growable buffer for the data received from the shell
+
+    The read functions pull everything the connection has available in bulk
+    into the buffer and scan only the data that arrived since the previous
+    scan. Bytes past a match stay in the buffer for the next read.
+    """
+
+    MAX_MATCH_LENGTH = 4096
+
+    def __init__(self):
+        self._data = bytearray()
+        self._scanned = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def feed(self, data: bytes):
+        """Appends the received data to the buffer
+        :param data: The data read from the connection
+        """
+        self._data += data
+
+    def find(self, expected: bytes) -> int:
+        """Searches the unscanned data for the expected bytes
+        :param expected: The expected bytes
+        :return:
+            - end: The offset right after the match or -1 if not found
+        """
+        start = max(0, self._scanned - len(expected) + 1)
+        self._scanned = len(self._data)
+        index = self._data.find(expected, start)
+        return -1 if index == -1 else index + len(expected)
+
+    def search(self, regexp: re.Pattern, max_length: int | None = None) -> int:
+        """Searches the unscanned data for the regular expression
+        The search restarts from the beginning of the line holding the first
+        unscanned byte, but at most `max_length` bytes before it, so a long
+        line without line breaks isn't scanned again for every chunk. The
+        matches must stay within one line and be at most `max_length` bytes
+        long, others may be missed.
+        :param regexp: The compiled bytes regular expression
+        :param max_length: The longest match expected in bytes,
+            `MAX_MATCH_LENGTH` if not set
+        :return:
+            - end: The offset right after the match or -1 if not found
+        """
+        max_length = self.MAX_MATCH_LENGTH if max_length is None else max_length
+        window_start = max(0, self._scanned - max_length + 1)
+        start = self._data.rfind(b"\n", window_start, self._scanned) + 1 or window_start
+        self._scanned = len(self._data)
+        match = regexp.search(self._data, start)
+        return -1 if match is None else match.end()
+
+    def unscanned(self) -> bytes:
+        """Returns the data received since the previous scan and marks it
+        as scanned
+        """
+        data = bytes(self._data[self._scanned:])
+        self._scanned = len(self._data)
+        return data
+
+    def consume(self, end: int | None = None) -> bytes:
+        """Removes the data from the beginning of the buffer
+        :param end: The offset to consume up to. Everything if not set
+        :return:
+            - data: The consumed data
+        """
+        end = len(self._data) if end is None else end
+        data = bytes(self._data[:end])
+        del self._data[:end]
+        self._scanned = 0
+        return data
+
+    def clear(self):
+        """Drops all the buffered data"""
+        self._data.clear()
+        self._scanned = 0
+
+
+class OutputSplitter:
+    """Splits the streamed output into decoded lines or chunks
+
+    At most `max_line_length` characters of an incomplete line are held
+    back, a longer line is passed on in parts.
+    """
+
+    def __init__(self, lines: bool = True, max_line_length: int = 65536):
+        """Initializes the splitter
+        :param lines: Whether to split the output into lines without the
+            line endings. The output is passed on as it arrives otherwise
+        :param max_line_length: The maximum length of a held back line
+        """
+        self.lines = lines
+        self.max_line_length = max_line_length
+        self._decoder = getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+
+    def feed(self, data: bytes | str) -> list[str]:
+        """Feeds the received output
+        :param data: The raw or already decoded output
+        :return:
+            - parts: The complete lines or the decoded chunk
+        """
+        text = self._decoder.decode(data) if isinstance(data, bytes) else data
+        if not self.lines:
+            return [text] if text else []
+
+        *lines, self._pending = (self._pending + text).split("\n")
+        lines = [line.rstrip("\r") for line in lines]
+        if len(self._pending) > self.max_line_length:
+            lines.append(self._pending)
+            self._pending = ""
+        return lines
+
+    def flush(self) -> list[str]:
+        """Passes on the rest of the output once it ended
+        :return:
+            - parts: The last incomplete line or chunk
+        """
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        text = text.rstrip("\r") if self.lines else text
+        return [text] if text else []
+
+
+class SyncMode(Enum):
+    """How `send_command` finds the end of the response
+
+    SENTINEL: every command is sent between two `:put`s of a unique marker,
+        the response is the output between the markers. A failing command
+        stops the line, its error is the response, see `SentinelTracker`
+    QUIET_PERIOD: the output buffer is cleared before and after the command
+        by waiting for a period of silence
+    """
+    SENTINEL = "sentinel"
+    QUIET_PERIOD = "quiet_period"
+
+
+class Validation(Enum):
+    """How `open_connection` checks the new connection
+
+    FULL: `beep` and `system identity print` must answer with the identity.
+        A successful check of the device is trusted for `VALIDATION_TTL`
+        seconds, the connections opened within it are checked as PROMPT
+    PROMPT: an empty line must be answered with the prompt
+    NONE: the connection is not checked
+    """
+    FULL = "full"
+    PROMPT = "prompt"
+    NONE = "none"
 
 
 class BaseConnection(ABC):
@@ -15,14 +192,56 @@ class BaseConnection(ABC):
     """
 
     SHELL_PROMPT = r"\[\w+@\w+\] [/\w]*> "
+    MAX_PROMPT_LENGTH = 512
+    READ_CHUNK_SIZE = 65536
+    POLL_INTERVAL = 0.05  # used only by connections without a file descriptor
+    SENTINEL_PREFIX = "__afw_"
+    PIPELINE_DEPTH = 16
+    VALIDATION_TTL = 300
+    REBOOT_COMMAND = "/system reboot"
+    REBOOT_CONFIRMATION = "[y/N]"
+    supports_sftp = False  # files can be transferred through the `sftp` session
+    # errors meaning the connection is lost, the subclasses add their own
+    RECONNECT_ERRORS: tuple[type[BaseException], ...] = (ConnectionClosedError, OSError, EOFError)
+
+    _validated_at: dict[str, float] = {}  # the last full validation of every device
 
     def __init__(self):
         self.lock = Lock()
+        self.sync_mode = SyncMode.SENTINEL
+        self._buffer = ReceiveBuffer()
+        self._selector = None
+        self._selector_fileno = None
+        self.metrics_label = type(self).__name__  # the device in the metrics
+        self._metrics: CommandMetrics | None = None
+
+        self.validation = Validation.FULL
+        self.reconnect_attempts = 3  # 0 disables the transparent reconnect
+        self.reconnect_delay = 0.5  # the backoff limit after the first failed attempt, doubled after each
+        self.max_reconnect_delay = 10.0
+        self.retry_sent_commands = False
+        self.reconnect_times: list[float] = []  # seconds every reconnect took
+        self._reconnect_lock = Lock()
+        self._generation = 0  # incremented by every reconnect
+        self._established = False  # validated, the reconnect is enabled
+        self._call_state = local()  # per thread, e.g. for the concurrent exec channels of SSH
+        self.reboot_poll_interval = 0.5  # seconds between the checks of a rebooting device
 
     def __del__(self):
         """Closes the connection when the object is destroyed."""
         self.close_connection()
 
+    @property
+    def _response_started(self) -> bool:
+        """Whether anything was received after the command of the calling
+        thread was sent, see `_with_reconnect`
+        """
+        return getattr(self._call_state, "response_started", False)
+
+    @_response_started.setter
+    def _response_started(self, started: bool):
+        self._call_state.response_started = started
+
     @abstractmethod
     def open_connection(self):
         """Opens the connection"""
@@ -38,6 +257,122 @@ class BaseConnection(ABC):
         """Checks the connection status"""
         ...
 
+    def is_alive(self) -> bool:
+        """Cheap check that the connection can be used, e.g. before reusing
+        a pooled connection
+        """
+        return self.is_connected()
+
+    def ping(self, timeout: float = 2) -> bool:
+        """Checks that the shell answers an empty line with the prompt
+        :param timeout: The timeout
+        :return:
+            - alive: Whether the prompt was printed in time
+        """
+        if not self.is_alive():
+            return False
+        with self.lock:
+            try:
+                self._buffer.clear()
+                self.writeln()
+                self.read_until_prompt(timeout)
+            except (ReadTimeoutError, *self.RECONNECT_ERRORS):
+                return False
+        return True
+
+    def validate_connection(self):
+        """Checks the newly opened connection as set by `validation` and
+        enables the transparent reconnect
+        :raises:
+            - ConnectionTestError if the check fails
+        """
+        validation = self.validation
+        validated_at = self._validated_at.get(self.metrics_label)
+        if validation is Validation.FULL and validated_at is not None:
+            if monotonic() - validated_at < self.VALIDATION_TTL:
+                validation = Validation.PROMPT
+
+        success, response = True, ""
+        if validation is Validation.FULL:
+            success, response = self._run_test_command()
+            if success:
+                self._validated_at[self.metrics_label] = monotonic()
+        elif validation is Validation.PROMPT:
+            success = self.ping(self.get_read_timeout() or 2)
+            response = "no prompt after an empty line"
+        if not success:
+            raise ConnectionTestError(response)
+        self._established = True
+
+    @classmethod
+    def clear_validation_cache(cls):
+        """Makes the next connections validate the devices fully"""
+        cls._validated_at.clear()
+
+    def reconnect(self, generation: int | None = None):
+        """Reopens the lost connection. The first attempt is made right
+        away, the next ones after a random delay up to `reconnect_delay`
+        doubled for every attempt, so the clients of a rebooting device
+        don't reconnect in lockstep
+        :param generation: The `_generation` the caller saw failing. The
+            connection isn't reopened if another thread already did it
+        :raises:
+            - The error of the last attempt
+        """
+        with self._reconnect_lock:
+            if generation is not None and generation != self._generation:
+                return
+            start = monotonic()
+            self._established = False
+            attempts = max(1, self.reconnect_attempts)
+            for attempt in range(attempts):
+                if attempt:
+                    limit = min(self.max_reconnect_delay, self.reconnect_delay * 2 ** (attempt - 1))
+                    sleep(random.uniform(0, limit))
+                try:
+                    self._reopen_connection()
+                    break
+                except (ConnectionTestError, ReadTimeoutError, *self.RECONNECT_ERRORS) as error:
+                    stdout_logger.warning("Reconnect attempt {} of {} failed: {!r}", attempt + 1, attempts, error)
+                    if attempt == attempts - 1:
+                        raise
+            self._generation += 1
+            self.reconnect_times.append(monotonic() - start)
+            stdout_logger.info("Reconnected in {:.3f}s", self.reconnect_times[-1])
+
+    def _reopen_connection(self):
+        try:
+            self.close_connection()
+        except self.RECONNECT_ERRORS:
+            pass
+        self._buffer.clear()
+        self.open_connection()
+
+    def _with_reconnect(self, exchange: Callable[..., T], *args) -> T:
+        """Runs the exchange, reopens the connection if it is lost. The
+        exchange is repeated only if nothing was received after the command
+        was sent, unless `retry_sent_commands` is set. RouterOS echoes the
+        command line before running it, so without the echo the command
+        didn't run
+        """
+        if not self._established or not self.reconnect_attempts:
+            return exchange(*args)
+
+        generation = self._generation
+        if not self.is_alive():
+            self.reconnect(generation)
+            generation = self._generation
+        self._response_started = False
+        try:
+            return exchange(*args)
+        except self.RECONNECT_ERRORS as error:
+            started = self._response_started
+            stdout_logger.warning("Connection lost: {!r}", error)
+            self.reconnect(generation)
+            if started and not self.retry_sent_commands:
+                raise
+        return exchange(*args)
+
     @abstractmethod
     def output_available(self):
         """The status of the output buffer for reads."""
@@ -74,47 +409,454 @@ class BaseConnection(ABC):
         """
         ...
 
+    def read_available(self) -> bytes:
+        """Reads everything the connection has already received, in bulk
+        :return:
+            - data: The data read, empty if nothing is available
+        """
+        return self.read(self.READ_CHUNK_SIZE)
+
+    def fileno(self) -> int | None:
+        """The file descriptor which becomes readable when output arrives
+        :return:
+            - fileno: The file descriptor or None if the connection has none
+        """
+        return None
+
+    def wait_for_output(self, timeout: float) -> bool:
+        """Blocks until the connection becomes readable or the timeout passes
+        :param timeout: The timeout in seconds
+        :return:
+            - ready: False if nothing arrived within the timeout
+        """
+        if self.output_available():
+            return True
+        if timeout <= 0:
+            return False
+
+        fileno = self.fileno()
+        if fileno is None:
+            sleep(min(timeout, self.POLL_INTERVAL))
+            return self.output_available()
+        return bool(self._get_selector(fileno).select(timeout))
+
+    def _get_selector(self, fileno: int) -> DefaultSelector:
+        """Gets the selector watching the file descriptor, re-creating it
+        when the descriptor changes (e.g. after reconnection)
+        """
+        if self._selector_fileno != fileno:
+            self._close_selector()
+            self._selector = DefaultSelector()
+            self._selector.register(fileno, EVENT_READ)
+            self._selector_fileno = fileno
+        return self._selector
+
+    def _close_selector(self):
+        if self._selector is not None:
+            self._selector.close()
+        self._selector = None
+        self._selector_fileno = None
+
     def writeln(self, data: str = ""):
         """Writes the data to the shell with a newline
         :param data: Data to write to the shell
         """
-        self.write(f"{data}\r\n")
+        self._run_steps(self._writeln_steps(data))
+
+    def _writeln_steps(self, data: str = "") -> Steps[None]:
+        line = f"{data}\r\n"
+        yield line
+        if self._metrics is not None:
+            self._metrics.on_write(line)
 
     def restart_connection(self):
-        """Restarts the connection by closing and reopening it."""
-        self.close_connection()
-        self.open_connection()
+        """Restarts the connection by closing and reopening it, see
+        `reconnect`
+        """
+        self.reconnect()
+
+    def reboot(self, timeout: float = 180) -> RebootReport:
+        """Reboots the device and waits until it is usable again. The device
+        is watched going down and coming back by the connection specific
+        `_wait_for_shutdown` and `_wait_for_boot`, then the connection is
+        logged in and validated again
+        :param timeout: Seconds for the whole reboot
+        :return:
+            - report: The time of every phase of the reboot
+        :raises:
+            - RebootTimeoutError if the device is not ready in time
+        """
+        deadline = monotonic() + timeout
+        report = self._send_reboot(timeout)
+        stdout_logger.info("Rebooting {}", self.metrics_label)
+        phases = zip(report.PHASES, (self._wait_for_shutdown, self._wait_for_boot, self._log_in_after_reboot))
+        for phase, wait in phases:
+            try:
+                wait(deadline)
+            except (ReadTimeoutError, RebootTimeoutError) as error:
+                raise RebootTimeoutError(phase, timeout) from error
+            report.mark(phase)
+        stdout_logger.info("{} is back, down for {:.3f}s", self.metrics_label, report.downtime)
+        return report
+
+    def _send_reboot(self, timeout: float) -> RebootReport:
+        """Sends the reboot command and confirms it. The connection is lost
+        on purpose from now on, so it is not reconnected transparently
+        """
+        with self.lock:
+            self._established = False
+            self._buffer.clear()
+            self.writeln(self.REBOOT_COMMAND)
+            self.read_until(self.REBOOT_CONFIRMATION, min(timeout, 15))
+            self.write("y")  # RouterOS takes the answer without Enter
+            return RebootReport(self.metrics_label)
+
+    @abstractmethod
+    def _wait_for_shutdown(self, deadline: float):
+        """Waits until the device stops serving
+        :param deadline: The `monotonic` time to give up at
+        """
+        ...
+
+    @abstractmethod
+    def _wait_for_boot(self, deadline: float):
+        """Waits until the device booted and can be logged in to
+        :param deadline: The `monotonic` time to give up at
+        """
+        ...
 
-    def send_command(self, command: str, timeout: float = 15, strip: bool = True) -> str:
+    def _log_in_after_reboot(self, deadline: float):
+        """Opens and validates the connection to the booted device, retrying
+        while its services are still starting
+        :param deadline: The `monotonic` time to give up at
+        """
+        start = monotonic()
+        while True:
+            try:
+                self._reopen_connection()
+                return
+            except (ConnectionTestError, ReadTimeoutError, *self.RECONNECT_ERRORS) as error:
+                if monotonic() + self.reboot_poll_interval >= deadline:
+                    raise RebootTimeoutError("ready", monotonic() - start) from error
+                stdout_logger.info("{} is not ready yet: {!r}", self.metrics_label, error)
+                sleep(self.reboot_poll_interval)
+
+    def send_command(
+        self, command: str, timeout: float = 15, strip: bool = True, sync_mode: SyncMode | None = None
+    ) -> str:
         """Sends a command and waits for the shell prompt within
-        the desired timeout
+        the desired timeout. A lost connection is reopened, see
+        `_with_reconnect`
 
         :param command: The string command
         :param timeout: The timeout before the prompt is read
+        :param sync_mode: The way to find the end of the response. The
+            `sync_mode` of the connection is used if not set
         :return:
             - response: The returned output
         """
+        return self._with_reconnect(self._send_command, command, timeout, strip, sync_mode)
+
+    def _send_command(self, command: str, timeout: float, strip: bool, sync_mode: SyncMode | None) -> str:
+        sync_mode = sync_mode or self.sync_mode
         try:
             self.lock.acquire()
-            self.clear_output_buffer()
+            stdout_logger.info("=> {}", command)
+            self._start_metrics()
+            if sync_mode is SyncMode.SENTINEL:
+                response = self._run_steps(self._sentinel_exchange_steps(command, timeout))
+            else:
+                response = self._run_steps(self._quiet_period_exchange_steps(command, timeout))
+            self._finish_metrics(command)
+        finally:
+            self._metrics = None
+            self.lock.release()
 
-            stdout_logger.info(f"=> {command}")
-            self.writeln(command)
-            self.read_until_prompt(timeout)
+        response = response.strip() if strip else response
+        stdout_logger.info("=< {}", response)
 
-            data = self.read_until_prompt(timeout)
-            stdout_logger.debug(f"Raw response: <{data}>")
-            response = self._extract_response(command, data)
+        return response
 
-            self.clear_output_buffer()
+    def send_commands(
+        self, commands: list[str], timeout: float = 15, strip: bool = True, pipeline_depth: int | None = None
+    ) -> list[str]:
+        """Sends the commands back to back without waiting for each response
+        Up to `pipeline_depth` commands are in flight, the responses are
+        split by their sentinel markers. A failing command ends its own
+        response with the error, see `SentinelTracker`, the lines of the
+        next commands are run anyway. With `SyncMode.QUIET_PERIOD` the
+        commands are sent one by one.
+
+        :param commands: The string commands
+        :param timeout: The timeout of each response
+        :param pipeline_depth: The number of commands sent ahead of the
+            responses. `PIPELINE_DEPTH` if not set
+        :return:
+            - responses: The returned outputs in the order of the commands
+        """
+        if self.sync_mode is not SyncMode.SENTINEL:
+            return [self.send_command(command, timeout, strip) for command in commands]
+        return self._with_reconnect(self._send_pipelined, commands, timeout, strip, pipeline_depth)
+
+    def _send_pipelined(
+        self, commands: list[str], timeout: float, strip: bool, pipeline_depth: int | None
+    ) -> list[str]:
+        pipeline_depth = pipeline_depth or self.PIPELINE_DEPTH
+        in_flight = deque()
+        responses = []
+        try:
+            self.lock.acquire()
+            for command in commands:
+                if len(in_flight) >= pipeline_depth:
+                    responses.append(self._run_steps(self._sentinel_response_steps(in_flight.popleft(), timeout)))
+                stdout_logger.info("=> {}", command)
+                tracker = self._sentinel_command(command)
+                self.writeln(tracker.wire_command)
+                in_flight.append(tracker)
+            while in_flight:
+                responses.append(self._run_steps(self._sentinel_response_steps(in_flight.popleft(), timeout)))
         finally:
             self.lock.release()
 
-        response = response.strip() if strip else response
-        stdout_logger.info(f"=< {response}")
+        responses = [response.strip() for response in responses] if strip else responses
+        for response in responses:
+            stdout_logger.info("=< {}", response)
+
+        return responses
+
+    def send_command_stream(self, command: str, timeout: float = 15, lines: bool = True) -> Iterator[str]:
+        """Sends a command and yields its output as it arrives, e.g. of
+        `ping` or `/log print follow`
+
+        The output ends with a sentinel marker, like in
+        `SyncMode.SENTINEL`. Closing the generator before the output ended,
+        e.g. with `break`, interrupts the command with Ctrl-C. The
+        connection is locked until the generator is exhausted or closed.
+
+        Example:
+            for line in connection.send_command_stream("ping 10.0.0.1"):
+                if "timeout" in line:
+                    break
+
+        :param command: The string command
+        :param timeout: The maximum time without any output, the command
+            itself may run longer
+        :param lines: Whether to yield lines without the line endings,
+            otherwise the decoded chunks are yielded as they are read
+        :return:
+            - output: The generator of the lines or chunks
+        :raise:
+            - ReadTimeout: If there is no output within the timeout
+        """
+        with self.lock:
+            stdout_logger.info("=> {}", command)
+            tracker = self._sentinel_command(command)
+            self.writeln(tracker.wire_command)
+
+            splitter = OutputSplitter(lines, self.READ_CHUNK_SIZE)
+            received = bytearray()  # the output from `offset` on, not passed on yet
+            offset = 0
+            finished = False
+            try:
+                max_time = monotonic() + timeout
+                while True:
+                    data = self._buffer.consume()
+                    if not data:
+                        remaining = max_time - monotonic()
+                        if remaining <= 0:
+                            raise ReadTimeoutError(tracker.marker, received.decode(errors="replace").strip(), timeout)
+                        if self.wait_for_output(remaining):
+                            data = self.read_available()
+                        if not data:
+                            continue
+                    max_time = monotonic() + timeout
+                    done = tracker.feed(data)
+                    received += data
+
+                    end = tracker.safe_end()
+                    if end > offset:
+                        part_start = max(tracker.start, offset)
+                        chunk = bytes(received[part_start - offset:end - offset])
+                        if tracker.syntax_error:  # the whole error line, its column is given in the command
+                            chunk = tracker.response(received, offset).encode()
+                        for part in splitter.feed(chunk):
+                            stdout_logger.debug("Streamed: <{}>", part)
+                            yield part
+                        del received[:end - offset]
+                        offset = end
+                    if done != -1:
+                        yield from splitter.flush()
+                        self._buffer.feed(bytes(received[done - offset:]))
+                        finished = True
+                        return
+            finally:
+                if not finished:
+                    self._interrupt_command(timeout)
+
+    def capture_command(
+        self, command: str, timeout: float = 15, max_memory: int = 1024 * 1024, spill_dir: Path | None = None
+    ) -> CapturedOutput:
+        """Sends a command and captures its raw output with a bounded
+        amount of memory, e.g. of `export verbose` or large log dumps
+
+        The output beyond `max_memory` bytes is moved to a temporary file,
+        the returned object slices it without loading it into memory. The
+        end of the output is found by the sentinel marker, like in
+        `SyncMode.SENTINEL`.
+
+        :param command: The string command
+        :param timeout: The maximum time without any output
+        :param max_memory: The maximum number of bytes kept in memory
+        :param spill_dir: The directory of the temporary file
+        :return:
+            - output: The captured output without the echo, the marker and
+                the prompt. The caller closes it
+        :raise:
+            - ReadTimeout: If there is no output within the timeout
+        """
+        output = CapturedOutput(max_memory, spill_dir)
+        with self.lock:
+            stdout_logger.info("=> {}", command)
+            tracker = self._sentinel_command(command)
+            self.writeln(tracker.wire_command)
+            max_time = monotonic() + timeout
+            try:
+                while True:
+                    data = self._buffer.consume()
+                    if not data:
+                        remaining = max_time - monotonic()
+                        if remaining <= 0:
+                            raise ReadTimeoutError(tracker.marker, f"<{output.size} bytes captured>", timeout)
+                        if self.wait_for_output(remaining):
+                            data = self.read_available()
+                        if not data:
+                            continue
+                    max_time = monotonic() + timeout
+
+                    # everything fed is written, so the offsets of the
+                    # tracker are the offsets in the output
+                    done = tracker.feed(data)
+                    if done == -1:
+                        output.write(data)
+                        continue
+                    used = done - output.size
+                    output.write(data[:used])
+                    self._buffer.feed(data[used:])
+                    break
+
+                output.finish(tracker.start, tracker.end)
+            except BaseException:
+                output.close()
+                raise
+
+        stdout_logger.info("=< {} bytes captured", len(output))
+        return output
+
+    def _interrupt_command(self, timeout: float):
+        """Interrupts the running command with Ctrl-C and waits for the
+        prompt
+        """
+        stdout_logger.info("Interrupting the command")
+        self.write("\x03")
+        try:
+            self.read_until_prompt(timeout)
+        except ReadTimeoutError as error:
+            stdout_logger.warning("The prompt didn't return after the interruption: {}", error)
+        self._buffer.clear()
+
+    def _run_steps(self, steps: Steps[T]) -> T:
+        """Drives the steps of an exchange with blocking waits and writes.
+        `AsyncBaseConnection` drives the same steps on the event loop
+        :param steps: The generator of the steps, see `Steps`
+        :return:
+            - result: The value returned by the steps
+        """
+        reply = None
+        while True:
+            try:
+                step = steps.send(reply)
+            except StopIteration as stop:
+                return stop.value
+            if isinstance(step, str):
+                self.write(step)
+                reply = None
+            else:
+                reply = self.wait_for_output(step)
+
+    def _sentinel_exchange_steps(self, command: str, timeout: float) -> Steps[str]:
+        """Sends the command between two `:put`s of a unique marker and
+        reads until the prompt after the response
+        :param command: The string command
+        :param timeout: The timeout
+        :return:
+            - response: The returned output, the error if the command failed
+        """
+        tracker = self._sentinel_command(command)
+        yield from self._writeln_steps(tracker.wire_command)
+        self._end_phase(Phase.WRITE)
+        response = yield from self._sentinel_response_steps(tracker, timeout)
+        self._end_phase(Phase.READ)
+        return response
+
+    def _sentinel_response_steps(self, tracker: SentinelTracker, timeout: float) -> Steps[str]:
+        """Reads the response of the command sent with `_sentinel_command`
+        :param tracker: The tracker of the command sent
+        :param timeout: The timeout
+        :return:
+            - response: The returned output, the error if the command failed
+        """
+        data = yield from self._match_steps(lambda buffer: tracker.feed(buffer.unscanned()), tracker.marker, timeout)
+        stdout_logger.debug("Raw response: <{}>", data)
+        if tracker.failed:
+            stdout_logger.warning("{} failed", tracker.command)
+        return tracker.response(data)
+
+    def _sentinel_command(self, command: str) -> SentinelTracker:
+        """Wraps the command between two `:put`s of a unique marker
+        :param command: The string command
+        :return:
+            - tracker: The tracker holding the command to send and finding
+                its response
+        """
+        return SentinelTracker(command, self.prompt, self.SENTINEL_PREFIX, self.MAX_PROMPT_LENGTH)
+
+    def _quiet_period_exchange_steps(self, command: str, timeout: float) -> Steps[str]:
+        """Sends the command between two waits for a quiet output buffer
+        :param command: The string command
+        :param timeout: The timeout
+        :return:
+            - response: The returned output
+        """
+        yield from self._clear_steps()
+        self._end_phase(Phase.CLEAR)
+
+        yield from self._writeln_steps(command)
+        self._end_phase(Phase.WRITE)
+        yield from self._prompt_steps(timeout)
 
+        data, prompt_start = yield from self._prompt_steps(timeout)
+        stdout_logger.debug("Raw response: <{}>", data)
+        response = self._extract_response(command, data, prompt_start)
+        self._end_phase(Phase.READ)
+
+        yield from self._clear_steps()
+        self._end_phase(Phase.CLEAR)
         return response
 
+    def _start_metrics(self):
+        """Starts collecting the metrics of a command if they are enabled"""
+        self._metrics = CommandMetrics() if METRICS.enabled else None
+
+    def _end_phase(self, phase: str):
+        if self._metrics is not None:
+            self._metrics.end_phase(phase)
+
+    def _finish_metrics(self, command: str):
+        """Records the metrics of the finished command"""
+        if self._metrics is not None:
+            METRICS.record(self.metrics_label, command, self._metrics)
+            self._metrics = None
+
     def read_until(self, expected: str, timeout: float = 5) -> str:
         """Reads the shell until the expected string
         :param expected: The expected string
@@ -124,33 +866,59 @@ class BaseConnection(ABC):
         :raise:
             - ReadTimeout: If the expected string is not read in time
         """
-        max_time = time() + timeout
+        return self._run_steps(self._read_until_steps(expected, timeout))
+
+    def _read_until_steps(self, expected: str, timeout: float) -> Steps[str]:
         expected_bytes = expected.encode()
-        output = b""
-        while time() < max_time:
-            output += self.read(1)
-            if expected_bytes in output:
-                return output.decode()
-        raise ReadTimeoutError(expected, output.decode().strip(), timeout)
+        output = yield from self._match_steps(lambda buffer: buffer.find(expected_bytes), expected, timeout)
+        return output.decode(errors="replace")
 
     def read_until_regexp(self, expected: str, timeout: float = 5):
         """Reads the shell until the regular expression
+        The expression is matched against the raw bytes line by line, so it
+        must not span line breaks, see `ReceiveBuffer.search`.
         :param expected: The expected regular expression
         :param timeout: The timeout
         :raise:
             - ReadTimeout: If the expected string is not read in time
         """
-        max_time = time() + timeout
-        regexp = re.compile(expected)
-        output = b""
-        while time() < max_time:
-            output += self.read(1)
-            try:
-                if regexp.search(output.decode()):
-                    return output.decode()
-            except UnicodeDecodeError:
-                pass  # Bytes read is not complete
-        raise ReadTimeoutError(expected, output.decode().strip(), timeout)
+        regexp = re.compile(expected.encode())
+        output = self._read_until_match(lambda buffer: buffer.search(regexp), expected, timeout)
+        return output.decode(errors="replace")
+
+    def _read_until_match(self, find: Callable[[ReceiveBuffer], int], expected: str, timeout: float) -> bytes:
+        """Fills the receive buffer until `find` reports a match, see
+        `_match_steps`
+        """
+        return self._run_steps(self._match_steps(find, expected, timeout))
+
+    def _match_steps(self, find: Callable[[ReceiveBuffer], int], expected: str, timeout: float) -> Steps[bytes]:
+        """Fills the receive buffer until `find` reports a match
+        :param find: Function returning the offset right after the match in
+            the buffer or -1
+        :param expected: The expected string used in the error message
+        :param timeout: The timeout
+        :return:
+            - output: The output up to the end of the match
+        :raise:
+            - ReadTimeout: If there is no match in time
+        """
+        max_time = monotonic() + timeout
+        while True:
+            end = find(self._buffer)
+            if end != -1:
+                return self._buffer.consume(end)
+            remaining = max_time - monotonic()
+            if remaining <= 0:
+                output = self._buffer.consume().decode(errors="replace")
+                raise ReadTimeoutError(expected, output.strip(), timeout)
+            if (yield remaining):
+                data = self.read_available()
+                if self._metrics is not None:
+                    self._metrics.on_read(data)
+                if data:
+                    self._response_started = True
+                self._buffer.feed(data)
 
     def read_until_prompt(self, timeout: float = 5) -> str:
         """Reads the shell until the shell prompt
@@ -160,22 +928,46 @@ class BaseConnection(ABC):
         :raise:
             - ReadTimeout: If the expected string is not read in time
         """
-        output = self.read_until_regexp(self.prompt, timeout)
+        output, _ = self._read_until_prompt_match(timeout)
         return output
 
+    def _read_until_prompt_match(self, timeout: float) -> tuple[str, int]:
+        """Reads the shell until the shell prompt, see `_prompt_steps`"""
+        return self._run_steps(self._prompt_steps(timeout))
+
+    def _prompt_steps(self, timeout: float) -> Steps[tuple[str, int]]:
+        """Reads the shell until the shell prompt, feeding the prompt matcher
+        only with the newly arrived data
+        :param timeout: The timeout
+        :return:
+            - output: The read output
+            - prompt_start: The offset of the prompt in the output
+        :raise:
+            - ReadTimeout: If the prompt is not read in time
+        """
+        matcher = PromptMatcher(self.prompt, self.MAX_PROMPT_LENGTH)
+        raw = yield from self._match_steps(lambda buffer: matcher.feed(buffer.unscanned()), self.prompt, timeout)
+        head = raw[:matcher.start].decode(errors="replace")
+        return head + raw[matcher.start:].decode(errors="replace"), len(head)
+
     def clear_output_buffer(self, timeout: float = 0.5):
         """Clears the output buffer by reading
         The timeout is the amount of time to wait since
         the last read. It is reset every time new data is read
         :param timeout: The timeout
         """
-        max_time = time() + timeout
-        while time() < max_time:
-            if self.output_available():
-                self.read()
-                max_time = time() + timeout
-
-    def _extract_response(self, command: str, data: str) -> str:
+        self._run_steps(self._clear_steps(timeout))
+
+    def _clear_steps(self, timeout: float = 0.5) -> Steps[None]:
+        self._buffer.clear()
+        max_time = monotonic() + timeout
+        remaining = timeout
+        while remaining > 0:
+            if (yield remaining) and self.read_available():
+                max_time = monotonic() + timeout
+            remaining = max_time - monotonic()
+
+    def _extract_response(self, command: str, data: str, prompt_start: int | None = None) -> str:
         """Extract the response from the data read from the shell
         The response is in the format of
             `<command>\\n\\r<response>[admin@...] > `
@@ -183,18 +975,25 @@ class BaseConnection(ABC):
         to the beginning of username
         :param command: The command sent
         :param data: The data returned from the shell
+        :param prompt_start: The offset of the prompt in the data if already
+            known, otherwise the prompt is searched for
         :return:
             - response: The returned output
         """
+        if prompt_start is None:
+            prompt_start = data.rfind("[admin@")
+        data = data[:prompt_start]
 
         # Clean Command and Data
         command = re.sub(r"[^\r]\n", r"\r\n", command)  # missing carriage return
         data = re.sub(r"\r\n>;? ", "\r\n", data)  # block responses
         data = re.sub(r"\'", "'", data)  # escaped quotes
 
-        start = data.find(command) + len(command) + 1  # 1 is new line character length
-        end = data.rfind("[admin@")
-        response = data[start:end]
+        # The echo may be missing when it was read with a previous
+        # response, e.g. for pipelined commands
+        echo = data.find(command)
+        start = echo + len(command) + 1 if echo != -1 else 0  # 1 is new line character length
+        response = data[start:]
 
         return response
 
@@ -207,5 +1006,5 @@ class BaseConnection(ABC):
         self.send_command("beep")
         response = self.send_command("system identity print")
         success = response == "name: MikroTik"
-        stdout_logger.info(f"Initial test finished. Successful: {success}")
+        stdout_logger.info("Initial test finished. Successful: {}", success)
         return success, response
@@ -0,0 +1,167 @@
+"""Command output kept in memory up to a limit and in a temporary file beyond"""
+import mmap
+from collections.abc import Iterator
+from pathlib import Path
+from tempfile import TemporaryFile
+from typing import BinaryIO
+
+
+class CapturedOutput:
+    """Raw output captured with a bounded amount of memory
+
+    The output is kept in memory until it exceeds `max_memory` bytes, then
+    it is moved to a temporary file, which is memory-mapped once the capture
+    is finished. Slices are read from the mapping, so only the requested
+    part is copied into memory.
+
+    Example:
+        with connection.capture_command("export verbose") as output:
+            output.save(FrameworkPaths.REPORTS_DIR / "export.rsc")
+            header = output[:1024].decode()
+    """
+
+    def __init__(self, max_memory: int = 1024 * 1024, spill_dir: Path | None = None):
+        """Initializes the capture
+        :param max_memory: The maximum number of bytes kept in memory
+        :param spill_dir: The directory of the temporary file, the system
+            temporary directory if not set
+        """
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self._memory = bytearray()
+        self._file: BinaryIO | None = None
+        self._mmap: mmap.mmap | None = None
+        self._size = 0
+        self._start = 0
+        self._end = 0
+        self._finished = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    @property
+    def spilled(self) -> bool:
+        """Whether the output was moved to the temporary file"""
+        return self._file is not None
+
+    @property
+    def size(self) -> int:
+        """The number of bytes written so far"""
+        return self._size
+
+    def write(self, data: bytes):
+        """Appends the received data
+        :param data: The data
+        """
+        if self._file is None and len(self._memory) + len(data) > self.max_memory:
+            self._file = TemporaryFile(dir=self.spill_dir)
+            self._file.write(self._memory)
+            self._memory = bytearray()
+        if self._file is None:
+            self._memory += data
+        else:
+            self._file.write(data)
+        self._size += len(data)
+
+    def finish(self, start: int = 0, end: int | None = None):
+        """Ends the capture and limits the output to the range, e.g. to
+        drop the echoed command and the prompt
+        :param start: The offset of the output start
+        :param end: The offset of the output end, the end of the data if
+            not set
+        """
+        self._start = start
+        self._end = self._size if end is None else end
+        self._finished = True
+        if self._file is not None and self._size:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Releases the memory mapping and deletes the temporary file. The
+        views of the output must be released before
+        """
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+        self._memory = bytearray()
+        self._size = self._start = self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __getitem__(self, index: int | slice) -> int | bytes:
+        return self.view()[index] if isinstance(index, int) else bytes(self.view()[index])
+
+    def view(self) -> memoryview:
+        """The output without copying it
+        :return:
+            - view: The memory view over the memory or the mapped file
+        """
+        if not self._finished:
+            raise RuntimeError("The capture is not finished")
+        data = self._memory if self._mmap is None else self._mmap
+        return memoryview(data)[self._start:self._end]
+
+    def find(self, sub: bytes, start: int = 0, end: int | None = None) -> int:
+        """Finds the bytes in the output, like `bytes.find`
+        :return:
+            - index: The offset of the first match or -1
+        """
+        return self._find(self._data().find, sub, start, end)
+
+    def rfind(self, sub: bytes, start: int = 0, end: int | None = None) -> int:
+        """Finds the bytes in the output from the end, like `bytes.rfind`
+        :return:
+            - index: The offset of the last match or -1
+        """
+        return self._find(self._data().rfind, sub, start, end)
+
+    def chunks(self, size: int = 65536) -> Iterator[bytes]:
+        """Iterates over the output in chunks of at most `size` bytes"""
+        view = self.view()
+        for offset in range(0, len(view), size):
+            yield bytes(view[offset:offset + size])
+
+    def lines(self, errors: str = "replace") -> Iterator[str]:
+        """Iterates over the decoded lines without the line endings"""
+        start = 0
+        while start < len(self):
+            end = self.find(b"\n", start)
+            end = len(self) if end == -1 else end
+            yield self[start:end].decode(errors=errors).rstrip("\r")
+            start = end + 1
+
+    def decode(self, errors: str = "replace") -> str:
+        """Decodes the whole output into memory
+        :return:
+            - output: The decoded output
+        """
+        return bytes(self.view()).decode(errors=errors)
+
+    def save(self, path: Path):
+        """Writes the output to the file without loading it into memory
+        :param path: The path of the file
+        """
+        with open(path, "wb") as fobj:
+            for chunk in self.chunks():
+                fobj.write(chunk)
+
+    def _data(self) -> bytearray | mmap.mmap:
+        if not self._finished:
+            raise RuntimeError("The capture is not finished")
+        return self._memory if self._mmap is None else self._mmap
+
+    def _find(self, find, sub: bytes, start: int, end: int | None) -> int:
+        end = len(self) if end is None else min(end, len(self))
+        index = find(sub, self._start + start, self._start + end)
+        return -1 if index == -1 else index - self._start
@@ -0,0 +1,110 @@
+"""Pool of opened connections reused between the users"""
+from collections.abc import Callable, Hashable
+from threading import Lock
+from time import monotonic
+
+from config import stdout_logger
+from src.connectors.base_connection import BaseConnection
+
+
+class PoolStats:
+    """Counters of the pool usage"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.discarded = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+    def __str__(self):
+        return ", ".join(f"{name}: {value}" for name, value in vars(self).items())
+
+
+class ConnectionPool:
+    """Keeps opened, logged in connections for reuse
+
+    Connections are keyed by the caller, e.g. by (device name, connection
+    type). A connection is checked to be alive when it is acquired and
+    closed when it stays idle longer than `max_idle` seconds.
+    """
+
+    def __init__(self, max_idle: float = 300):
+        """Initializes the pool
+        :param max_idle: Seconds an unused connection is kept open
+        """
+        self.max_idle = max_idle
+        self.stats = PoolStats()
+        self._idle: dict[Hashable, list[tuple[float, BaseConnection]]] = {}
+        self._lock = Lock()
+
+    def acquire(self, key: Hashable, factory: Callable[[], BaseConnection]) -> BaseConnection:
+        """Gets an alive connection from the pool or opens a new one
+        :param key: The key of the connection
+        :param factory: Function creating a new (not opened) connection
+        :return:
+            - connection: The opened connection
+        """
+        self._evict_idle()
+        while (connection := self._pop_idle(key)) is not None:
+            if connection.is_alive():
+                self._count("hits")
+                return connection
+            self._count("discarded")
+            self._close(connection)
+
+        self._count("misses")
+        connection = factory()
+        connection.open_connection()
+        return connection
+
+    def release(self, key: Hashable, connection: BaseConnection):
+        """Returns the connection to the pool instead of closing it
+        :param key: The key the connection was acquired with
+        :param connection: The connection
+        """
+        if not connection.is_alive():
+            self._count("discarded")
+            self._close(connection)
+            return
+        with self._lock:
+            self._idle.setdefault(key, []).append((monotonic(), connection))
+
+    def close_all(self):
+        """Closes all the idle connections"""
+        with self._lock:
+            connections = [connection for idle in self._idle.values() for _, connection in idle]
+            self._idle.clear()
+        for connection in connections:
+            self._close(connection)
+
+    def _pop_idle(self, key: Hashable) -> BaseConnection | None:
+        with self._lock:
+            idle = self._idle.get(key)
+            return idle.pop()[1] if idle else None
+
+    def _evict_idle(self):
+        expired = []
+        min_time = monotonic() - self.max_idle
+        with self._lock:
+            for key, idle in self._idle.items():
+                expired += [connection for released, connection in idle if released < min_time]
+                self._idle[key] = [(released, connection) for released, connection in idle if released >= min_time]
+            self.stats.evictions += len(expired)
+
+        for connection in expired:
+            self._close(connection)
+
+    def _count(self, counter: str):
+        """Increments the counter of the stats, the pool is shared by threads"""
+        with self._lock:
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+
+    @staticmethod
+    def _close(connection: BaseConnection):
+        try:
+            connection.close_connection()
+        except (OSError, EOFError) as error:
+            stdout_logger.warning("Failed to close pooled connection: {}", error)
@@ -31,3 +31,30 @@ class NoSuchConnectionTypeError(Exception):
 
     def __str__(self):
         return f"No such connection type: {self.connection_type}"
+
+
+class RebootTimeoutError(Exception):
+    def __init__(self, phase: str, timeout: float):
+        self.phase = phase
+        self.timeout = timeout
+
+    def __str__(self):
+        return f"The rebooted device didn't reach '{self.phase}' in {self.timeout} seconds"
+
+
+class FileTransferNotSupportedError(Exception):
+    def __init__(self, connection_label: str):
+        self.connection_label = connection_label
+
+    def __str__(self):
+        return f"The connection to {self.connection_label} can't transfer files"
+
+
+class ChecksumMismatchError(Exception):
+    def __init__(self, path: str, expected: str, actual: str):
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return f"Checksum of {self.path} is {self.actual}, expected {self.expected}"
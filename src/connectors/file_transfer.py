@@ -0,0 +1,323 @@
+"""Chunked SFTP transfers of large files, e.g. firmware packages and backups
+
+The transfers use the SFTP session on the transport of an SSH connection,
+see `SSHConnection.sftp`:
+    - uploads are written in chunks of the largest SFTP request without
+        waiting for the acknowledgement of each one (pipelined writes)
+    - downloads request a whole segment of chunks at once (prefetched reads)
+        and write them to the disk as they arrive, so at most one segment is
+        held in memory
+    - with a `RateLimiter` every chunk is charged before it is written or
+        requested, so the throughput stays under the cap also over short
+        periods
+    - the data goes to a `.part` file, renamed once it is complete. An
+        interrupted transfer continues from the end of the `.part` file,
+        also after the lost connection was reopened
+    - the SHA-256 of the data is computed on the fly and checked against
+        the file read back from the device or the expected checksum
+"""
+import hashlib
+import os
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from threading import Lock
+from time import monotonic, sleep
+from typing import IO, Any
+
+from config import stdout_logger
+from src.connectors.base_connection import BaseConnection
+from src.connectors.exceptions import ChecksumMismatchError, FileTransferNotSupportedError
+
+CHUNK_SIZE = 32768  # the largest SFTP read or write request
+SEGMENT_SIZE = 8 * 1024 * 1024
+PARTIAL_SUFFIX = ".part"
+# the errors of the files themselves, the others mean the connection is lost
+FILE_ERRORS = (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)
+
+
+class RateLimiter:
+    """Token bucket capping the combined throughput of the transfers
+    sharing it, e.g. of all the devices of a fleet
+    """
+
+    def __init__(self, bytes_per_second: float, burst: float | None = None):
+        """Initializes the limiter
+        :param bytes_per_second: The throughput cap
+        :param burst: The bytes sent at once after an idle period, a tenth
+            of a second worth by default
+        """
+        self.rate = bytes_per_second
+        self.burst = burst or max(CHUNK_SIZE, bytes_per_second / 10)
+        self._tokens = self.burst
+        self._updated = monotonic()
+        self._lock = Lock()
+
+    def consume(self, count: int):
+        """Waits until the bytes fit under the cap
+        :param count: The number of bytes about to be sent
+        """
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= count  # reserved, the callers wait for their own debt
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            sleep(wait)
+
+
+class TransferResult:
+    """Outcome of a file transfer"""
+
+    def __init__(
+        self, local_path: Path, remote_path: str, size: int, transferred: int, duration: float, sha256: str
+    ):
+        """Initializes the result
+        :param local_path: The file on the disk
+        :param remote_path: The file on the device
+        :param size: The file size in bytes
+        :param transferred: The bytes sent over the connection, less than
+            the size if the transfer was resumed
+        :param duration: Seconds the transfer and the verification took
+        :param sha256: The checksum of the file
+        """
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.size = size
+        self.transferred = transferred
+        self.duration = duration
+        self.sha256 = sha256
+
+    @property
+    def throughput(self) -> float:
+        """Transferred bytes per second"""
+        return self.transferred / self.duration if self.duration else 0.0
+
+    def __repr__(self):
+        return (
+            f"TransferResult({self.local_path} <> {self.remote_path}, size={self.size}, "
+            f"transferred={self.transferred}, {self.throughput / 1e6:.1f} MB/s)"
+        )
+
+
+class FileTransfer:
+    """Uploads and downloads files through the SFTP session of a connection
+
+    Example:
+        transfer = FileTransfer(lib.connection, RateLimiter(10e6))
+        transfer.upload(Path("routeros-7.15-arm.npk"))
+        transfer.download("backup.backup", Path("reports/backup.backup"))
+    """
+
+    def __init__(
+        self, connection: BaseConnection, rate_limiter: RateLimiter | None = None,
+        chunk_size: int = CHUNK_SIZE, segment_size: int = SEGMENT_SIZE, attempts: int = 3
+    ):
+        """Initializes the transfers
+        :param connection: The connection supporting SFTP
+        :param rate_limiter: The throughput cap, not limited if not set
+        :param chunk_size: The size of every SFTP request
+        :param segment_size: The bytes of a download requested at once
+        :param attempts: The number of tries of a transfer interrupted by a
+            lost connection, each continuing from where the previous one
+            stopped
+        """
+        if not connection.supports_sftp:
+            raise FileTransferNotSupportedError(connection.metrics_label)
+        self.connection = connection
+        self.rate_limiter = rate_limiter
+        self.chunk_size = chunk_size
+        self.segment_size = segment_size
+        self.attempts = attempts
+
+    def upload(
+        self, local_path: Path, remote_path: str | None = None, resume: bool = True, verify: bool = True
+    ) -> TransferResult:
+        """Uploads the file to the device
+        :param local_path: The file to upload
+        :param remote_path: The path on the device, the file name if not set
+        :param resume: Continue the upload of an existing `.part` file
+        :param verify: Read the uploaded file back and compare the checksums
+        :return:
+            - result: The sizes, the duration and the checksum
+        :raises:
+            - ChecksumMismatchError if the file read back differs
+        """
+        local_path = Path(local_path)
+        remote_path = remote_path or local_path.name
+        return self._with_retries(
+            lambda resume_partial: self._upload(local_path, remote_path, resume_partial, verify), resume
+        )
+
+    def download(
+        self, remote_path: str, local_path: Path | None = None, resume: bool = True,
+        expected_sha256: str | None = None
+    ) -> TransferResult:
+        """Downloads the file from the device straight to the disk
+        :param remote_path: The path on the device
+        :param local_path: The file to write, the file name in the working
+            directory if not set
+        :param resume: Continue the download of an existing `.part` file
+        :param expected_sha256: The checksum the file must have
+        :return:
+            - result: The sizes, the duration and the checksum
+        :raises:
+            - ChecksumMismatchError if the checksum is not the expected one
+        """
+        local_path = Path(local_path or Path(remote_path).name)
+        return self._with_retries(
+            lambda resume_partial: self._download(remote_path, local_path, resume_partial, expected_sha256), resume
+        )
+
+    def _with_retries(self, transfer: Callable[[bool], TransferResult], resume: bool) -> TransferResult:
+        """Runs the transfer, reopens the lost connection and resumes
+        :param transfer: Function running the transfer, gets whether to
+            resume the partial file
+        :param resume: Whether the first attempt resumes the partial file
+        """
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return transfer(resume)
+            except FILE_ERRORS:
+                raise
+            except self.connection.RECONNECT_ERRORS as error:
+                if attempt == self.attempts:
+                    raise
+                stdout_logger.warning("Transfer interrupted, resuming: {!r}", error)
+                self.connection.reconnect()
+                resume = True
+
+    def _upload(self, local_path: Path, remote_path: str, resume: bool, verify: bool) -> TransferResult:
+        sftp = self.connection.sftp
+        partial = remote_path + PARTIAL_SUFFIX
+        size = local_path.stat().st_size
+        digest = hashlib.sha256()
+        start = monotonic()
+        with open(local_path, "rb") as source:
+            offset = 0
+            if resume:
+                offset = self._resume_offset(
+                    source, size, partial, lambda: sftp.stat(partial).st_size, lambda: sftp.open(partial, "rb")
+                )
+            with sftp.open(partial, "r+b" if offset else "wb") as target:
+                target.set_pipelined(True)
+                self._hash_prefix(source, offset, digest)
+                target.seek(offset)
+                for chunk in iter(lambda: source.read(self.chunk_size), b""):
+                    self._throttle(len(chunk))
+                    target.write(chunk)
+                    digest.update(chunk)
+            # the close waited for the acknowledgements of the writes
+
+        checksum = digest.hexdigest()
+        if verify:
+            with sftp.open(partial, "rb") as uploaded:
+                uploaded_digest = hashlib.sha256()
+                for chunk in self._read_segments(uploaded, 0, sftp.stat(partial).st_size, throttle=False):
+                    uploaded_digest.update(chunk)
+            if uploaded_digest.hexdigest() != checksum:
+                sftp.remove(partial)
+                raise ChecksumMismatchError(remote_path, checksum, uploaded_digest.hexdigest())
+        try:
+            sftp.remove(remote_path)  # SFTP doesn't rename over an existing file
+        except FileNotFoundError:
+            pass
+        sftp.rename(partial, remote_path)
+        return TransferResult(local_path, remote_path, size, size - offset, monotonic() - start, checksum)
+
+    def _download(
+        self, remote_path: str, local_path: Path, resume: bool, expected_sha256: str | None
+    ) -> TransferResult:
+        sftp = self.connection.sftp
+        partial = local_path.with_name(local_path.name + PARTIAL_SUFFIX)
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        start = monotonic()
+        with sftp.open(remote_path, "rb") as source:
+            size = source.stat().st_size
+            offset = 0
+            if resume:
+                offset = self._resume_offset(
+                    source, size, partial, lambda: partial.stat().st_size, lambda: open(partial, "rb")
+                )
+            with open(partial, "r+b" if offset else "wb") as target:
+                self._hash_prefix(target, offset, digest)
+                target.truncate(offset)
+                target.seek(offset)
+                for chunk in self._read_segments(source, offset, size):
+                    target.write(chunk)
+                    digest.update(chunk)
+
+        checksum = digest.hexdigest()
+        if expected_sha256 is not None and checksum != expected_sha256.lower():
+            partial.unlink()
+            raise ChecksumMismatchError(remote_path, expected_sha256, checksum)
+        os.replace(partial, local_path)
+        return TransferResult(local_path, remote_path, size, size - offset, monotonic() - start, checksum)
+
+    def _resume_offset(
+        self, source: IO[bytes], size: int, partial: Path | str, partial_size: Callable[[], int],
+        open_partial: Callable[[], IO[bytes]]
+    ) -> int:
+        """The offset to continue the transfer from, the end of the last
+        complete chunk of the partial file. 0 if there is no partial file or
+        its last chunk differs from the source
+        :param source: The file being transferred, remote or local
+        :param size: The size of the transferred file
+        :param partial: The partial file used in the logs
+        :param partial_size: Function returning the size of the partial file
+        :param open_partial: Function opening the partial file for reading
+        """
+        try:
+            offset = partial_size()
+        except FileNotFoundError:
+            return 0
+        offset = min(offset, size) // self.chunk_size * self.chunk_size
+        if not offset:
+            return 0
+
+        tail_start = offset - self.chunk_size
+        source.seek(tail_start)
+        expected = source.read(self.chunk_size)
+        with open_partial() as file:
+            file.seek(tail_start)
+            tail = file.read(self.chunk_size)
+        if tail != expected:
+            stdout_logger.warning("{} doesn't match the transferred file, starting over", partial)
+            return 0
+        stdout_logger.info("Resuming {} from {} of {} bytes", partial, offset, size)
+        return offset
+
+    def _hash_prefix(self, file: IO[bytes], offset: int, digest: Any):
+        """Hashes the part of the file that is not transferred again"""
+        file.seek(0)
+        remaining = offset
+        while remaining:
+            chunk = file.read(min(remaining, SEGMENT_SIZE))
+            digest.update(chunk)
+            remaining -= len(chunk)
+
+    def _read_segments(self, source: Any, start: int, end: int, throttle: bool = True) -> Iterator[bytes]:
+        """Reads the remote file with all the requests of a segment in
+        flight at once, so the memory use is bounded by the segment size.
+        Throttled reads are charged per chunk before they are requested, in
+        segments of at most the burst of the rate limiter, so the data
+        doesn't arrive in bursts of a whole segment
+        """
+        segment_size = self.segment_size
+        if throttle and self.rate_limiter is not None:
+            segment_size = min(segment_size, max(1, int(self.rate_limiter.burst) // self.chunk_size) * self.chunk_size)
+        for segment_start in range(start, end, segment_size):
+            segment_end = min(end, segment_start + segment_size)
+            chunks = [
+                (offset, min(self.chunk_size, segment_end - offset))
+                for offset in range(segment_start, segment_end, self.chunk_size)
+            ]
+            if throttle:
+                for _, length in chunks:
+                    self._throttle(length)
+            yield from source.readv(chunks)
+
+    def _throttle(self, count: int):
+        if self.rate_limiter is not None:
+            self.rate_limiter.consume(count)
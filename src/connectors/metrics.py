@@ -0,0 +1,174 @@
+"""Per-command latency and I/O metrics of the connections
+
+The metrics are collected only while `METRICS.enabled` is set. Disabled,
+the connections skip the instrumentation with a single attribute check.
+"""
+import json
+import re
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+
+
+class Phase:
+    """Phases of a command exchange"""
+    CLEAR = "clear"  # waiting for a quiet output buffer
+    WRITE = "write"  # writing the command
+    FIRST_BYTE = "first_byte"  # waiting for the first byte of the response
+    READ = "read"  # reading the rest of the response up to the prompt
+
+    ALL = (CLEAR, WRITE, FIRST_BYTE, READ)
+
+
+class CommandMetrics:
+    """Metrics of a single command exchange"""
+
+    __slots__ = ("phases", "bytes_in", "bytes_out", "reads", "_started", "_mark", "_first_byte")
+
+    def __init__(self):
+        self.phases = dict.fromkeys(Phase.ALL, 0.0)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.reads = 0
+        self._started = self._mark = perf_counter()
+        self._first_byte = False
+
+    @property
+    def total(self) -> float:
+        return self._mark - self._started
+
+    def end_phase(self, phase: str):
+        """Adds the time since the end of the previous phase to the phase"""
+        now = perf_counter()
+        self.phases[phase] += now - self._mark
+        self._mark = now
+
+    def on_write(self, data: str | bytes):
+        self.bytes_out += len(data.encode() if isinstance(data, str) else data)
+
+    def on_read(self, data: bytes):
+        self.reads += 1
+        self.bytes_in += len(data)
+        if data and not self._first_byte:
+            self._first_byte = True
+            self.end_phase(Phase.FIRST_BYTE)
+
+
+class Histogram:
+    """Histogram of durations with exponential buckets from 0.1 ms"""
+
+    BOUNDS = tuple(0.0001 * 2 ** index for index in range(21))  # up to ~105 s
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, value: float):
+        index = next((index for index, bound in enumerate(self.BOUNDS) if value <= bound), len(self.BOUNDS))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction: float) -> float:
+        """Estimates the quantile as the upper bound of its bucket"""
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(self.BOUNDS[index], self.max) if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {f"le_{bound:g}": count for bound, count in zip(self.BOUNDS, self.counts) if count},
+        }
+
+
+class CommandStats:
+    """Aggregated metrics of a command on a device"""
+
+    def __init__(self):
+        self.total = Histogram()
+        self.phases = {phase: Histogram() for phase in Phase.ALL}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.reads = 0
+
+    def add(self, metrics: CommandMetrics):
+        self.total.add(metrics.total)
+        for phase, duration in metrics.phases.items():
+            self.phases[phase].add(duration)
+        self.bytes_in += metrics.bytes_in
+        self.bytes_out += metrics.bytes_out
+        self.reads += metrics.reads
+
+    def as_dict(self) -> dict:
+        return {
+            "total_s": self.total.as_dict(),
+            "phases_s": {phase: histogram.as_dict() for phase, histogram in self.phases.items()},
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "reads": self.reads,
+        }
+
+
+class MetricsRegistry:
+    """Process-wide metrics aggregated per device and command name"""
+
+    COMMAND_WORD = re.compile(r"/?[a-z][a-z0-9-]*")
+
+    def __init__(self):
+        self.enabled = False
+        self._stats: dict[str, dict[str, CommandStats]] = {}
+        self._lock = Lock()
+
+    def record(self, device: str, command: str, metrics: CommandMetrics):
+        """Adds the metrics of the finished command"""
+        name = self.command_name(command)
+        with self._lock:
+            self._stats.setdefault(device, {}).setdefault(name, CommandStats()).add(metrics)
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+    def as_dict(self) -> dict[str, dict[str, dict]]:
+        with self._lock:
+            return {
+                device: {name: stats.as_dict() for name, stats in commands.items()}
+                for device, commands in self._stats.items()
+            }
+
+    def export_json(self, path: Path):
+        """Saves the metrics to the JSON file"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as fobj:
+            json.dump(self.as_dict(), fobj, indent=2)
+
+    @classmethod
+    def command_name(cls, command: str) -> str:
+        """The command without its arguments, e.g. `ip address add` for
+        `ip address add address=10.0.0.1/24 interface=ether1`
+        """
+        words = []
+        for word in command.split():
+            if not cls.COMMAND_WORD.fullmatch(word):
+                break
+            words.append(word)
+        return " ".join(words) or command.strip()
+
+
+METRICS = MetricsRegistry()
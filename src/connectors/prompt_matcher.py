@@ -0,0 +1,57 @@
+"""Incremental shell prompt detection"""
+import re
+from codecs import getincrementaldecoder
+
+
+class PromptMatcher:
+    """Finds the shell prompt in the data fed chunk by chunk
+
+    Only a tail window of the decoded output, sized to the maximum prompt
+    length, is kept between the chunks. The cost of a chunk doesn't depend on
+    how much output has already been fed. Multibyte UTF-8 sequences split
+    between the chunks are kept by the incremental decoder until complete.
+    Undecodable bytes are escaped, so the offsets always map back to the raw
+    data.
+    """
+
+    ENCODING = "utf-8"
+    ERRORS = "surrogateescape"
+
+    def __init__(self, prompt: str, max_prompt_length: int = 512):
+        """Initializes the matcher
+        :param prompt: The prompt regular expression
+        :param max_prompt_length: The longest prompt expected, in characters
+        """
+        self._regexp = re.compile(prompt)
+        self._max_prompt_length = max_prompt_length
+        self._decoder = getincrementaldecoder(self.ENCODING)(self.ERRORS)
+        self._window = ""
+        self._window_offset = 0  # number of bytes before the window
+
+        self.start = -1
+        self.end = -1
+
+    def feed(self, data: bytes) -> int:
+        """Feeds the next chunk of data and searches for the prompt
+        :param data: The data read after the previously fed chunk
+        :return:
+            - end: The byte offset right after the prompt or -1 if not found
+        """
+        if self.end != -1:
+            return self.end
+
+        self._window += self._decoder.decode(data)
+        match = self._regexp.search(self._window)
+        if match is not None:
+            self.start = self._window_offset + self._byte_length(self._window[:match.start()])
+            self.end = self.start + self._byte_length(match.group())
+            return self.end
+
+        trimmed = len(self._window) - self._max_prompt_length
+        if trimmed > 0:
+            self._window_offset += self._byte_length(self._window[:trimmed])
+            self._window = self._window[trimmed:]
+        return -1
+
+    def _byte_length(self, text: str) -> int:
+        return len(text.encode(self.ENCODING, self.ERRORS))
@@ -0,0 +1,78 @@
+"""Timeline of a device reboot and the reachability checks used to follow it"""
+import socket
+from time import monotonic, sleep
+
+from src.connectors.exceptions import RebootTimeoutError
+
+
+class RebootReport:
+    """Seconds from the confirmed reboot command to every phase of the reboot
+
+    down: the device stopped serving, e.g. the SSH port is closed
+    up: the device booted, e.g. the SSH port or the login prompt is back
+    ready: logged in again and the connection is validated
+    """
+
+    PHASES = ("down", "up", "ready")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started_at = monotonic()
+        self.down: float | None = None
+        self.up: float | None = None
+        self.ready: float | None = None
+
+    def mark(self, phase: str):
+        """Records the time the phase was reached"""
+        setattr(self, phase, monotonic() - self.started_at)
+
+    @property
+    def downtime(self) -> float | None:
+        """Seconds the device was not usable, None until it is ready"""
+        if self.down is None or self.ready is None:
+            return None
+        return self.ready - self.down
+
+    def as_dict(self) -> dict[str, float | None]:
+        return {phase: getattr(self, phase) for phase in self.PHASES} | {"downtime": self.downtime}
+
+    def __repr__(self):
+        phases = ", ".join(f"{phase}={value:.3f}" for phase, value in self.as_dict().items() if value is not None)
+        return f"RebootReport({self.label}, {phases})"
+
+
+def port_reachable(host: str, port: int, timeout: float) -> bool:
+    """Checks that the TCP port accepts connections
+    :param host: The host
+    :param port: The TCP port
+    :param timeout: The timeout of the connection attempt
+    :return:
+        - reachable: Whether the connection was accepted
+    """
+    try:
+        with socket.create_connection((host, port), timeout):
+            return True
+    except OSError:
+        return False
+
+
+def wait_for_port(host: str, port: int, reachable: bool, phase: str, deadline: float, interval: float = 0.5):
+    """Polls the TCP port until it gets to the expected state
+    :param host: The host
+    :param port: The TCP port
+    :param reachable: Whether to wait for the port to open or to close
+    :param phase: The reboot phase used in the error message
+    :param deadline: The `monotonic` time to give up at
+    :param interval: Seconds between the attempts, also the timeout of
+        each attempt
+    :raises:
+        - RebootTimeoutError if the port is not in the state by the deadline
+    """
+    start = monotonic()
+    while True:
+        attempt_start = monotonic()
+        if port_reachable(host, port, interval) == reachable:
+            return
+        if attempt_start + interval >= deadline:
+            raise RebootTimeoutError(phase, deadline - start)
+        sleep(max(0.0, attempt_start + interval - monotonic()))
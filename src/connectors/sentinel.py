@@ -0,0 +1,163 @@
+"""Response boundaries of the commands sent between sentinel markers"""
+import re
+from uuid import uuid4
+
+from src.connectors.prompt_matcher import PromptMatcher
+
+
+class SentinelTracker:
+    """Finds the response of a command sent between two `:put`s of a unique
+    marker in the output fed chunk by chunk
+
+    The response starts after the first marker line, so the echoed command
+    line is never part of it, however the terminal wrapped it. RouterOS
+    stops the command line at the first error and prints the prompt:
+        - a syntax error, e.g. `bad command name`, is reported with its
+            position before anything runs. The error line is the response
+        - a runtime error, e.g. `failure:` or `no such item`, is printed
+            after the first marker. The response ends at the prompt instead
+            of the second marker
+    In every case the output is complete once the prompt after the response
+    is found. Only the tails needed to match across the chunks are kept, so
+    the tracker can follow outputs of any size.
+    """
+
+    ERROR_POSITION = re.compile(rb"\(line \d+ column \d+\)")
+    ERROR_COLUMN = re.compile(r"(\(line \d+ column )(\d+)\)")
+
+    def __init__(self, command: str, prompt: str, prefix: str = "__afw_", max_prompt_length: int = 512):
+        """Initializes the tracker
+        :param command: The string command
+        :param prompt: The prompt regular expression
+        :param prefix: The beginning of the marker
+        :param max_prompt_length: The longest prompt expected, in characters
+        """
+        marker = f"{prefix}{uuid4().hex[:16]}"
+        # The marker is split into two concatenated strings, so its echo
+        # doesn't match
+        head, tail = marker[:len(marker) // 2], marker[len(marker) // 2:]
+        put = f':put ("{head}" . "{tail}")'
+        self.command = command
+        self.marker = marker
+        self.wire_command = f"{put}; {command}; {put}"
+        self.column_offset = len(put) + 2  # the columns of the errors are counted in the wire command
+
+        self.start = -1  # the offsets of the response in the fed output
+        self.end = -1
+        self.done = -1  # the offset right after the prompt ending the output
+        self.failed = False
+        self.syntax_error = False
+
+        self._prompt = prompt
+        self._max_prompt_length = max_prompt_length
+        self._marker = marker.encode()
+        self._fed = 0
+        self._line = bytearray()  # the incomplete line before the response
+        self._tail = b""  # the end of the response fed so far, the marker may span it
+        self._line_start = 0  # the offset of the incomplete last line of the response
+        self._matcher: PromptMatcher | None = None
+        self._matcher_offset = 0
+
+    def feed(self, data: bytes) -> int:
+        """Feeds the next chunk of the output
+        :param data: The data received after the previously fed chunk
+        :return:
+            - done: The offset right after the prompt ending the output or
+                -1 if it has not arrived yet
+        """
+        position = self._fed
+        self._fed += len(data)
+        while data and self.done == -1:
+            if self.start == -1:
+                used = self._feed_head(data, position)
+            elif self.end == -1:
+                used = self._feed_response(data, position)
+            else:
+                used = self._feed_prompt(data)
+            data, position = data[used:], position + used
+        return self.done
+
+    def safe_end(self) -> int:
+        """The offset up to which the fed output is surely the response. The
+        tail that may be the beginning of the marker or of the prompt is
+        held back
+        :return:
+            - end: The offset or -1 if the response has not started yet
+        """
+        if self.end != -1 or self.start == -1:
+            return self.end
+        end = self._fed - len(self._marker) + 1
+        if self._fed - self._line_start < self._max_prompt_length:
+            end = min(end, self._line_start)
+        return max(self.start, end)
+
+    def response(self, output: bytes, base: int = 0) -> str:
+        """Extracts the response from the output
+        :param output: The fed output, at least up to the end of the response
+        :param base: The offset of the output in the fed output, when its
+            beginning was dropped
+        :return:
+            - response: The decoded response. The position of a syntax error
+                is given in the command, not in the wire command
+        """
+        response = bytes(output[self.start - base:self.end - base]).decode(errors="replace")
+        if self.syntax_error:
+            response = self.ERROR_COLUMN.sub(
+                lambda match: f"{match.group(1)}{max(1, int(match.group(2)) - self.column_offset)})", response
+            )
+        return response
+
+    def _feed_head(self, data: bytes, position: int) -> int:
+        """Looks for the first marker or a syntax error line by line"""
+        newline = data.find(b"\n")
+        if newline == -1:
+            self._line += data
+            return len(data)
+
+        line_end = position + newline + 1
+        line = self._line + data[:newline + 1]
+        self._line = bytearray()
+        if self._marker in line:
+            self.start = self._line_start = line_end
+            self._start_matcher(line_end)
+        elif self.ERROR_POSITION.search(line):
+            self.failed = self.syntax_error = True
+            self.start, self.end = line_end - len(line), line_end
+            self._start_matcher(line_end)
+        return newline + 1
+
+    def _feed_response(self, data: bytes, position: int) -> int:
+        """Looks for the second marker or the prompt after a runtime error"""
+        window = self._tail + data
+        found = window.find(self._marker)
+        marker_start = position - len(self._tail) + found
+        prompt_end = self._matcher.feed(data)
+        prompt_start = self._matcher_offset + self._matcher.start
+
+        if found != -1 and (prompt_end == -1 or marker_start < prompt_start):
+            self.end = marker_start
+            used = marker_start + len(self._marker) - position
+            self._start_matcher(position + used)
+            return used
+        if prompt_end != -1:
+            self.failed = True
+            self.end = prompt_start
+            self.done = self._matcher_offset + prompt_end
+            return len(data)
+
+        self._tail = window[-len(self._marker) + 1:]
+        newline = data.rfind(b"\n")
+        if newline != -1:
+            self._line_start = position + newline + 1
+        return len(data)
+
+    def _feed_prompt(self, data: bytes) -> int:
+        prompt_end = self._matcher.feed(data)
+        if prompt_end != -1:
+            self.done = self._matcher_offset + prompt_end
+        return len(data)
+
+    def _start_matcher(self, offset: int):
+        """Starts looking for the prompt in the output after the offset"""
+        self._matcher = PromptMatcher(self._prompt, self._max_prompt_length)
+        self._matcher_offset = offset
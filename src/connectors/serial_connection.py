@@ -1,37 +1,50 @@
 """Library to enable connection to the device through serial"""
-from time import sleep
+from time import monotonic, sleep
 
 import serial
 
 from config import stdout_logger
 from src.connectors.base_connection import BaseConnection
-from src.connectors.exceptions import ConnectionTestError
 
 
 class SerialConnection(BaseConnection):
     """Library to enable connection to the device through serial."""
 
+    LOGIN_PROMPT = "Login: "
+    SHUTDOWN_MESSAGE = r"Rebooting|will reboot"
+
     def __init__(
         self, port: int, username: str, password: str | None = None,
-        baudrate: int = 115200, timeout: float = 2
+        baudrate: int = 115200, timeout: float = 2, rtscts: bool = False,
+        xonxoff: bool = False, write_chunk_size: int = 256
     ):
         """Initializes the serial connection instance
 
         Let me root needs to be present on the device for this connection
         method to work.
+
+        Without flow control the writes are paced by the number of bytes
+        still queued for transmission, so at most `write_chunk_size` bytes
+        are in flight.
         """
         super().__init__()
 
         self.timeout = timeout
+        self.write_chunk_size = write_chunk_size
+        self.bytes_written = 0
+        self.write_time = 0.0
 
         self.connection = serial.Serial()
         self.connection.port = port
         self.connection.baudrate = baudrate
+        self.connection.rtscts = rtscts
+        self.connection.xonxoff = xonxoff
         self.username = username
         self.password = password
         self.set_read_timeout(timeout)
 
         self.prompt = self.SHELL_PROMPT
+        self.metrics_label = str(port)
 
     def login(self):
         # Enter newline to check for login prompt
@@ -43,34 +56,38 @@ class SerialConnection(BaseConnection):
         response = self.read(200).decode()
 
         # Check for login prompt and login
-        if "Login: " in response:
+        if self.LOGIN_PROMPT in response:
             self.clear_output_buffer()
-            self.writeln(self.username)
-            self.read_until("Password: ")
-            self.writeln(self.password)
+            self._enter_credentials()
         else:
             self.writeln()
 
+    def _enter_credentials(self, timeout: float = 5):
+        """Answers the `Login:` prompt shown by the console"""
+        self.writeln(self.username)
+        self.read_until("Password: ", timeout)
+        self.writeln(self.password)
+
     def open_connection(self):
         """Opens the serial connection
         :raises:
             - ConnectionTestError if the login to the shell and echo command is not
                 successful
         """
-        stdout_logger.info(f"Connecting to device {self.connection.port} {self.connection.baudrate}")
+        stdout_logger.info("Connecting to device {} {}", self.connection.port, self.connection.baudrate)
         self.connection.open()
         self.login()
 
-        success, response = self._run_test_command()
-        if not success:
-            raise ConnectionTestError(response)
+        self.validate_connection()
         stdout_logger.success("Connection established\n")
 
     def close_connection(self):
         """Closes the connection."""
-        stdout_logger.info(f"Closing connection to device {self.connection.port}")
+        stdout_logger.info("Closing connection to device {}", self.connection.port)
+        self._established = False  # closed on purpose, not reconnected
         if self.is_connected():
             self.clear_output_buffer()
+        self._close_selector()
         self.connection.close()
         stdout_logger.success("Connection closed\n")
 
@@ -78,19 +95,81 @@ class SerialConnection(BaseConnection):
         """Checks the connection status."""
         return self.connection.is_open
 
-    def reboot(self):
-        self.writeln("reboot")
-        self.read_until("login: ", timeout=180)
+    def _wait_for_shutdown(self, deadline: float):
+        """Watches the console output for the shutdown message"""
+        self.read_until_regexp(self.SHUTDOWN_MESSAGE, deadline - monotonic())
 
-        self.check_and_login()
+    def _wait_for_boot(self, deadline: float):
+        """Watches the boot log for the login prompt"""
+        self.read_until(self.LOGIN_PROMPT, deadline - monotonic())
+
+    def _log_in_after_reboot(self, deadline: float):
+        """Logs in at the login prompt already read from the boot log"""
+        self._enter_credentials(max(0.0, deadline - monotonic()))
+        self.validate_connection()
 
     def write(self, data: str):
         """Writes the data to the shell
+        With RTS/CTS or XON/XOFF flow control the driver paces the data,
+        otherwise it is written in chunks once the previous chunk is sent.
+        The write time counts until the driver sent the last byte, so the
+        throughput is not inflated by the bytes still buffered.
         :param data: Data to write to the shell
         """
-        self.connection.write(data.encode())
-        self.connection.flush()
-        sleep(0.05)  # implicit sleep for all writes
+        payload = data.encode()
+        start = monotonic()
+        if self.connection.rtscts or self.connection.xonxoff:
+            self.connection.write(payload)
+        else:
+            for offset in range(0, len(payload), self.write_chunk_size):
+                self._wait_until_sent()
+                self.connection.write(payload[offset:offset + self.write_chunk_size])
+        self._drain()
+        self.bytes_written += len(payload)
+        self.write_time += monotonic() - start
+
+    def write_lines(self, lines: list[str], wait_for_echo: bool = False, timeout: float = 5):
+        """Writes the lines to the shell
+        :param lines: The lines without line endings
+        :param wait_for_echo: Write the next line only after the device
+            echoed the previous one. Otherwise all the lines are coalesced
+            into one write
+        :param timeout: The timeout of each echo
+        """
+        if not wait_for_echo:
+            self.write("".join(f"{line}\r\n" for line in lines))
+            return
+
+        for line in lines:
+            self.writeln(line)
+            self.read_until(line, timeout)
+
+    def _wait_until_sent(self):
+        """Sleeps for the time needed to transmit the queued bytes"""
+        queued = self.connection.out_waiting
+        if queued:
+            sleep(queued / self.line_rate())
+
+    def _drain(self):
+        """Waits until the driver transmitted all the queued bytes"""
+        while queued := self.connection.out_waiting:
+            sleep(queued / self.line_rate())
+
+    def line_rate(self) -> float:
+        """The theoretical throughput of the line in bytes per second"""
+        bits_per_byte = 1 + self.connection.bytesize + self.connection.stopbits
+        if self.connection.parity != serial.PARITY_NONE:
+            bits_per_byte += 1
+        return self.connection.baudrate / bits_per_byte
+
+    def write_throughput(self) -> tuple[float, float]:
+        """Measures the throughput of the writes done so far
+        :return:
+            - throughput: The write throughput in bytes per second
+            - efficiency: The throughput relative to the line rate
+        """
+        throughput = self.bytes_written / self.write_time if self.write_time else 0.0
+        return throughput, throughput / self.line_rate()
 
     def read(self, count: int = 1) -> bytes:
         """Reads the data from the shell"""
@@ -99,6 +178,22 @@ class SerialConnection(BaseConnection):
             data = self.connection.read(count)
         return data
 
+    def read_available(self) -> bytes:
+        """Reads everything waiting in the serial input buffer"""
+        data = b""
+        waiting = self.connection.in_waiting
+        if waiting:
+            data = self.connection.read(waiting)
+        return data
+
+    def fileno(self) -> int | None:
+        """The file descriptor of the serial port, None when closed or on
+        platforms where the port has no descriptor
+        """
+        if not self.connection.is_open or not hasattr(self.connection, "fileno"):
+            return None
+        return self.connection.fileno()
+
     def output_available(self) -> bool:
         """The status of the output buffer for reads"""
         return bool(self.connection.in_waiting)
@@ -1,44 +1,74 @@
 """Library to enable connection to the device through SSH"""
-import logging
 import os
+import socket
+from collections.abc import Iterator
+from enum import Enum
+from pathlib import Path
+from time import monotonic
 
-from paramiko import AutoAddPolicy, SSHClient
+from paramiko import AutoAddPolicy, SFTPClient, SSHClient, SSHException
 from paramiko.channel import Channel
 from paramiko.config import SSHConfig
 
-from config import stdout_logger
-from src.connectors.base_connection import BaseConnection
-from src.connectors.exceptions import ConnectionTestError, ReadTimeoutError
+from config import set_paramiko_log_level, stdout_logger
+from src.connectors.base_connection import BaseConnection, OutputSplitter, SyncMode
+from src.connectors.captured_output import CapturedOutput
+from src.connectors.exceptions import ConnectionClosedError, ReadTimeoutError
+from src.connectors.metrics import METRICS, CommandMetrics, Phase
+from src.connectors.reboot import RebootReport, wait_for_port
+
+set_paramiko_log_level()
+
+
+class SSHMode(Enum):
+    """How the commands are run
+
+    SHELL: in an interactive shell, the responses are found by the prompt
+    EXEC: each command in its own exec channel, the response is everything
+        printed until the channel is closed
+    """
+    SHELL = "shell"
+    EXEC = "exec"
 
 
 class SSHConnection(BaseConnection):
     """Library to enable connection to the device through SSH."""
 
+    RECONNECT_ERRORS = (*BaseConnection.RECONNECT_ERRORS, SSHException)
+    supports_sftp = True
+    SFTP_WINDOW_SIZE = 64 * 1024 * 1024  # keeps the prefetched reads flowing on links with a long round trip
+
     def __init__(
         self, ip_address: str, username: str, password: str | None = None,
-        port: int = 22, timeout: float = 10
+        port: int = 22, timeout: float = 10, mode: SSHMode = SSHMode.SHELL,
+        keepalive_interval: int = 0
     ):
         """Initializes the SSH connection
 
         Let me root needs to be present on the device for this connection
         method to work.
+
+        With `keepalive_interval` the transport sends a keepalive every
+        that many seconds of silence, so a dead link is noticed by
+        `is_alive` without sending a command.
         """
         super().__init__()
 
+        self.mode = mode
         self.ip_address = ip_address
         self.port = port
         self.username = username
         self.password = password
         self.timeout = timeout
+        self.keepalive_interval = keepalive_interval
 
         self.client = SSHClient()
         self.client.set_missing_host_key_policy(AutoAddPolicy())
         self.shell = None
+        self._sftp: SFTPClient | None = None
 
         self.prompt = self.SHELL_PROMPT
-
-        logging.basicConfig()
-        logging.getLogger("paramiko").setLevel(logging.DEBUG)
+        self.metrics_label = f"{ip_address}:{port}"
 
     @staticmethod
     def get_config_file() -> SSHConfig | None:
@@ -63,7 +93,7 @@ class SSHConnection(BaseConnection):
             - ConnectionTestError if the login to the shell and echo command is not
                 successful
         """
-        stdout_logger.info(f"Connecting to device {self.ip_address}:{self.port}")
+        stdout_logger.info("Connecting to device {}:{}", self.ip_address, self.port)
         self.client.connect(
             hostname=self.ip_address,
             port=self.port,
@@ -73,13 +103,17 @@ class SSHConnection(BaseConnection):
             look_for_keys=False,
             allow_agent=False
         )
+        # Commands and exec channel requests are small packets, don't let
+        # Nagle's algorithm hold them back waiting for delayed ACKs
+        self.client.get_transport().sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.keepalive_interval:
+            self.client.get_transport().set_keepalive(self.keepalive_interval)
 
-        self.shell = self._create_shell()
-        self.set_read_timeout(self.timeout)
+        if self.mode is SSHMode.SHELL:
+            self.shell = self._create_shell()
+            self.set_read_timeout(self.timeout)
 
-        success, response = self._run_test_command()
-        if not success:
-            raise ConnectionTestError(response)
+        self.validate_connection()
         stdout_logger.success("Connection established\n")
 
     def is_connected(self) -> bool:
@@ -88,21 +122,205 @@ class SSHConnection(BaseConnection):
             return self.client.get_transport().is_active()
         return False
 
+    def is_alive(self) -> bool:
+        """Checks that the transport and the shell channel are open"""
+        if self.mode is SSHMode.EXEC:
+            return self.is_connected()
+        return self.is_connected() and self.shell is not None and not self.shell.closed
+
+    def ping(self, timeout: float = 2) -> bool:
+        """Checks the connection with an empty line in the shell mode. In the
+        exec mode an SSH ignore message is sent, the transport fails it if
+        the link is down
+        """
+        if self.mode is SSHMode.SHELL:
+            return super().ping(timeout)
+        if not self.is_connected():
+            return False
+        try:
+            self.client.get_transport().send_ignore()
+        except self.RECONNECT_ERRORS:
+            return False
+        return True
+
+    @property
+    def sftp(self) -> SFTPClient:
+        """SFTP session on the transport of the connection, opened on the
+        first use and reopened after a reconnect
+        """
+        if self._sftp is None or self._sftp.sock.closed:
+            self._sftp = SFTPClient.from_transport(self.client.get_transport(), window_size=self.SFTP_WINDOW_SIZE)
+        return self._sftp
+
     def _create_shell(self) -> Channel:
         shell = self.client.invoke_shell(term="vt100", width=512, height=24)
         return shell
 
+    def _send_reboot(self, timeout: float) -> RebootReport:
+        if self.shell is None:  # the exec mode, the confirmation needs a shell
+            self.shell = self._create_shell()
+        return super()._send_reboot(timeout)
+
+    def _wait_for_shutdown(self, deadline: float):
+        """Polls the SSH port until the device stops accepting connections.
+        The session itself may be left open by a device shutting down
+        """
+        wait_for_port(self.ip_address, self.port, False, "down", deadline, self.reboot_poll_interval)
+        self._close_selector()
+        self.client.close()
+        self.shell = None
+
+    def _wait_for_boot(self, deadline: float):
+        """Polls the SSH port until the device accepts connections again"""
+        wait_for_port(self.ip_address, self.port, True, "up", deadline, self.reboot_poll_interval)
+
     def close_connection(self):
         """Closes the connection."""
-        stdout_logger.info(f"Closing connection to device {self.ip_address}:{self.port}")
-        if self.is_connected():
+        stdout_logger.info("Closing connection to device {}:{}", self.ip_address, self.port)
+        self._established = False  # closed on purpose, not reconnected
+        if self.is_connected() and self.mode is SSHMode.SHELL:
             try:
                 self.send_command("quit", timeout=1)
-            except ReadTimeoutError:
+            except (ReadTimeoutError, *self.RECONNECT_ERRORS):
                 stdout_logger.info("Console is no longer accessible")
+        self._close_selector()
+        self._sftp = None
         self.client.close()
         stdout_logger.success("Connection closed\n")
 
+    def send_command(
+        self, command: str, timeout: float = 15, strip: bool = True, sync_mode: SyncMode | None = None
+    ) -> str:
+        """Sends a command and waits for the response within the desired
+        timeout. In the exec mode the command runs in a new channel and
+        doesn't wait for the other commands, the response ends when the
+        channel is closed.
+        See `BaseConnection.send_command`
+        :raises:
+            - ValueError if `sync_mode` is set in the exec mode
+        """
+        if self.mode is SSHMode.SHELL:
+            return super().send_command(command, timeout, strip, sync_mode)
+        if sync_mode is not None:
+            raise ValueError("sync_mode applies to the shell mode only")
+        return self._with_reconnect(self._send_exec_command, command, timeout, strip)
+
+    def _send_exec_command(self, command: str, timeout: float, strip: bool) -> str:
+        stdout_logger.info("=> {}", command)
+        # The exec channels run concurrently, the metrics are kept per call
+        metrics = CommandMetrics() if METRICS.enabled else None
+        response = self._exec_command(command, timeout, metrics)
+        if metrics is not None:
+            METRICS.record(self.metrics_label, command, metrics)
+        response = response.strip() if strip else response
+        stdout_logger.info("=< {}", response)
+
+        return response
+
+    def send_commands(
+        self, commands: list[str], timeout: float = 15, strip: bool = True, pipeline_depth: int | None = None
+    ) -> list[str]:
+        """Sends the commands, see `BaseConnection.send_commands`. In the
+        exec mode the commands run one by one, each in its own channel, and
+        `pipeline_depth` is ignored
+        """
+        if self.mode is SSHMode.SHELL:
+            return super().send_commands(commands, timeout, strip, pipeline_depth)
+        return [self.send_command(command, timeout, strip) for command in commands]
+
+    def send_command_stream(self, command: str, timeout: float = 15, lines: bool = True) -> Iterator[str]:
+        """Sends a command and yields its output as it arrives, see
+        `BaseConnection.send_command_stream`. In the exec mode closing the
+        generator closes the exec channel.
+        """
+        if self.mode is SSHMode.SHELL:
+            yield from super().send_command_stream(command, timeout, lines)
+            return
+
+        stdout_logger.info("=> {}", command)
+        splitter = OutputSplitter(lines, self.READ_CHUNK_SIZE)
+        with self.client.get_transport().open_session(timeout=timeout) as channel:
+            channel.set_combine_stderr(True)
+            channel.exec_command(command)
+            channel.settimeout(timeout)
+            while True:
+                try:
+                    data = channel.recv(self.READ_CHUNK_SIZE)
+                except socket.timeout:
+                    raise ReadTimeoutError("end of output", "", timeout) from None
+                if not data:
+                    break
+                yield from splitter.feed(data)
+            yield from splitter.flush()
+
+    def capture_command(
+        self, command: str, timeout: float = 15, max_memory: int = 1024 * 1024, spill_dir: Path | None = None
+    ) -> CapturedOutput:
+        """Sends a command and captures its raw output with a bounded
+        amount of memory, see `BaseConnection.capture_command`. In the exec
+        mode the output is everything printed until the channel is closed
+        """
+        if self.mode is SSHMode.SHELL:
+            return super().capture_command(command, timeout, max_memory, spill_dir)
+
+        stdout_logger.info("=> {}", command)
+        output = CapturedOutput(max_memory, spill_dir)
+        try:
+            with self.client.get_transport().open_session(timeout=timeout) as channel:
+                channel.set_combine_stderr(True)
+                channel.exec_command(command)
+                channel.settimeout(timeout)
+                while True:
+                    try:
+                        data = channel.recv(self.READ_CHUNK_SIZE)
+                    except socket.timeout:
+                        raise ReadTimeoutError("end of output", f"<{output.size} bytes captured>", timeout) from None
+                    if not data:
+                        break
+                    output.write(data)
+            output.finish()
+        except BaseException:
+            output.close()
+            raise
+
+        stdout_logger.info("=< {} bytes captured", len(output))
+        return output
+
+    def _exec_command(self, command: str, timeout: float, metrics: CommandMetrics | None = None) -> str:
+        """Runs the command in a new exec channel on the existing transport
+        and reads stdout and stderr until the channel is closed
+        :param command: The string command
+        :param timeout: The timeout
+        :param metrics: The metrics of the command to fill in
+        :return:
+            - output: The command output
+        :raises:
+            - ReadTimeoutError if the channel isn't closed in time
+        """
+        max_time = monotonic() + timeout
+        output = bytearray()
+        with self.client.get_transport().open_session(timeout=timeout) as channel:
+            channel.set_combine_stderr(True)
+            channel.exec_command(command)
+            self._response_started = True  # the command runs once the exec request is accepted, per thread
+            if metrics is not None:
+                metrics.on_write(command)
+                metrics.end_phase(Phase.WRITE)
+            while (remaining := max_time - monotonic()) > 0:
+                channel.settimeout(remaining)
+                try:
+                    data = channel.recv(self.READ_CHUNK_SIZE)
+                except socket.timeout:
+                    break
+                if metrics is not None:
+                    metrics.on_read(data)
+                if not data:
+                    if metrics is not None:
+                        metrics.end_phase(Phase.READ)
+                    return output.decode(errors="replace")
+                output += data
+        raise ReadTimeoutError("end of output", output.decode(errors="replace").strip(), timeout)
+
     def write(self, data: str):
         """Writes the data to the shell
         :param data: Data to write to the shell
@@ -120,6 +338,23 @@ class SSHConnection(BaseConnection):
             data = self.shell.recv(count)
         return data
 
+    def read_available(self) -> bytes:
+        """Reads everything the shell has already received
+        :return:
+            - data: The data read (bytes)
+        :raises:
+            - ConnectionClosedError if the shell is closed and drained
+        """
+        if self.shell.recv_ready():
+            return self.shell.recv(self.READ_CHUNK_SIZE)
+        if self.shell.closed or self.shell.eof_received:
+            raise ConnectionClosedError()
+        return b""
+
+    def fileno(self) -> int | None:
+        """The file descriptor of the shell channel"""
+        return self.shell.fileno() if self.shell is not None else None
+
     def output_available(self) -> bool:
         """The status of the output buffer for reads."""
         return self.shell.recv_ready()
@@ -129,10 +364,12 @@ class SSHConnection(BaseConnection):
         :return:
             - timeout: The timeout in seconds (int, float)
         """
-        return self.shell.gettimeout()
+        return self.shell.gettimeout() if self.shell is not None else self.timeout
 
     def set_read_timeout(self, timeout: float):
         """Sets the read timeout
         :param timeout: The timeout in seconds (int, float)
         """
-        self.shell.settimeout(timeout)
+        self.timeout = timeout
+        if self.shell is not None:
+            self.shell.settimeout(timeout)
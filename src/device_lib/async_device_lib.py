@@ -0,0 +1,74 @@
+from typing import TYPE_CHECKING
+
+from src.connectors import ConnectionType
+from src.device_lib.device_lib import Command, CommandLib, DeviceConnection
+from src.device_lib.print_parser import PrintOutput, parse_print
+
+if TYPE_CHECKING:
+    from src.connectors import AsyncBaseConnection
+
+
+class AsyncCommand(Command):
+    __slots__ = ()
+
+    async def __call__(self, *args, **kwargs) -> str:
+        arguments = " ".join(args)
+        command = f"{self.name} {arguments}"
+
+        response = self._get_cached(command)
+        if response is None:
+            try:
+                response = await self.connection.send_command(command)
+            finally:
+                self._invalidate_cache(command)
+            self._put_cached(command, response)
+        return response
+
+    async def records(self, *args) -> PrintOutput:
+        return parse_print(await self(*args))
+
+
+class AsyncDeviceConnection(DeviceConnection):
+    """Device connection opened and closed by the event loop
+
+    The connection is not opened on creation. Use `open_connection` or
+    `async with`.
+    """
+
+    asynchronous = True
+
+    def __init__(self, connection_type: ConnectionType, device_name: str):
+        self.device_name = device_name
+        self.device = self._get_device(device_name)
+        self.connection: "AsyncBaseConnection" = self._create_connection(connection_type)
+
+    def __del__(self):
+        """The blocking connection closes itself when destroyed"""
+
+    async def __aenter__(self):
+        await self.open_connection()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close_connection()
+
+    async def open_connection(self):
+        await self.connection.open_connection()
+
+    async def close_connection(self):
+        await self.connection.close_connection()
+
+
+class AsyncDeviceLib(AsyncDeviceConnection, CommandLib):
+    """Asyncio counterpart of `DeviceLib`
+
+    Example:
+        async with AsyncDeviceLib(ConnectionType.SSH, "dummy_device") as lib:
+            await lib.system.identity.print()
+    """
+
+    command_class = AsyncCommand
+
+    def __init__(self, connection_type: ConnectionType, device_name: str):
+        super().__init__(connection_type, device_name)
+        self._commands = self._load_commands()
@@ -0,0 +1,75 @@
+"""Command grammar compiled once per process and shared by all the libraries"""
+from collections.abc import Mapping
+from functools import cache
+from pathlib import Path
+from types import MappingProxyType
+
+from config import load_yaml
+
+CACHEABLE_KEY = "_cacheable"
+
+
+class CommandNode:
+    """Immutable node of the command tree, not bound to any connection
+
+    The tree is built from the commands yaml, where every key is a command
+    and its value holds the sub-commands. Keys starting with `_` are the
+    options of the command, e.g. `_cacheable: true`.
+    """
+
+    __slots__ = ("name", "path", "cacheable", "children")
+
+    def __init__(self, name: str, path: str, cacheable: bool, children: Mapping[str, "CommandNode"]):
+        """Initializes the node
+        :param name: The command name, e.g. `print`
+        :param path: The full command, e.g. `system identity print`
+        :param cacheable: Whether the response can be cached
+        :param children: The sub-commands by their names
+        """
+        self.name = name
+        self.path = path
+        self.cacheable = cacheable
+        self.children = MappingProxyType(dict(children))
+
+    def __repr__(self):
+        return f"CommandNode({self.path!r}, children={len(self.children)})"
+
+    def find(self, path: str) -> "CommandNode | None":
+        """Finds the sub-command by its path relative to the node
+        :param path: The sub-command names separated by spaces
+        :return:
+            - node: The sub-command or None if it doesn't exist
+        """
+        node = self
+        for name in path.split():
+            node = node.children.get(name)
+            if node is None:
+                return None
+        return node
+
+
+def compile_commands(raw_commands: dict | None, name: str = "", path: str = "") -> CommandNode:
+    """Builds the command tree from the parsed yaml
+    :param raw_commands: The commands and their sub-commands
+    :param name: The command name of the root node
+    :param path: The full command of the root node
+    :return:
+        - root: The root node holding the top level commands
+    """
+    raw_commands = raw_commands or {}
+    children = {
+        sub_name: compile_commands(sub_commands, sub_name, f"{path} {sub_name}".lstrip())
+        for sub_name, sub_commands in raw_commands.items()
+        if not sub_name.startswith("_")
+    }
+    return CommandNode(name, path, bool(raw_commands.get(CACHEABLE_KEY, False)), children)
+
+
+@cache
+def load_command_tree(commands_yaml: Path) -> CommandNode:
+    """Loads and compiles the commands yaml, once per process
+    :param commands_yaml: The path of the commands yaml
+    :return:
+        - root: The root node holding the top level commands
+    """
+    return compile_commands(load_yaml(commands_yaml))
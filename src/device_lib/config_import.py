@@ -0,0 +1,157 @@
+"""Loading of RouterOS scripts, e.g. exported configurations, in bulk
+
+Over SSH the script is uploaded through SFTP on the transport of the
+connection and loaded by one `/import`. Connections without file transfer,
+like serial, paste the commands of the script pipelined, see
+`BaseConnection.send_commands`, so there is no round trip per line either.
+The errors are reported with the line numbers of the script in both cases,
+a pasted command stops at its first error like any command line does.
+"""
+import re
+from io import BytesIO
+from time import monotonic
+from uuid import uuid4
+
+from config import stdout_logger
+from src.connectors import BaseConnection
+
+ERROR_POSITION = re.compile(r"(?P<message>.*?)\s*\(line (?P<line>\d+) column (?P<column>\d+)\)")
+# the errors RouterOS prints without a position, e.g. of the runtime checks
+ERROR_LINE = re.compile(
+    r"\s*(?P<message>(?:failure:|Script Error|no such item|input does not match|invalid value|ambiguous value"
+    r"|value of \S+ out of range|expected |not enough permissions|already have|couldn't).*)"
+)
+
+
+class ScriptError:
+    """Error of a script line, the position is None if RouterOS didn't
+    report it
+    """
+
+    def __init__(self, message: str, line: int | None = None, column: int | None = None):
+        self.message = message
+        self.line = line
+        self.column = column
+
+    def __eq__(self, other):
+        return isinstance(other, ScriptError) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return f"ScriptError({self.message!r}, line={self.line}, column={self.column})"
+
+
+class ImportResult:
+    """Outcome of a script import"""
+
+    def __init__(self, method: str, output: str, errors: list[ScriptError], duration: float):
+        """Initializes the result
+        :param method: `sftp` or `paste`
+        :param output: The output of the import
+        :param errors: The errors found in the output
+        :param duration: Seconds the upload and the import took
+        """
+        self.method = method
+        self.output = output
+        self.errors = errors
+        self.duration = duration
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __repr__(self):
+        return f"ImportResult({self.method}, errors={self.errors}, duration={self.duration:.3f})"
+
+
+def script_commands(script: str) -> list[tuple[int, str]]:
+    """Splits the script into the commands, joining the lines continued
+    with a trailing backslash and skipping the comments and empty lines
+    :param script: The script text
+    :return:
+        - commands: The line number where each command starts and the command
+    """
+    commands = []
+    start = None
+    command = ""
+    for number, line in enumerate(script.splitlines(), 1):
+        if start is None:
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            start = number
+        else:
+            line = line.lstrip()
+        if line.endswith("\\"):
+            command += line[:-1]
+            continue
+        commands.append((start, command + line))
+        start = None
+        command = ""
+    if start is not None:
+        commands.append((start, command))
+    return commands
+
+
+def parse_import_output(output: str, first_line: int = 1) -> list[ScriptError]:
+    """Finds the errors in the output of an import or of pasted commands
+    :param output: The output
+    :param first_line: The script line the reported line 1 stands for
+    :return:
+        - errors: The errors in the order of the output
+    """
+    errors = []
+    for line in output.splitlines():
+        if position := ERROR_POSITION.search(line):
+            errors.append(ScriptError(
+                position.group("message").strip(), int(position.group("line")) + first_line - 1,
+                int(position.group("column"))
+            ))
+        elif error := ERROR_LINE.match(line):
+            errors.append(ScriptError(error.group("message").strip()))
+    return errors
+
+
+def import_script(
+    connection: BaseConnection, script: str, timeout: float = 300, file_name: str | None = None
+) -> ImportResult:
+    """Loads the script on the device, uploaded and imported if the
+    connection supports SFTP, pasted otherwise
+    :param connection: The connection to the device
+    :param script: The script text
+    :param timeout: Seconds for the import
+    :param file_name: The name of the uploaded file. A unique one if not set
+    :return:
+        - result: The output and the errors of the import
+    """
+    start = monotonic()
+    if connection.supports_sftp:
+        file_name = file_name or f"afw_{uuid4().hex[:12]}.rsc"
+        try:
+            connection.sftp.putfo(BytesIO(script.encode()), file_name)
+        except connection.RECONNECT_ERRORS as error:  # e.g. SFTP disabled on the device
+            stdout_logger.warning("Failed to upload {}, pasting the script: {!r}", file_name, error)
+        else:
+            try:
+                output = connection.send_command(f"/import file-name={file_name}", timeout)
+            finally:
+                _remove_script(connection, file_name)
+            return ImportResult("sftp", output, parse_import_output(output), monotonic() - start)
+
+    commands = script_commands(script)
+    responses = connection.send_commands([command for _, command in commands], timeout)
+    errors = []
+    for (line, _), response in zip(commands, responses):
+        for error in parse_import_output(response, line):
+            if error.line is None:  # the response is of the command of this line
+                error.line = line
+            errors.append(error)
+    return ImportResult("paste", "\n".join(responses), errors, monotonic() - start)
+
+
+def _remove_script(connection: BaseConnection, file_name: str):
+    """Removes the uploaded script. A failure is only logged, so it doesn't
+    hide the error of the import on a lost connection
+    """
+    try:
+        connection.sftp.remove(file_name)
+    except connection.RECONNECT_ERRORS as error:
+        stdout_logger.warning("Failed to remove {}: {!r}", file_name, error)
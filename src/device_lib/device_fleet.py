@@ -0,0 +1,199 @@
+"""Parallel command dispatch across many devices"""
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from config import stdout_logger
+from src.connectors import ConnectionPool, ConnectionType, RateLimiter
+from src.device_lib.device_lib import DeviceLib
+from src.device_lib.exceptions import NoSuchDeviceError
+from src.device_lib.response_cache import ResponseCache
+from src.devices import DEVICES
+
+
+class FleetResult:
+    """Result of an action on one device of the fleet"""
+
+    def __init__(self, device_name: str, value: Any = None, error: Exception | None = None):
+        self.device_name = device_name
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        outcome = repr(self.value) if self.ok else f"error={self.error!r}"
+        return f"FleetResult({self.device_name}, {outcome})"
+
+
+class DeviceFleet:
+    """Connections to a set of devices from the inventory, driven in parallel
+
+    Connecting and running commands happen concurrently on a pool of at most
+    `max_workers` threads, so the wall time for N devices is about the time
+    of the slowest device. Errors don't stop the other devices, they are
+    returned in the per-device results.
+
+    Example:
+        with DeviceFleet(ConnectionType.SSH, ["router_1", "router_2"]) as fleet:
+            results = fleet.send_command("system identity print")
+    """
+
+    lib_class = DeviceLib
+
+    def __init__(
+        self, connection_type: ConnectionType, device_names: Iterable[str] | None = None,
+        max_workers: int = 16, pool: ConnectionPool | None = None, response_cache: ResponseCache | None = None
+    ):
+        """Initializes the fleet. Connections are opened by `open`
+        :param connection_type: The connection type used for all devices
+        :param device_names: The devices from the inventory. All if not set
+        :param max_workers: The number of devices handled at the same time
+        :param pool: The pool to take the connections from and return them to
+        :param response_cache: The cache shared by the devices, see `DeviceLib`
+        """
+        self.connection_type = connection_type
+        self.device_names = list(DEVICES if device_names is None else device_names)
+        for device_name in self.device_names:
+            if device_name not in DEVICES:
+                raise NoSuchDeviceError(device_name)
+
+        self.max_workers = max_workers
+        self.pool = pool
+        self.response_cache = response_cache
+        self.libs: dict[str, DeviceLib] = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self) -> dict[str, FleetResult]:
+        """Connects to all the devices concurrently
+        :return:
+            - results: Per-device results, failed devices are left out of
+                the fleet
+        """
+        results = self._run_parallel(
+            self.device_names, lambda device_name: self.lib_class(
+                self.connection_type, device_name, self.pool, self.response_cache
+            )
+        )
+        for device_name, result in results.items():
+            if result.ok:
+                self.libs[device_name] = result.value
+            else:
+                stdout_logger.error("Failed to connect to {}: {}", device_name, result.error)
+        return results
+
+    def close(self):
+        """Closes the connections to all the devices concurrently or returns
+        them to the pool
+        """
+        self._run_parallel(list(self.libs), lambda device_name: self.libs[device_name].close())
+        self.libs.clear()
+
+    def send_command(self, command: str | dict[str, str], timeout: float = 15) -> dict[str, FleetResult]:
+        """Sends the command to all the connected devices in parallel
+        :param command: The command for all the devices or the mapping of
+            device name to its command
+        :param timeout: The timeout of each command
+        :return:
+            - results: Per-device results holding the responses
+        """
+        commands = command if isinstance(command, dict) else dict.fromkeys(self.libs, command)
+        return self._run_parallel(
+            list(commands), lambda device_name: self.libs[device_name].send_command(commands[device_name], timeout)
+        )
+
+    def import_config(
+        self, script: str | Path | dict[str, str | Path], timeout: float = 300
+    ) -> dict[str, FleetResult]:
+        """Loads the script on all the connected devices in parallel, see
+        `DeviceLib.import_config`
+        :param script: The script for all the devices or the mapping of
+            device name to its script
+        :param timeout: Seconds for the import on each device
+        :return:
+            - results: Per-device results holding the `ImportResult`s
+        """
+        scripts = script if isinstance(script, dict) else dict.fromkeys(self.libs, script)
+        return self._run_parallel(
+            list(scripts), lambda device_name: self.libs[device_name].import_config(scripts[device_name], timeout)
+        )
+
+    def upload_file(
+        self, local_path: Path, remote_path: str | None = None, bandwidth: float | None = None
+    ) -> dict[str, FleetResult]:
+        """Uploads the file to all the connected devices in parallel, see
+        `DeviceLib.upload_file`
+        :param local_path: The file to upload
+        :param remote_path: The path on the devices, the file name if not set
+        :param bandwidth: The cap of the combined throughput of all the
+            uploads in bytes per second, not limited if not set
+        :return:
+            - results: Per-device results holding the `TransferResult`s
+        """
+        rate_limiter = None if bandwidth is None else RateLimiter(bandwidth)
+        return self._run_parallel(list(self.libs), lambda device_name: self.libs[device_name].upload_file(
+            local_path, remote_path, rate_limiter
+        ))
+
+    def download_file(
+        self, remote_path: str, local_dir: Path, bandwidth: float | None = None
+    ) -> dict[str, FleetResult]:
+        """Downloads the file from all the connected devices in parallel to
+        `local_dir/<device name>/<file name>`, see `DeviceLib.download_file`
+        :param remote_path: The path on the devices
+        :param local_dir: The directory of the downloaded files
+        :param bandwidth: The cap of the combined throughput of all the
+            downloads in bytes per second, not limited if not set
+        :return:
+            - results: Per-device results holding the `TransferResult`s
+        """
+        rate_limiter = None if bandwidth is None else RateLimiter(bandwidth)
+        return self._run_parallel(list(self.libs), lambda device_name: self.libs[device_name].download_file(
+            remote_path, Path(local_dir) / device_name / Path(remote_path).name, rate_limiter
+        ))
+
+    def reboot(self, timeout: float = 180) -> dict[str, FleetResult]:
+        """Reboots all the connected devices at once and logs in to each
+        one as soon as it is back, so the wall time is about the time of the
+        slowest device
+        :param timeout: Seconds for the whole reboot of each device
+        :return:
+            - results: Per-device results holding the `RebootReport`s
+        """
+        results = self._run_parallel(list(self.libs), lambda device_name: self.libs[device_name].reboot(timeout))
+        for device_name, result in results.items():
+            if result.ok:
+                stdout_logger.info("{} was down for {:.3f}s", device_name, result.value.downtime)
+            else:
+                stdout_logger.error("Failed to reboot {}: {}", device_name, result.error)
+        return results
+
+    def run(self, action: Callable[[DeviceLib], Any]) -> dict[str, FleetResult]:
+        """Calls the action with the lib of every connected device in
+        parallel, e.g. `fleet.run(lambda lib: lib.system.identity.print())`
+        :param action: Function receiving the device lib
+        :return:
+            - results: Per-device results holding the returned values
+        """
+        return self._run_parallel(list(self.libs), lambda device_name: action(self.libs[device_name]))
+
+    def _run_parallel(self, device_names: list[str], action: Callable[[str], Any]) -> dict[str, FleetResult]:
+        def run_one(device_name: str) -> FleetResult:
+            try:
+                return FleetResult(device_name, action(device_name))
+            except Exception as error:  # reported per device, the others go on
+                return FleetResult(device_name, error=error)
+
+        if not device_names:
+            return {}
+        with ThreadPoolExecutor(min(self.max_workers, len(device_names))) as executor:
+            return {result.device_name: result for result in executor.map(run_one, device_names)}
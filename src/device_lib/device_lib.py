@@ -1,99 +1,322 @@
-from yaml import safe_load
+from collections.abc import Iterator
+from pathlib import Path
 
 from config import DeviceSecrets, FrameworkPaths
 from src.connectors import (
     BaseConnection,
+    CapturedOutput,
+    ConnectionPool,
     ConnectionType,
+    FileTransfer,
     NoSuchConnectionTypeError,
-    SerialConnection,
-    SSHConnection
+    RateLimiter,
+    RebootReport,
+    TransferResult
 )
+from src.device_lib.command_tree import CommandNode, load_command_tree
+from src.device_lib.config_import import ImportResult, import_script
 from src.device_lib.exceptions import (
     NoSuchCommandError,
     NoSuchDeviceError,
     NoSuchSubCommandError
 )
+from src.device_lib.print_parser import PrintOutput, parse_print
+from src.device_lib.response_cache import ResponseCache
 from src.devices import DEVICES
 
 
 class Command:
-    def __init__(self, connection: BaseConnection, name: str, sub_commands: dict | None = None):
+    """Command of the tree bound to a connection
+
+    Bound commands are created on attribute access, e.g. `lib.system.identity`
+    looks up `identity` in the children of the `system` node.
+    """
+
+    __slots__ = ("node", "connection", "cache", "device_name")
+
+    def __init__(
+        self, node: CommandNode, connection: BaseConnection, cache: ResponseCache | None = None,
+        device_name: str = ""
+    ):
+        """Binds the command to the connection
+        :param node: The command in the shared command tree
+        :param connection: The connection to send the command through
+        :param cache: The response cache of the device, not used if not set
+        :param device_name: The device name the responses are cached for
+        """
+        self.node = node
         self.connection = connection
-        self.name = name
-        self._sub_commands = sub_commands
+        self.cache = cache
+        self.device_name = device_name
+
+    @property
+    def name(self) -> str:
+        """The full command, e.g. `system identity print`"""
+        return self.node.path
+
+    @property
+    def cacheable(self) -> bool:
+        return self.node.cacheable
 
     def __getattr__(self, name) -> "Command":
-        sub_command = self._sub_commands.get(name) if self._sub_commands else None
+        if name.startswith("_"):
+            raise AttributeError(name)
+        sub_command = self.node.children.get(name)
         if sub_command is None:
             raise NoSuchSubCommandError(self.name, name)
 
-        return sub_command
+        return self.__class__(sub_command, self.connection, self.cache, self.device_name)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name!r})"
 
     def __call__(self, *args, **kwargs) -> str:
         arguments = " ".join(args)
-        return self.connection.send_command(f"{self.name} {arguments}")
+        command = f"{self.name} {arguments}"
+
+        response = self._get_cached(command)
+        if response is None:
+            try:
+                response = self.connection.send_command(command)
+            finally:
+                self._invalidate_cache(command)
+            self._put_cached(command, response)
+        return response
+
+    def records(self, *args) -> PrintOutput:
+        """Sends the command and parses its print output, see `parse_print`
+
+        Example:
+            routes = lib.ip.route.print.records("where", "dynamic")
+            active = routes.with_flag("active")
+        """
+        return parse_print(self(*args))
+
+    def stream(self, *args, timeout: float = 15, lines: bool = True) -> Iterator[str]:
+        """Sends the command and yields its output as it arrives, see
+        `BaseConnection.send_command_stream`
+
+        Example:
+            for line in lib.ping.stream("10.0.0.1"):
+                ...
+        """
+        arguments = " ".join(args)
+        command = f"{self.name} {arguments}"
+        self._invalidate_cache(command)
+        return self.connection.send_command_stream(command, timeout, lines)
+
+    def capture(self, *args, timeout: float = 15, max_memory: int = 1024 * 1024) -> CapturedOutput:
+        """Sends the command and captures its output with a bounded amount
+        of memory, see `BaseConnection.capture_command`
+
+        Example:
+            with lib.export.capture("verbose") as output:
+                output.save(path)
+        """
+        arguments = " ".join(args)
+        command = f"{self.name} {arguments}"
+        self._invalidate_cache(command)
+        return self.connection.capture_command(command, timeout, max_memory)
+
+    def _is_cached(self, command: str) -> bool:
+        return self.cache is not None and self.cacheable and not self.cache.is_mutating(command)
+
+    def _get_cached(self, command: str) -> str | None:
+        if not self._is_cached(command):
+            return None
+        return self.cache.get(self.device_name, command)
+
+    def _put_cached(self, command: str, response: str):
+        if self._is_cached(command):
+            self.cache.put(self.device_name, command, response)
+
+    def _invalidate_cache(self, command: str):
+        """Drops the cached responses if the command changes the device"""
+        if self.cache is not None:
+            self.cache.observe(self.device_name, command)
 
 
 class DeviceConnection:
-    def __init__(self, connection_type: ConnectionType, device_name: str):
-        self.device = DEVICES.get(device_name)
-        if self.device is None:
+    asynchronous = False  # whether the asyncio connections are used
+    _closed = True  # until the connection is opened
+
+    def __init__(self, connection_type: ConnectionType, device_name: str, pool: ConnectionPool | None = None):
+        """Opens the connection to the device
+        :param connection_type: The connection type
+        :param device_name: The device name from the inventory
+        :param pool: The pool to take an opened connection from. The
+            connection is returned to the pool on `close`
+        """
+        self.device_name = device_name
+        self.device = self._get_device(device_name)
+        self.pool = pool
+        self._pool_key = (device_name, connection_type)
+
+        if pool is None:
+            self.connection = self._create_connection(connection_type)
+            self.connection.open_connection()
+        else:
+            self.connection = pool.acquire(self._pool_key, lambda: self._create_connection(connection_type))
+        self._closed = False
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Closes the connection or returns it to the pool"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.pool is None:
+            self.connection.close_connection()
+        else:
+            self.pool.release(self._pool_key, self.connection)
+
+    @staticmethod
+    def _get_device(device_name: str) -> dict:
+        device = DEVICES.get(device_name)
+        if device is None:
             raise NoSuchDeviceError(device_name)
+        return device
 
+    def _create_connection(self, connection_type: ConnectionType):
         if connection_type is ConnectionType.SSH:
-            self.connection = SSHConnection(
+            return connection_type.connection_class(self.asynchronous)(
                 self.device["ip"],
                 DeviceSecrets.USERNAME,
                 DeviceSecrets.PASSWORD,
                 self.device["ssh_port"]
             )
         elif connection_type is ConnectionType.SERIAL:
-            self.connection  = SerialConnection(
+            return connection_type.connection_class(self.asynchronous)(
                 self.device["serial_port"],
                 DeviceSecrets.USERNAME,
                 DeviceSecrets.PASSWORD,
                 self.device["baudrate"]
             )
-        else:
-            raise NoSuchConnectionTypeError(connection_type)
+        raise NoSuchConnectionTypeError(connection_type)
 
-        self.connection.open_connection()
 
-    def __del__(self):
-        self.connection.close_connection()
+class CommandLib:
+    """Exposes the commands described in the commands yaml as attributes
+    bound to `self.connection`
 
+    The commands yaml is compiled once per process into a tree shared by all
+    the libraries, the commands are bound to the connection on access.
+    Commands marked with `_cacheable: true` in the yaml take their responses
+    from `self.response_cache` when it is set.
+    """
 
-class DeviceLib(DeviceConnection):
-    def __init__(self, connection_type: ConnectionType, device_name: str):
-        super().__init__(connection_type, device_name)
-        self._commands =self._parse_commands()
+    command_class = Command
+    response_cache: ResponseCache | None = None
+    device_name = ""
 
     def __getattr__(self, name: str) -> Command:
-        command = self._commands.get(name)
+        if name.startswith("_"):
+            raise AttributeError(name)  # not set yet, e.g. in `__del__` after a failed `__init__`
+        command = self._commands.children.get(name)
         if command is None:
             raise NoSuchCommandError(name)
-        return command
+        return self.command_class(command, self.connection, self.response_cache, self.device_name)
+
+    @staticmethod
+    def _load_commands() -> CommandNode:
+        return load_command_tree(FrameworkPaths.COMMANDS_YAML)
 
-    def _parse_commands(self) -> dict[str, Command]:
-        raw_cmds = self._load_raw_commands()
-        commands = {}
-        for cmd_name, sub_cmds in raw_cmds.items():
-            commands.update(self._create_command(cmd_name, sub_cmds))
 
-        return commands
+class DeviceLib(DeviceConnection, CommandLib):
+    def __init__(
+        self, connection_type: ConnectionType, device_name: str, pool: ConnectionPool | None = None,
+        response_cache: ResponseCache | None = None
+    ):
+        """Opens the connection and creates the commands
+        :param connection_type: The connection type
+        :param device_name: The device name from the inventory
+        :param pool: The pool to take an opened connection from
+        :param response_cache: The cache of the cacheable commands, e.g.
+            shared by all the tests of the session. No caching if not set
+        """
+        super().__init__(connection_type, device_name, pool)
+        self.response_cache = response_cache
+        self._commands = self._load_commands()
 
-    def _create_command(self, name: str, sub_commands: dict | None = None) -> dict[str, Command]:
-        sub_command_objects = None
+    def send_command(self, command: str, timeout: float = 15) -> str:
+        """Sends the string command, see `BaseConnection.send_command`
+        :param command: The string command
+        :param timeout: The timeout of the response
+        :return:
+            - response: The returned output
+        """
+        try:
+            return self.connection.send_command(command, timeout)
+        finally:
+            if self.response_cache is not None:
+                self.response_cache.observe(self.device_name, command)
 
-        if sub_commands:
-            sub_command_objects = {}
-            for sub_cmd_name, sub_sub_cmd in sub_commands.items():
-                sub_command_objects = self._create_command(sub_cmd_name, sub_sub_cmd)
+    def send_commands(self, commands: list[str], timeout: float = 15, pipeline_depth: int | None = None) -> list[str]:
+        """Sends the commands pipelined, see `BaseConnection.send_commands`
+        :param commands: The string commands
+        :param timeout: The timeout of each response
+        :param pipeline_depth: The number of commands sent ahead of the
+            responses
+        :return:
+            - responses: The returned outputs in the order of the commands
+        """
+        try:
+            return self.connection.send_commands(commands, timeout, pipeline_depth=pipeline_depth)
+        finally:
+            if self.response_cache is not None:
+                for command in commands:
+                    self.response_cache.observe(self.device_name, command)
 
-        command_obj = Command(self.connection, name, sub_command_objects)
-        return {name: command_obj}
+    def reboot(self, timeout: float = 180) -> RebootReport:
+        """Reboots the device and logs in again, see `BaseConnection.reboot`
+        :param timeout: Seconds for the whole reboot
+        :return:
+            - report: The time of every phase of the reboot
+        """
+        try:
+            return self.connection.reboot(timeout)
+        finally:
+            if self.response_cache is not None:
+                self.response_cache.observe(self.device_name, BaseConnection.REBOOT_COMMAND)
 
-    @staticmethod
-    def _load_raw_commands() -> dict[str, dict | None]:
-        with open(FrameworkPaths.COMMANDS_YAML) as fobj:
-            return safe_load(fobj.read())
+    def import_config(self, script: str | Path, timeout: float = 300) -> ImportResult:
+        """Loads the RouterOS script, e.g. an exported configuration, in one
+        go instead of a command at a time, see `import_script`
+        :param script: The script text or the path of the script file
+        :param timeout: Seconds for the import
+        :return:
+            - result: The output and the errors with the script line numbers
+        """
+        if isinstance(script, Path):
+            script = script.read_text()
+        try:
+            return import_script(self.connection, script, timeout)
+        finally:
+            if self.response_cache is not None:
+                self.response_cache.observe(self.device_name, "/import")
+
+    def upload_file(
+        self, local_path: Path, remote_path: str | None = None, rate_limiter: RateLimiter | None = None
+    ) -> TransferResult:
+        """Uploads the file, e.g. a firmware package, see `FileTransfer.upload`
+        :param local_path: The file to upload
+        :param remote_path: The path on the device, the file name if not set
+        :param rate_limiter: The throughput cap, not limited if not set
+        :return:
+            - result: The sizes, the duration and the checksum
+        """
+        return FileTransfer(self.connection, rate_limiter).upload(local_path, remote_path)
+
+    def download_file(
+        self, remote_path: str, local_path: Path, rate_limiter: RateLimiter | None = None
+    ) -> TransferResult:
+        """Downloads the file, e.g. a backup, see `FileTransfer.download`
+        :param remote_path: The path on the device
+        :param local_path: The file to write
+        :param rate_limiter: The throughput cap, not limited if not set
+        :return:
+            - result: The sizes, the duration and the checksum
+        """
+        return FileTransfer(self.connection, rate_limiter).download(remote_path, local_path)
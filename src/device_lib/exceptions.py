@@ -20,4 +20,4 @@ class NoSuchSubCommandError(Exception):
         self.sub_cmd_name = sub_cmd_name
 
     def __str__(self):
-        return f"Subcommand {self.sub_cmd_name} doesn't exist under {self.sub_name} command"
+        return f"Subcommand {self.sub_cmd_name} doesn't exist under {self.cmd_name} command"
@@ -0,0 +1,223 @@
+"""Parser of the RouterOS `print` output into records
+
+Supported layouts:
+    - properties: `name: value` lines, e.g. `system resource print`
+    - items: `key=value` pairs after the item number and flags, one line
+        per item (`print terse`) or wrapped over several lines
+        (`print detail`)
+    - as-value: `key=value` pairs separated with `;`, the values unquoted
+    - tables: the header line starting with `#` and the columns aligned
+        under their names
+
+The `Flags:` legend and the `;;;` comments are recognized in all of them.
+The text is parsed line by line in one pass with precompiled patterns. The
+fields without quoted values are split with the string methods, which is
+several times faster than matching them.
+"""
+import re
+from itertools import repeat
+from operator import itemgetter
+
+FLAGS_LINE = re.compile(r"\s*Flags:\s*(.*)")
+FLAG_LEGEND = re.compile(r"(\S) - ([\w-]+)")
+COLUMNS_LINE = re.compile(r"\s*Columns:")
+TABLE_HEADER = re.compile(r"(\s*#\s+)[A-Z]")
+COLUMN_NAME = re.compile(r"\S+")
+PROPERTY_LINE = re.compile(r"\s*([\w.-]+): ?(.*)")
+ITEM_PREFIX = re.compile(r"\s*(\d+)?\s*([^\s\d=;]*)\s+(?:;;; ?(.*)|(?=[\w.-]+=))")
+KEY_VALUE = re.compile(r'([\w.-]+)=("(?:[^"\\]|\\.)*"|[^\s";]*)|\S+')
+AS_VALUE_LINE = re.compile(r"[\w.-]+=[^\s]*;")
+COMMENT_LINE = re.compile(r"\s*(\d+)?\s*([^\s\d;]*)\s*;;; ?(.*)")
+QUOTE_ESCAPE = re.compile(r"\\(.)")
+
+
+class PrintRecord(dict):
+    """Fields of an item by their names, e.g. `record["address"]`
+
+    `index` is the item number, `flags` the flag letters and `comment` the
+    `;;;` comment of the item.
+    """
+
+    __slots__ = ("index", "flags", "comment")
+
+    @classmethod
+    def create(cls, fields=(), index: int | None = None, flags: str = "", comment: str | None = None) -> "PrintRecord":
+        """Creates the record. The fields are copied by the dict constructor,
+        which is faster than an `__init__` in Python for the large outputs
+        """
+        record = cls(fields)
+        record.index = index
+        record.flags = flags
+        record.comment = comment
+        return record
+
+    def __repr__(self):
+        return f"PrintRecord({dict.__repr__(self)}, index={self.index}, flags={self.flags!r})"
+
+    def has_flag(self, flag: str) -> bool:
+        """Checks the flag letter, e.g. `X` for disabled items"""
+        return flag in self.flags
+
+
+class PrintOutput(list):
+    """Records of the print output with the legend of the flags"""
+
+    def __init__(self, records: list[PrintRecord] = (), flag_names: dict[str, str] | None = None):
+        super().__init__(records)
+        self.flag_names = flag_names or {}
+
+    def with_flag(self, flag: str) -> list[PrintRecord]:
+        """The records having the flag letter or the flag name"""
+        letters = {letter for letter, name in self.flag_names.items() if name.lower() == flag.lower()} or {flag}
+        return [record for record in self if not letters.isdisjoint(record.flags)]
+
+
+def parse_print(text: str) -> PrintOutput:
+    """Parses the print output into records
+    :param text: The output of a `print` command
+    :return:
+        - records: The records in the order of the output
+    """
+    lines = text.splitlines()
+    flag_names = {}
+    start = 0
+    for start, line in enumerate(lines):
+        if flags := FLAGS_LINE.match(line):
+            flag_names.update(FLAG_LEGEND.findall(flags.group(1)))
+        elif line.strip() and not COLUMNS_LINE.match(line):
+            break
+    else:
+        return PrintOutput([], flag_names)
+
+    lines = lines[start:]
+    first = lines[0]
+    if header := TABLE_HEADER.match(first):
+        records = _parse_table(first, len(header.group(1)), lines[1:])
+    elif AS_VALUE_LINE.match(first):
+        records = _parse_as_value(lines)
+    elif ITEM_PREFIX.match(first):
+        records = _parse_items(lines)
+    else:
+        records = _parse_properties(lines)
+    return PrintOutput(records, flag_names)
+
+
+def _unquote(value: str) -> str:
+    if value.startswith('"') and value.endswith('"') and len(value) > 1:
+        return QUOTE_ESCAPE.sub(r"\1", value[1:-1])
+    return value
+
+
+def _parse_properties(lines: list[str]) -> list[PrintRecord]:
+    records = [PrintRecord.create()]
+    key = None
+    for line in lines:
+        match = PROPERTY_LINE.match(line)
+        if match is not None:
+            key, value = match.groups()
+            if key in records[-1]:
+                records.append(PrintRecord.create())
+            records[-1][key] = value.strip()
+        elif line.strip() and key is not None:
+            records[-1][key] += " " + line.strip()  # the value wrapped to the next line
+    return [record for record in records if record]
+
+
+def _split_fields(text: str) -> dict[str, str]:
+    """Splits the space separated `key=value` pairs into a dict. The words
+    without `=` belong to the unquoted value before them, e.g. the time of
+    `last-link-up-time=jan/01/2024 12:00:00`
+    """
+    if '"' not in text:
+        try:
+            return dict(map(str.split, text.split(), repeat("="), repeat(1)))
+        except ValueError:  # a word without `=`
+            pass
+    fields = {}
+    key = value_start = None
+    for match in KEY_VALUE.finditer(text):
+        if match.group(1) is not None:
+            key, value_start = match.group(1), match.start(2)
+            fields[key] = _unquote(match.group(2))
+        elif key is not None:
+            fields[key] = text[value_start:match.end()]
+    return fields
+
+
+def _parse_items(lines: list[str]) -> list[PrintRecord]:
+    records = []
+    record = None
+    for line in lines:
+        prefix = ITEM_PREFIX.match(line)
+        if prefix is None:
+            if not line.strip():
+                record = None  # the items of `print detail` are separated with empty lines
+            continue
+        index, flags, comment = prefix.groups()
+        if comment is not None:
+            fields = {}
+        else:
+            fields = _split_fields(line[prefix.end():])
+        if record is None or index is not None or flags or not record.keys().isdisjoint(fields):
+            record = PrintRecord.create(index=None if index is None else int(index), flags=flags)
+            records.append(record)
+        if comment is not None:
+            record.comment = comment.strip()
+        else:
+            record.update(fields)
+    return records
+
+
+def _parse_as_value(lines: list[str]) -> list[PrintRecord]:
+    """The values are not quoted, so the pairs are split on `;` only"""
+    pairs = []
+    for line in lines:
+        for pair in line.split(";"):
+            key, separator, value = pair.partition("=")
+            if separator:
+                pairs.append((key.strip(), value))
+            elif pairs and pair:
+                pairs[-1] = (pairs[-1][0], f"{pairs[-1][1]};{pair}")  # a value containing `;`
+    if not pairs:
+        return []
+    # every item starts with the same key, `.id` unless the properties are limited
+    first_key = pairs[0][0]
+    starts = [position for position, (key, _) in enumerate(pairs) if key == first_key]
+    records = [PrintRecord.create(pairs[start:end]) for start, end in zip(starts, starts[1:] + [len(pairs)])]
+    if first_key == ".id":
+        for record in records:
+            if record[".id"].startswith("*"):
+                record.index = int(record[".id"][1:], 16)
+    return records
+
+
+def _parse_table(header: str, first_column: int, rows: list[str]) -> list[PrintRecord]:
+    columns = [(match.group().lower(), match.start()) for match in COLUMN_NAME.finditer(header, first_column)]
+    names = [name for name, _ in columns]
+    starts = [start for _, start in columns]
+    # the number and the flags before the first column are sliced as one more field
+    slice_fields = itemgetter(*(slice(start, end) for start, end in zip([0] + starts, starts + [None])))
+
+    records = []
+    prefix = comment = None  # of the comment line, the fields are on the next line
+    for row in rows:
+        if ";;;" in row and (match := COMMENT_LINE.match(row)):
+            index, flags, comment = match.groups()
+            prefix = f"{index or ''} {flags}".split()
+            continue
+        fields = slice_fields(row)
+        row_prefix = fields[0].split()
+        if not row_prefix and comment is None and not row.strip():
+            continue
+
+        record = PrintRecord.create(zip(names, map(str.strip, fields[1:])), comment=comment)
+        if not row_prefix and prefix:
+            row_prefix = prefix
+        if row_prefix and row_prefix[0].isdigit():
+            record.index = int(row_prefix[0])
+            record.flags = "".join(row_prefix[1:])
+        else:
+            record.flags = "".join(row_prefix)
+        records.append(record)
+        prefix = comment = None
+    return records
@@ -0,0 +1,132 @@
+"""Cache of the responses of read-only commands"""
+import re
+from collections import OrderedDict
+from itertools import takewhile
+from threading import Lock
+from time import monotonic
+
+
+class CacheStats:
+    """Counters of the cache usage"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+    def __str__(self):
+        return ", ".join(f"{name}: {value}" for name, value in vars(self).items())
+
+
+class ResponseCache:
+    """Least recently used cache of command responses
+
+    Responses are keyed by the device and the full command string and
+    expire `ttl` seconds after they were stored. Only the commands with a
+    read verb, see `READ_VERBS`, are taken as read-only, any other command
+    drops all the cached responses of its device.
+    """
+
+    READ_VERBS = frozenset({"print", "export", "get", "find"})
+    _NESTED_COMMAND = re.compile(r"\[([^\[\]]*)\]")
+    _STATEMENT_SEPARATORS = re.compile(r"[;{}]")
+
+    def __init__(self, ttl: float = 60, max_size: int = 1024):
+        """Initializes the cache
+        :param ttl: Seconds a response stays valid
+        :param max_size: The maximum number of responses kept
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stats = CacheStats()
+        self._responses: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, device_name: str, command: str) -> str | None:
+        """Gets the cached response of the command
+        :param device_name: The device name
+        :param command: The full command string
+        :return:
+            - response: The response or None if not cached or expired
+        """
+        key = (device_name, command)
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is None or entry[0] < monotonic():
+                self._responses.pop(key, None)
+                self.stats.misses += 1
+                return None
+            self._responses.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def put(self, device_name: str, command: str, response: str):
+        """Stores the response of the command
+        :param device_name: The device name
+        :param command: The full command string
+        :param response: The response
+        """
+        key = (device_name, command)
+        with self._lock:
+            self._responses[key] = (monotonic() + self.ttl, response)
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.max_size:
+                self._responses.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, device_name: str):
+        """Drops all the cached responses of the device
+        :param device_name: The device name
+        """
+        with self._lock:
+            keys = [key for key in self._responses if key[0] == device_name]
+            for key in keys:
+                del self._responses[key]
+            self.stats.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+    def observe(self, device_name: str, command: str):
+        """Invalidates the responses of the device if the command changes it
+        :param device_name: The device name
+        :param command: The full command string sent to the device
+        """
+        if self.is_mutating(command):
+            self.invalidate(device_name)
+
+    @classmethod
+    def is_mutating(cls, command: str) -> bool:
+        """Checks if the command may change the device, i.e. if any of its
+        statements, nested `[...]` ones included, isn't a read, e.g.
+        `ip address add address=10.0.0.1/24` or `/ip address print file=[/system identity get name]`
+        """
+        statements = []
+        while match := cls._NESTED_COMMAND.search(command):
+            statements += cls._STATEMENT_SEPARATORS.split(match.group(1))
+            command = command[:match.start()] + command[match.end():]
+        statements += cls._STATEMENT_SEPARATORS.split(command)
+        return not all(cls._is_read(statement) for statement in statements if statement.strip())
+
+    @classmethod
+    def _is_read(cls, statement: str) -> bool:
+        """Checks if the statement is a `print`, `export`, `get`, `find` or
+        `monitor ... once` not writing a file
+        """
+        words = statement.replace("/", " ").split()
+        if any(word.startswith("file=") for word in words):
+            return False
+        for word in takewhile(lambda word: "=" not in word and word != "where", words):
+            if word in cls.READ_VERBS:
+                return True
+            if word.startswith("monitor"):
+                return "once" in words
+        return False
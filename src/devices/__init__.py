@@ -1,4 +1,4 @@
 from config import FrameworkPaths
-from src.devices.device_parser import DevicesParser
+from src.devices.device_registry import DeviceRegistry
 
-DEVICES: dict[str, dict] = DevicesParser(FrameworkPaths.DEVICES_YAML).devices
+DEVICES = DeviceRegistry(FrameworkPaths.DEVICES_YAML)
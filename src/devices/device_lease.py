@@ -0,0 +1,190 @@
+"""Leases of the devices shared by the processes running the tests
+
+A lease is an exclusive lock on a file named after the device, so the
+pytest-xdist workers and any other framework process on the host never use
+the same router or serial port at the same time. The lock is released by
+the OS when the process dies, so there are no stale leases.
+"""
+import json
+import os
+import random
+import re
+from pathlib import Path
+from time import monotonic, sleep
+
+from config import FrameworkPaths
+from src.devices.exceptions import DeviceLeaseTimeoutError
+
+UNSAFE_FILE_NAME_CHARACTERS = re.compile(r"[^\w.-]")
+
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd: int) -> bool:
+        os.lseek(fd, 0, os.SEEK_SET)  # msvcrt locks from the current position, the holder moves it
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class DeviceLease:
+    """Exclusive use of a device until the lease is released"""
+
+    def __init__(self, device_name: str, fd: int, leases: "DeviceLeases", waited: float):
+        self.device_name = device_name
+        self.waited = waited
+        self.acquired_at = monotonic()
+        self._fd = fd
+        self._leases = leases
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @property
+    def released(self) -> bool:
+        return self._fd is None
+
+    def release(self):
+        """Releases the device, does nothing if it is already released"""
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        _unlock(fd)
+        os.close(fd)
+        self._leases.stats.record(self.device_name, monotonic() - self.acquired_at, self.waited)
+
+
+class DeviceUsage:
+    """Counters of the leases of one device"""
+
+    def __init__(self):
+        self.leases = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return dict(vars(self))
+
+
+class LeaseStats:
+    """Device usage of one process, e.g. of a pytest-xdist worker"""
+
+    def __init__(self):
+        self.started_at = monotonic()
+        self.devices: dict[str, DeviceUsage] = {}
+
+    def record(self, device_name: str, busy_time: float, wait_time: float):
+        usage = self.devices.setdefault(device_name, DeviceUsage())
+        usage.leases += 1
+        usage.busy_time += busy_time
+        usage.wait_time += wait_time
+
+    def as_dict(self) -> dict:
+        """The usage with the share of the process lifetime each device was
+        leased for
+        """
+        elapsed = monotonic() - self.started_at
+        return {
+            "elapsed": elapsed,
+            "devices": {
+                name: {**usage.as_dict(), "utilisation": usage.busy_time / elapsed if elapsed else 0.0}
+                for name, usage in self.devices.items()
+            },
+        }
+
+    def export_json(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.as_dict(), indent=2))
+
+
+class DeviceLeases:
+    """Hands out the free devices to the callers of all the processes
+
+    Example:
+        leases = DeviceLeases()
+        with leases.acquire(["router1", "router2"], timeout=600) as lease:
+            lib = DeviceLib(ConnectionType.SSH, lease.device_name)
+    """
+
+    def __init__(self, lock_dir: Path = FrameworkPaths.LOCK_DIR, poll_interval: float = 0.05):
+        """Initializes the leases
+        :param lock_dir: The directory of the lock files, shared by the
+            processes. Outside of the checkout by default, so the leases
+            hold across the checkouts of the host
+        :param poll_interval: Seconds between the attempts while all the
+            devices are busy
+        """
+        self.lock_dir = lock_dir
+        self.poll_interval = poll_interval
+        self.stats = LeaseStats()
+        self._last_device: str | None = None
+
+    def try_acquire(self, device_name: str) -> DeviceLease | None:
+        """Leases the device if it is free
+        :param device_name: The device name
+        :return:
+            - lease: The lease or None if the device is busy
+        """
+        return self._try_acquire(device_name, 0.0)
+
+    def acquire(self, device_names: list[str], timeout: float | None = None) -> DeviceLease:
+        """Leases the first free device of the list, waits while all of them
+        are busy. The device of the previous lease is tried first, so its
+        pooled connection is reused
+        :param device_names: The devices the caller can use
+        :param timeout: Seconds to wait, forever if not set
+        :return:
+            - lease: The lease of the device
+        """
+        if not device_names:
+            raise ValueError("No devices to lease")
+        # the processes start from different devices, so they don't contend for the first one
+        offset = random.randrange(len(device_names))
+        order = device_names[offset:] + device_names[:offset]
+        if self._last_device in order:
+            order.remove(self._last_device)
+            order.insert(0, self._last_device)
+
+        start = monotonic()
+        while True:
+            for device_name in order:
+                lease = self._try_acquire(device_name, monotonic() - start)
+                if lease is not None:
+                    self._last_device = device_name
+                    return lease
+            if timeout is not None and monotonic() - start >= timeout:
+                raise DeviceLeaseTimeoutError(device_names, timeout)
+            sleep(self.poll_interval * random.uniform(0.5, 1.5))
+
+    def _try_acquire(self, device_name: str, waited: float) -> DeviceLease | None:
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        path = self.lock_dir / f"{UNSAFE_FILE_NAME_CHARACTERS.sub('_', device_name)}.lock"
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        if not _try_lock(fd):
+            os.close(fd)
+            return None
+        # the holder is written for the people looking at a busy device
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()} {os.getenv('PYTEST_XDIST_WORKER', '')}\n".encode())
+        return DeviceLease(device_name, fd, self, waited)
@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from yaml import safe_load
+from config import load_yaml
 
 
 class DevicesParser:
@@ -27,7 +27,4 @@ class DevicesParser:
 
     @staticmethod
     def _load_devices(devices_yaml: Path) -> dict[str, dict]:
-        with devices_yaml.open("r") as fobj:
-            devices = safe_load(fobj.read())
-
-        return devices
+        return load_yaml(devices_yaml)
@@ -0,0 +1,67 @@
+from collections.abc import Iterable, Iterator, Mapping
+from pathlib import Path
+from threading import Lock
+
+from src.devices.device_parser import DevicesParser
+
+
+class DeviceRegistry(Mapping):
+    """Devices of the inventory by their names
+
+    The devices yaml is parsed on the first access, not on import.
+    """
+
+    def __init__(self, devices_yaml: Path):
+        self.devices_yaml = devices_yaml
+        self._devices: dict[str, dict] | None = None
+        self._lock = Lock()
+
+    @property
+    def devices(self) -> dict[str, dict]:
+        if self._devices is None:
+            with self._lock:
+                if self._devices is None:
+                    self._devices = DevicesParser(self.devices_yaml).devices
+        return self._devices
+
+    def reload(self):
+        """Parses the devices yaml again on the next access"""
+        self._devices = None
+
+    def select(self, tags: Iterable[str] = (), capabilities: Iterable[str] = ()) -> list[str]:
+        """Finds the devices having all the tags and the capabilities
+        :param tags: The tags from the `tags` field of the device
+        :param capabilities: The capabilities from the `capabilities` field
+            of the device, plus `ssh` for devices with an IP and `serial`
+            for devices connected to a serial port
+        :return:
+            - device_names: The names of the matching devices
+        """
+        tags = set(tags)
+        capabilities = set(capabilities)
+        return [
+            name for name, device in self.devices.items()
+            if tags <= set(device.get("tags") or ()) and capabilities <= self.capabilities(device)
+        ]
+
+    @staticmethod
+    def capabilities(device: dict) -> set[str]:
+        capabilities = set(device.get("capabilities") or ())
+        if device.get("ip"):
+            capabilities.add("ssh")
+        if device.get("serial_connected"):
+            capabilities.add("serial")
+        return capabilities
+
+    def __getitem__(self, device_name: str) -> dict:
+        return self.devices[device_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.devices)
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def __repr__(self):
+        state = "not loaded" if self._devices is None else f"{len(self._devices)} devices"
+        return f"DeviceRegistry({str(self.devices_yaml)!r}, {state})"
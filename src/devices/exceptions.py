@@ -0,0 +1,7 @@
+class DeviceLeaseTimeoutError(Exception):
+    def __init__(self, device_names: list[str], timeout: float):
+        self.device_names = device_names
+        self.timeout = timeout
+
+    def __str__(self):
+        return f"None of the devices {', '.join(self.device_names)} got free in {self.timeout} seconds"
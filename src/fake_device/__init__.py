@@ -0,0 +1,5 @@
+from src.fake_device.loopback import LoopbackDevices, SocketConnection
+from src.fake_device.routeros import RouterOSDialect
+from src.fake_device.serial_device import FakeSerialDevice
+from src.fake_device.server_lib import FakeServerFleet, FakeServerLib, connect, create_connection
+from src.fake_device.ssh_server import FakeSSHServer
@@ -0,0 +1,69 @@
+"""Delivery of the fake device output with latency and bandwidth limits"""
+from collections.abc import Callable
+from queue import Queue
+from threading import Thread
+from time import monotonic, sleep
+
+
+class Delivery:
+    """Sends the output from a dedicated thread
+
+    Every output is delivered `latency` seconds after it was queued and no
+    faster than `bandwidth` bytes per second. The latency delays the
+    delivery, not the processing of the next input, like a network round
+    trip does.
+    """
+
+    CHUNK_SIZE = 16384
+
+    def __init__(self, send: Callable[[bytes], None], latency: float = 0.0, bandwidth: float | None = None):
+        """Starts the delivery thread
+        :param send: Function sending the data to the client
+        :param latency: The delay of every output in seconds
+        :param bandwidth: The throughput limit in bytes per second
+        """
+        self._send = send
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._queue: Queue[tuple[float, bytes | Callable[[], None]] | None] = Queue()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, data: bytes):
+        """Queues the data for the delivery"""
+        if data:
+            self._queue.put((monotonic() + self.latency, data))
+
+    def close(self, on_close: Callable[[], None] | None = None):
+        """Stops the thread once the queued data is delivered
+        :param on_close: Function called after the last data is sent
+        """
+        if on_close is not None:
+            self._queue.put((monotonic() + self.latency, on_close))
+        self._queue.put(None)
+
+    def join(self, timeout: float | None = None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        while (item := self._queue.get()) is not None:
+            due_time, data = item
+            sleep(max(0.0, due_time - monotonic()))
+            try:
+                if callable(data):
+                    data()
+                else:
+                    self._deliver(data)
+            except (OSError, EOFError):  # paramiko raises EOFError on a closed transport
+                return  # the client is gone
+
+    def _deliver(self, data: bytes):
+        if self.bandwidth is None:
+            self._send(data)
+            return
+
+        start = monotonic()
+        for offset in range(0, len(data), self.CHUNK_SIZE):
+            chunk = data[offset:offset + self.CHUNK_SIZE]
+            self._send(chunk)
+            sleep(max(0.0, start + (offset + len(chunk)) / self.bandwidth - monotonic()))
@@ -0,0 +1,130 @@
+"""Many RouterOS stand-ins over socket pairs, served from one thread"""
+import asyncio
+import socket
+from threading import Thread
+from time import monotonic
+
+from src.connectors.base_connection import BaseConnection
+from src.connectors.exceptions import ReadTimeoutError, RebootTimeoutError
+from src.fake_device.routeros import RouterOSDialect
+
+
+class SocketConnection(BaseConnection):
+    """Connection reading from one end of a socket pair"""
+
+    def __init__(self, sock: socket.socket):
+        super().__init__()
+        self.prompt = self.SHELL_PROMPT
+        self.sock = sock
+        self.sock.setblocking(False)
+
+    def open_connection(self):
+        pass
+
+    def close_connection(self):
+        self._close_selector()
+        self.sock.close()
+
+    def is_connected(self) -> bool:
+        return self.sock.fileno() != -1
+
+    def output_available(self) -> bool:
+        try:
+            return bool(self.sock.recv(1, socket.MSG_PEEK))
+        except BlockingIOError:
+            return False
+
+    def get_read_timeout(self) -> float:
+        return 0
+
+    def set_read_timeout(self, timeout: float):
+        pass
+
+    def write(self, data: str):
+        self.sock.sendall(data.encode())
+
+    def read(self, count: int = 1) -> bytes:
+        try:
+            return self.sock.recv(count)
+        except BlockingIOError:
+            return b""
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def _wait_for_shutdown(self, deadline: float):
+        """Reads the rest of the output until the device closes its end"""
+        timeout = deadline - monotonic()
+        while self.wait_for_output(max(0.0, deadline - monotonic())):
+            try:
+                if not self.sock.recv(65536):
+                    return
+            except BlockingIOError:
+                pass
+        raise ReadTimeoutError("the end of the session", "", timeout)
+
+    def _wait_for_boot(self, deadline: float):
+        """The socket pair is gone with the session, the device never comes up"""
+        raise RebootTimeoutError("up", max(0.0, deadline - monotonic()))
+
+
+class LoopbackDevices:
+    """Answers the commands of any number of connections from one thread
+
+    The connections skip SSH and serial entirely, which makes it possible to
+    drive hundreds of sessions from a single process.
+    """
+
+    def __init__(self, latency: float = 0.0, **dialect_options):
+        """Starts the devices thread
+        :param latency: The round trip time in seconds
+        :param dialect_options: Options of `RouterOSDialect`
+        """
+        self.dialect_options = dialect_options
+        self.latency = latency
+        self._sessions: set[asyncio.Task] = set()  # the loop keeps only weak references to the tasks
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def connect(self) -> SocketConnection:
+        local, remote = socket.socketpair()
+        self._loop.call_soon_threadsafe(self._start_session, remote)
+        return SocketConnection(local)
+
+    def stop(self):
+        """Cancels the sessions, waits until they finish and stops the thread"""
+        asyncio.run_coroutine_threadsafe(self._cancel_sessions(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def _start_session(self, remote: socket.socket):
+        session = self._loop.create_task(self._serve(remote))
+        self._sessions.add(session)
+        session.add_done_callback(self._sessions.discard)
+
+    async def _cancel_sessions(self):
+        sessions = list(self._sessions)
+        for session in sessions:
+            session.cancel()
+        await asyncio.gather(*sessions, return_exceptions=True)
+
+    async def _serve(self, remote: socket.socket):
+        dialect = RouterOSDialect(**self.dialect_options)
+        reader, writer = await asyncio.open_connection(sock=remote)
+        writer.write(dialect.greeting())
+        try:
+            while data := await reader.read(65536):
+                output, closed = dialect.feed(data)
+                # The latency delays the delivery, not the processing of the
+                # next commands, like a network round trip
+                self._loop.call_later(self.latency, writer.write, output)
+                if closed:
+                    break
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            writer.close()
+            raise
+        self._loop.call_later(self.latency, writer.close)
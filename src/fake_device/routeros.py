@@ -0,0 +1,246 @@
+"""RouterOS console dialect spoken by the fake devices"""
+import re
+from collections.abc import Callable, Mapping
+from enum import Enum
+
+Response = str | Callable[[str], str]
+
+
+class LoginState(Enum):
+    LOGGED_OUT = "logged_out"
+    USERNAME = "username"
+    PASSWORD = "password"
+    SHELL = "shell"
+
+
+class RouterOSDialect:
+    """Turns the console input into the output RouterOS would print
+
+    The dialect doesn't do any I/O. The fake devices feed it with the data
+    received from the client and deliver the returned output.
+
+    Every command line is answered with the prompt redrawn with the echoed
+    line, the command output and a new prompt. `:put` prints the
+    concatenated string literals, so the sentinel markers of
+    `BaseConnection` work. Commands separated with `; ` run one by one
+    until the first error, like RouterOS does: an unknown command is a
+    syntax error reported with its column before anything of the line runs,
+    a runtime error, e.g. `failure:` or `no such item`, skips the rest of
+    the line. `system reboot` asks for the confirmation key, once confirmed
+    the session ends with `rebooting` set and the fake device goes down.
+    """
+
+    PROMPT_TEMPLATE = "[{username}@{identity}] > "
+    PUT_COMMAND = re.compile(r":put\s+(.*)")
+    STRING_LITERAL = re.compile(r'"([^"]*)"')
+    EXPORT_COMMANDS = ("export", "export verbose")
+    IMPORT_COMMAND = re.compile(r"import\s+(?:file-name=)?(\S+).*")
+    EXPORT_LINE = (
+        "/ip firewall filter add action=accept chain=forward comment=rule{index} dst-port=443 protocol=tcp\r\n"
+    )
+    CONSOLE_COMMANDS = ("quit", "system reboot")
+    RUNTIME_ERROR = re.compile(r"failure:|no such item|input does not match|invalid value|.*\(line \d+ column \d+\)")
+
+    def __init__(
+        self, username: str = "admin", password: str = "admin", identity: str = "MikroTik",
+        responses: dict[str, Response] | None = None, output_size: int = 1024 * 1024,
+        require_login: bool = False, files: Mapping[str, bytes] | None = None
+    ):
+        """Initializes the dialect
+        :param username: The username accepted by the console login
+        :param password: The password accepted by the console login
+        :param identity: The system identity shown in the prompt
+        :param responses: Outputs of the commands by the command line
+            without the leading slash. Callables get the command line
+        :param output_size: The size of the `export` output in bytes
+        :param require_login: Start with the `Login:` prompt, like the
+            serial console does
+        :param files: The contents of the files of the device by name, the
+            scripts run by `import`
+        """
+        self.username = username
+        self.password = password
+        self.identity = identity
+        self.output_size = output_size
+        self.responses: dict[str, Response] = {
+            "beep": "",
+            "system identity print": f"  name: {identity}\r\n",
+            "system clock print": "      time: 12:00:00\r\n      date: jan/01/2024\r\n  time-zone-name: UTC\r\n",
+        }
+        self.responses.update(responses or {})
+        self.files = {} if files is None else files
+
+        self.state = LoginState.LOGGED_OUT if require_login else LoginState.SHELL
+        self._entered_username = ""
+        self._pending = b""
+        self._confirming_reboot = False
+        self.rebooting = False  # the reboot was confirmed, the session is closed
+
+    @property
+    def prompt(self) -> str:
+        return self.PROMPT_TEMPLATE.format(username=self.username, identity=self.identity)
+
+    def greeting(self) -> bytes:
+        """The output printed once the session starts"""
+        return self.prompt.encode() if self.state is LoginState.SHELL else b""
+
+    def feed(self, data: bytes) -> tuple[bytes, bool]:
+        """Feeds the data typed by the client
+        :param data: The received data
+        :return:
+            - output: The output to deliver to the client
+            - closed: True if the session was ended with `quit` or by
+                the reboot
+        """
+        self._pending += data
+
+        output = ""
+        while True:
+            if self._confirming_reboot:
+                if not self._pending:
+                    break
+                answer, self._pending = self._pending[:1], self._pending[1:]  # a key, not a line
+                line_output, closed = self._confirm_reboot(answer.decode(errors="replace"))
+            else:
+                line, separator, pending = self._pending.partition(b"\n")
+                if not separator:
+                    break
+                self._pending = pending
+                line_output, closed = self._answer_line(line.rstrip(b"\r").decode(errors="replace"))
+            output += line_output
+            if closed:
+                return output.encode(), True
+        return output.encode(), False
+
+    def run(self, command_line: str) -> str:
+        """Runs the command line outside of the interactive console, like
+        the SSH exec channel does
+        :param command_line: The command line
+        :return:
+            - output: The command output
+        """
+        commands, output = self._parse_line(command_line)
+        for command in commands:
+            command_output = self._run_command(command)
+            output += command_output
+            if self.RUNTIME_ERROR.match(command_output):
+                break
+        return output
+
+    def _answer_line(self, line: str) -> tuple[str, bool]:
+        if self.state is LoginState.LOGGED_OUT or (self.state is LoginState.USERNAME and not line):
+            self.state = LoginState.USERNAME
+            return "\r\nLogin: ", False
+        if self.state is LoginState.USERNAME:
+            self._entered_username = line
+            self.state = LoginState.PASSWORD
+            return "Password: ", False
+        if self.state is LoginState.PASSWORD:
+            if (self._entered_username, line) != (self.username, self.password):
+                self.state = LoginState.USERNAME
+                return "\r\nLogin failed, incorrect username or password\r\n\r\nLogin: ", False
+            self.state = LoginState.SHELL
+            return f"\r\n\r\n  MikroTik RouterOS (fake)\r\n\r\n{self.prompt}", False
+
+        commands, error = self._parse_line(line)
+        output = f"{self.prompt}{line}\r\n{error}"
+        for command in commands:
+            if command == "quit":
+                return output + "interrupted\r\n", True
+            if command == "system reboot":
+                self._confirming_reboot = True
+                return output + "Reboot, yes? [y/N]: ", False
+            command_output = self._run_command(command)
+            output += command_output
+            if self.RUNTIME_ERROR.match(command_output):
+                break
+        return output + self.prompt, False
+
+    def _parse_line(self, line: str) -> tuple[list[str], str]:
+        """Splits the command line into the commands and checks them all
+        before any runs
+        :param line: The command line
+        :return:
+            - commands: The normalized commands, empty on a syntax error
+            - error: The syntax error or an empty string
+        """
+        commands = []
+        column = 1
+        for command in line.split("; "):
+            normalized = self._normalize(command)
+            if not self._is_known(normalized):
+                column += len(command) - len(command.lstrip())
+                return [], f"bad command name {normalized.split()[0]} (line 1 column {column})\r\n"
+            commands.append(normalized)
+            column += len(command) + 2
+        return commands, ""
+
+    def _is_known(self, command: str) -> bool:
+        return (
+            not command or command in self.CONSOLE_COMMANDS or command in self.responses
+            or command in self.EXPORT_COMMANDS or self.PUT_COMMAND.fullmatch(command) is not None
+            or self.IMPORT_COMMAND.fullmatch(command) is not None
+        )
+
+    @staticmethod
+    def _normalize(command: str) -> str:
+        return " ".join(command.strip().lstrip("/").split())
+
+    def _confirm_reboot(self, answer: str) -> tuple[str, bool]:
+        self._confirming_reboot = False
+        if answer.lower() != "y":
+            return f"\r\n{self.prompt}", False
+        self.rebooting = True
+        return f"{answer}\r\nRebooting...\r\n", True
+
+    def _run_command(self, command: str) -> str:
+        command = self._normalize(command)
+        if not command:
+            return ""
+
+        put = self.PUT_COMMAND.fullmatch(command)
+        if put is not None:
+            return "".join(self.STRING_LITERAL.findall(put.group(1))) + "\r\n"
+
+        script = self.IMPORT_COMMAND.fullmatch(command)
+        if script is not None:
+            return self._import(script.group(1))
+
+        response = self.responses.get(command)
+        if callable(response):
+            return response(command)
+        if response is not None:
+            return response
+        if command in self.EXPORT_COMMANDS:
+            return self._export()
+        return f"bad command name {command.split()[0]} (line 1 column 1)\r\n"
+
+    def _import(self, file_name: str) -> str:
+        """Runs the script file until the first error, the position of a
+        syntax error is the line in the file
+        """
+        content = self.files.get(file_name)
+        if content is None:
+            return "failure: no such file\r\n"
+
+        command, start = "", None
+        for number, line in enumerate(bytes(content).decode(errors="replace").splitlines(), 1):
+            if start is None and (not line.strip() or line.lstrip().startswith("#")):
+                continue
+            start = start or number
+            if line.endswith("\\"):
+                command += line[:-1].lstrip()
+                continue
+            output = self._run_command(command + line.lstrip())
+            if self.RUNTIME_ERROR.match(output):
+                return output.replace("(line 1 column", f"(line {start} column")
+            command, start = "", None
+        return "\r\nScript file loaded and executed successfully\r\n"
+
+    def _export(self) -> str:
+        lines = []
+        size = 0
+        while size < self.output_size:
+            lines.append(self.EXPORT_LINE.format(index=len(lines)))
+            size += len(lines[-1])
+        return "".join(lines)
@@ -0,0 +1,111 @@
+"""Serial console stand-in on a pseudo-terminal pair"""
+import os
+import select
+import tty
+from threading import Event, Thread
+from time import monotonic
+
+from src.fake_device.delivery import Delivery
+from src.fake_device.routeros import LoginState, RouterOSDialect
+
+
+class FakeSerialDevice:
+    """RouterOS serial console on a pseudo-terminal
+
+    `SerialConnection` opens `port`, the fake device serves the other end.
+    The console starts logged out and goes back to the `Login:` prompt on
+    `quit`, like the real one. After a reboot the input is ignored for
+    `boot_time` seconds, then the boot log ends with the `Login:` prompt.
+
+    Example:
+        with FakeSerialDevice() as device:
+            connection = SerialConnection(device.port, "admin", "admin")
+    """
+
+    BOOT_LOG = b"\r\n\r\nRouterBOOT booter 7.15\r\n\r\nStarting services...\r\n\r\nMikroTik Login: "
+
+    def __init__(
+        self, username: str = "admin", password: str = "admin", latency: float = 0.0,
+        bandwidth: float | None = 11520, boot_time: float = 1.0, **dialect_options
+    ):
+        """Initializes the device
+        :param username: The accepted username
+        :param password: The accepted password
+        :param latency: The delay of every output in seconds
+        :param bandwidth: The output throughput limit in bytes per second,
+            115200 baud by default
+        :param boot_time: Seconds from the confirmed reboot to the boot log
+        :param dialect_options: Options of `RouterOSDialect`
+        """
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.boot_time = boot_time
+        self.reboots = 0
+        self.dialect_options = dialect_options
+
+        self.port = None
+        self._controller = None
+        self._terminal = None
+        self._delivery = None
+        self._thread = None
+        self._stopped = Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Creates the pseudo-terminal and starts serving the console"""
+        self._controller, self._terminal = os.openpty()
+        tty.setraw(self._terminal)  # no echo of the device output back to it
+        self.port = os.ttyname(self._terminal)
+        self._delivery = Delivery(self._write, self.latency, self.bandwidth)
+        self._stopped.clear()
+        self._thread = Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops serving and closes the pseudo-terminal"""
+        self._stopped.set()
+        self._thread.join()
+        self._delivery.close()
+        self._delivery.join(timeout=1)
+        os.close(self._terminal)
+        os.close(self._controller)
+
+    def create_dialect(self) -> RouterOSDialect:
+        return RouterOSDialect(self.username, self.password, require_login=True, **self.dialect_options)
+
+    def _write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._controller, view):]
+
+    def _serve(self):
+        dialect = self.create_dialect()
+        booted_at = None  # while rebooting
+        while not self._stopped.is_set():
+            timeout = 0.1 if booted_at is None else min(0.1, max(0.0, booted_at - monotonic()))
+            readable, _, _ = select.select([self._controller], [], [], timeout)
+            if booted_at is not None and monotonic() >= booted_at:
+                booted_at = None
+                dialect = self.create_dialect()
+                dialect.state = LoginState.USERNAME
+                self._delivery.put(self.BOOT_LOG)
+            if not readable:
+                continue
+            data = os.read(self._controller, 65536)
+            if booted_at is not None:
+                continue  # nobody reads the console while booting
+            output, closed = dialect.feed(data)
+            self._delivery.put(output)
+            if closed and dialect.rebooting:
+                self.reboots += 1
+                booted_at = monotonic() + self.boot_time
+            elif closed:
+                dialect = self.create_dialect()
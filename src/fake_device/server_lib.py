@@ -0,0 +1,68 @@
+"""Connections, device libs and fleets of the inventory devices served by
+fake SSH servers"""
+from functools import partial
+
+from src.connectors import ConnectionType, SSHConnection
+from src.device_lib.device_fleet import DeviceFleet
+from src.device_lib.device_lib import DeviceLib
+from src.fake_device.ssh_server import FakeSSHServer
+
+
+def create_connection(
+    server: FakeSSHServer, reboot_poll_interval: float = 0.05, reconnect_delay: float = 0.01, **kwargs
+) -> SSHConnection:
+    """Creates the connection to the server, not opened yet. The waits are
+    shortened as the server runs locally
+    :param server: The started server
+    :param reboot_poll_interval: Seconds between the checks of a rebooting
+        server
+    :param reconnect_delay: The backoff limit after the first failed
+        reconnect attempt
+    :param kwargs: Other arguments of `SSHConnection`, e.g. `mode`
+    :return:
+        - connection: The SSH connection
+    """
+    connection = SSHConnection(server.host, server.username, server.password, server.port, **kwargs)
+    connection.reboot_poll_interval = reboot_poll_interval
+    connection.reconnect_delay = reconnect_delay
+    return connection
+
+
+def connect(server: FakeSSHServer, **kwargs) -> SSHConnection:
+    """Opens the connection to the server, see `create_connection`"""
+    connection = create_connection(server, **kwargs)
+    connection.open_connection()
+    return connection
+
+
+class FakeServerLib(DeviceLib):
+    """Device lib connected to the fake server of the device"""
+
+    def __init__(self, connection_type: ConnectionType, device_name: str, *args, servers: dict[str, FakeSSHServer]):
+        """Connects to the server of the device, see `DeviceLib`
+        :param servers: The started servers by the device name
+        """
+        self.servers = servers
+        super().__init__(connection_type, device_name, *args)
+
+    def _create_connection(self, connection_type: ConnectionType) -> SSHConnection:
+        return create_connection(self.servers[self.device_name])
+
+
+class FakeServerFleet(DeviceFleet):
+    """Fleet of the devices served by the fake servers
+
+    Example:
+        with FakeSSHServer() as first, FakeSSHServer() as second:
+            servers = {"mikrotik_rb2011u1as": first, "dummy_device": second}
+            with FakeServerFleet(servers) as fleet:
+                fleet.send_command("system identity print")
+    """
+
+    def __init__(self, servers: dict[str, FakeSSHServer], **kwargs):
+        """Initializes the fleet of the inventory devices named by the servers
+        :param servers: The started servers by the device name
+        :param kwargs: Other arguments of `DeviceFleet`
+        """
+        super().__init__(ConnectionType.SSH, servers, **kwargs)
+        self.lib_class = partial(FakeServerLib, servers=servers)
@@ -0,0 +1,102 @@
+"""SFTP subsystem of the fake SSH server keeping the files in memory"""
+import os
+import stat
+import time
+from threading import Lock
+
+import paramiko
+from paramiko.sftp import SFTP_NO_SUCH_FILE, SFTP_OK
+
+
+class MemoryFiles(dict):
+    """Contents of the files of a fake device by their names, shared by the
+    SFTP sessions and the console, e.g. for `/import`
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = Lock()
+
+    @staticmethod
+    def name(path: str) -> str:
+        """The file name of the SFTP path, all the files are in the root"""
+        return os.path.normpath("/" + path).lstrip("/")
+
+
+class _MemoryHandle(paramiko.SFTPHandle):
+    def __init__(self, files: MemoryFiles, name: str, flags: int):
+        super().__init__(flags)
+        self.files = files
+        self.name = name
+
+    def read(self, offset: int, length: int) -> bytes:
+        content = self.files.get(self.name)
+        if content is None:
+            return SFTP_NO_SUCH_FILE
+        return bytes(content[offset:offset + length])
+
+    def write(self, offset: int, data: bytes) -> int:
+        with self.files.lock:
+            content = self.files.setdefault(self.name, bytearray())
+            if len(content) < offset:
+                content.extend(bytes(offset - len(content)))
+            content[offset:offset + len(data)] = data
+        return SFTP_OK
+
+    def stat(self) -> paramiko.SFTPAttributes | int:
+        return _attributes(self.files, self.name)
+
+
+def _attributes(files: MemoryFiles, name: str) -> paramiko.SFTPAttributes | int:
+    attributes = paramiko.SFTPAttributes()
+    attributes.filename = name
+    if name in ("", "."):  # the root
+        attributes.st_mode = stat.S_IFDIR | 0o755
+        return attributes
+    content = files.get(name)
+    if content is None:
+        return SFTP_NO_SUCH_FILE
+    attributes.st_size = len(content)
+    attributes.st_mode = stat.S_IFREG | 0o644
+    attributes.st_mtime = int(time.time())
+    return attributes
+
+
+class MemorySFTPServer(paramiko.SFTPServerInterface):
+    """Serves the files of `MemoryFiles`, there are no directories"""
+
+    def __init__(self, server: paramiko.ServerInterface, files: MemoryFiles, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.files = files
+
+    def open(self, path: str, flags: int, attr: paramiko.SFTPAttributes) -> _MemoryHandle | int:
+        name = self.files.name(path)
+        with self.files.lock:
+            if name not in self.files:
+                if not flags & os.O_CREAT:
+                    return SFTP_NO_SUCH_FILE
+                self.files[name] = bytearray()
+            elif flags & os.O_TRUNC:
+                self.files[name] = bytearray()
+        return _MemoryHandle(self.files, name, flags)
+
+    def stat(self, path: str) -> paramiko.SFTPAttributes | int:
+        return _attributes(self.files, self.files.name(path))
+
+    lstat = stat
+
+    def list_folder(self, path: str) -> list[paramiko.SFTPAttributes]:
+        return [_attributes(self.files, name) for name in list(self.files)]
+
+    def remove(self, path: str) -> int:
+        if self.files.pop(self.files.name(path), None) is None:
+            return SFTP_NO_SUCH_FILE
+        return SFTP_OK
+
+    def rename(self, oldpath: str, newpath: str) -> int:
+        with self.files.lock:
+            content = self.files.pop(self.files.name(oldpath), None)
+            if content is None:
+                return SFTP_NO_SUCH_FILE
+            self.files[self.files.name(newpath)] = content
+        return SFTP_OK
@@ -0,0 +1,214 @@
+"""In-process SSH server speaking the RouterOS dialect"""
+import logging
+import socket
+from functools import cache
+from threading import Thread, Timer
+
+import paramiko
+
+from src.fake_device.delivery import Delivery
+from src.fake_device.routeros import RouterOSDialect
+from src.fake_device.sftp_server import MemoryFiles, MemorySFTPServer
+
+# the server side errors, e.g. of the port probes closing without the
+# handshake, are not the errors of the connection under test
+SERVER_LOG_CHANNEL = "paramiko.transport.fake_server"
+logging.getLogger(SERVER_LOG_CHANNEL).setLevel(logging.CRITICAL)
+
+
+@cache
+def host_key() -> paramiko.RSAKey:
+    """Host key shared by all the fake servers of the process"""
+    return paramiko.RSAKey.generate(2048)
+
+
+class _DelayedSocket:
+    """Client socket sending through a `Delivery`, so every packet of the
+    transport arrives `latency` later without limiting the throughput
+    """
+
+    def __init__(self, sock: socket.socket, latency: float):
+        self._sock = sock
+        self._delivery = Delivery(sock.sendall, latency)
+
+    def __getattr__(self, name: str):
+        return getattr(self._sock, name)
+
+    def send(self, data: bytes) -> int:
+        self._delivery.put(bytes(data))
+        return len(data)
+
+    def close(self):
+        self._delivery.close(self._sock.close)
+
+
+class FakeSSHServer:
+    """SSH server on localhost serving interactive RouterOS shells, exec
+    channels and SFTP. The files uploaded through SFTP are kept in `files`
+    and can be imported in the console
+
+    Example:
+        with FakeSSHServer(latency=0.01) as server:
+            connection = SSHConnection(server.host, "admin", "admin", server.port)
+    """
+
+    def __init__(
+        self, username: str = "admin", password: str = "admin", latency: float = 0.0,
+        bandwidth: float | None = None, shutdown_time: float = 0.0, boot_time: float = 1.0,
+        link_latency: float = 0.0, **dialect_options
+    ):
+        """Initializes the server
+        :param username: The accepted username
+        :param password: The accepted password
+        :param latency: The delay of every output in seconds
+        :param bandwidth: The output throughput limit in bytes per second
+        :param link_latency: The delay of every packet the server sends,
+            e.g. of the SFTP responses, like the round trip of a slow link
+        :param shutdown_time: Seconds the server keeps serving after the
+            reboot is confirmed
+        :param boot_time: Seconds the port is closed while rebooting
+        :param dialect_options: Options of `RouterOSDialect`
+        """
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.shutdown_time = shutdown_time
+        self.boot_time = boot_time
+        self.link_latency = link_latency
+        self.dialect_options = dialect_options
+        self.reboots = 0
+        self.files = MemoryFiles()
+        self._reboot_timer: Timer | None = None
+
+        self.host = "127.0.0.1"
+        self.port = None
+        self._socket = None
+        self._transports: list[paramiko.Transport] = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._reboot_timer is not None:
+            self._reboot_timer.cancel()  # not started again after the exit
+        self.stop()
+
+    def start(self):
+        """Starts listening on a free port, on the previous port when
+        started again
+        """
+        self._socket = socket.socket()
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port or 0))
+        self._socket.listen()
+        self.port = self._socket.getsockname()[1]
+        Thread(target=self._accept, daemon=True).start()
+
+    def stop(self):
+        """Stops listening and closes all the sessions"""
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)  # wakes up the blocked accept
+        except OSError:
+            pass
+        self._socket.close()
+        self.drop_sessions()
+
+    def drop_sessions(self):
+        """Closes all the sessions, but keeps accepting new ones, like a
+        link flap or a quick restart of the device
+        """
+        transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def reboot(self):
+        """Stops serving after `shutdown_time` and starts again on the same
+        port `boot_time` later, like a rebooting device. Returns right away
+        """
+        def shut_down():
+            self.stop()
+            self._reboot_timer = Timer(self.boot_time, self.start)
+            self._reboot_timer.start()
+
+        self.reboots += 1
+        self._reboot_timer = Timer(self.shutdown_time, shut_down)
+        self._reboot_timer.start()
+
+    def create_dialect(self) -> RouterOSDialect:
+        return RouterOSDialect(self.username, self.password, files=self.files, **self.dialect_options)
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return  # the server is stopped
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(_DelayedSocket(client, self.link_latency) if self.link_latency else client)
+            transport.set_log_channel(SERVER_LOG_CHANNEL)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, MemorySFTPServer, self.files)
+            transport.add_server_key(host_key())
+            self._transports.append(transport)
+            try:
+                transport.start_server(server=_ServerInterface(self))
+            except (paramiko.SSHException, EOFError):
+                transport.close()  # e.g. a port probe closing without the handshake
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server: FakeSSHServer):
+        self.server = server
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password"
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        if (username, password) == (self.server.username, self.server.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes) -> bool:
+        return True
+
+    def check_channel_shell_request(self, channel: paramiko.Channel) -> bool:
+        Thread(target=self._serve_shell, args=(channel,), daemon=True).start()
+        return True
+
+    def check_channel_exec_request(self, channel: paramiko.Channel, command: bytes) -> bool:
+        Thread(target=self._serve_exec, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+    def _serve_shell(self, channel: paramiko.Channel):
+        dialect = self.server.create_dialect()
+        delivery = Delivery(channel.sendall, self.server.latency, self.server.bandwidth)
+        delivery.put(dialect.greeting())
+        while True:
+            try:
+                data = channel.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            output, closed = dialect.feed(data)
+            delivery.put(output)
+            if closed:
+                break
+        delivery.close(channel.close)
+        if dialect.rebooting:
+            self.server.reboot()
+
+    def _serve_exec(self, channel: paramiko.Channel, command: str):
+        def finish():
+            channel.send_exit_status(0)
+            channel.close()
+
+        delivery = Delivery(channel.sendall, self.server.latency, self.server.bandwidth)
+        delivery.put(self.server.create_dialect().run(command).encode())
+        delivery.close(finish)
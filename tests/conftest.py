@@ -1,7 +1,18 @@
-from pytest import fixture, mark
+import json
+from pathlib import Path
 
-from src.connectors import ConnectionType, NoSuchConnectionTypeError
+from pytest import StashKey, fixture, mark
+
+from config import FrameworkPaths, stdout_logger
+from src.connectors import METRICS, ConnectionPool, ConnectionType, NoSuchConnectionTypeError
 from src.device_lib.device_lib import DeviceLib
+from src.device_lib.exceptions import NoSuchDeviceError
+from src.device_lib.response_cache import ResponseCache
+from src.devices import DEVICES
+from src.devices.device_lease import DeviceLeases
+
+DEVICE_USAGE_DIR = FrameworkPaths.REPORTS_DIR / "device_usage"
+device_leases_key = StashKey[DeviceLeases]()
 
 
 # #####
@@ -19,10 +30,96 @@ def pytest_addoption(parser):
     parser.addoption(
         "--device",
         action="store",
-        help="Device name"
+        help="Device name, all the devices matching the tags and the "
+             "capabilities are used if not set"
+    )
+    parser.addoption(
+        "--device-tags",
+        action="store",
+        default="",
+        help="Comma separated tags the devices must have"
+    )
+    parser.addoption(
+        "--device-capabilities",
+        action="store",
+        default="",
+        help="Comma separated capabilities the devices must have, the "
+             "connection type is always required"
+    )
+    parser.addoption(
+        "--device-lease-timeout",
+        action="store",
+        type=float,
+        default=600,
+        help="Seconds a test waits for a free device"
+    )
+    parser.addoption(
+        "--device-lock-dir",
+        action="store",
+        default=FrameworkPaths.LOCK_DIR,
+        type=Path,
+        help="Directory of the device lock files shared by the processes "
+             "using the devices"
+    )
+    parser.addoption(
+        "--connection-metrics",
+        action="store",
+        help="Path of the JSON report of the per-command connection metrics, "
+             "the metrics are not collected if not set"
+    )
+    parser.addoption(
+        "--response-cache-ttl",
+        action="store",
+        type=float,
+        help="Seconds the responses of the cacheable commands are reused, "
+             "the responses are not cached if not set"
     )
 
 
+def pytest_configure(config):
+    """Enables the connection metrics if their report is requested and
+    prepares the device leases of the process
+    """
+    METRICS.enabled = config.getoption("--connection-metrics") is not None
+
+    config.stash[device_leases_key] = DeviceLeases(config.getoption("--device-lock-dir"))
+    if not _is_xdist_worker(config):
+        for report in DEVICE_USAGE_DIR.glob("*.json"):  # of the previous session
+            report.unlink()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Saves the connection metrics report and the device usage of the
+    process
+    """
+    path = session.config.getoption("--connection-metrics")
+    if path is not None:
+        path = FrameworkPaths.REPORTS_DIR / path  # absolute paths are kept as they are
+        METRICS.export_json(path)
+        stdout_logger.info("Connection metrics saved to {}", path)
+
+    stats = session.config.stash[device_leases_key].stats
+    if stats.devices:
+        stats.export_json(DEVICE_USAGE_DIR / f"{_worker_id(session.config)}.json")
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    """Reports the device usage of every worker"""
+    if _is_xdist_worker(config):
+        return
+    reports = sorted(DEVICE_USAGE_DIR.glob("*.json"))
+    if not reports:
+        return
+    terminalreporter.section("device usage")
+    for report in reports:
+        usage = json.loads(report.read_text())
+        for device_name, device in usage["devices"].items():
+            terminalreporter.write_line(
+                f"{report.stem}: {device_name}: {device['leases']} tests, busy {device['busy_time']:.1f}s "
+                f"({device['utilisation']:.0%} of {usage['elapsed']:.1f}s), waited {device['wait_time']:.1f}s"
+            )
+
+
 def pytest_collection_modifyitems(session, config, items):
     """Determines which tests need to be skipped based on
     * Connection
@@ -44,8 +141,29 @@ def pytest_collection_modifyitems(session, config, items):
 # ########
 
 @fixture(scope="session")
-def device_name(request):
-    return request.config.getoption("--device")
+def device_names(request) -> list[str]:
+    """Devices the tests are spread across"""
+    device_name = request.config.getoption("--device")
+    if device_name is not None:
+        return [device_name]
+
+    tags = _split_option(request.config.getoption("--device-tags"))
+    capabilities = _split_option(request.config.getoption("--device-capabilities"))
+    capabilities.append(request.config.getoption("--connection").lower())
+    device_names = DEVICES.select(tags, capabilities)
+    if not device_names:
+        raise NoSuchDeviceError(f"Tagged {tags} with {capabilities} capabilities")
+    return device_names
+
+
+@fixture
+def device_name(request, device_names):
+    """A free device, leased for the test, so no other worker or process
+    uses it at the same time
+    """
+    leases = request.config.stash[device_leases_key]
+    with leases.acquire(device_names, request.config.getoption("--device-lease-timeout")) as lease:
+        yield lease.device_name
 
 
 @fixture(scope="session")
@@ -63,7 +181,45 @@ def connection_type(request):
 
 
 @fixture(scope="session")
-def device_lib(connection_type, device_name):
-    device_lib = DeviceLib(connection_type, device_name)
+def connection_pool():
+    """Opened connections shared by all the tests of the session"""
+    pool = ConnectionPool()
+    yield pool
+    pool.close_all()
+    stdout_logger.info("Connection pool stats: {}", pool.stats)
+
+
+@fixture(scope="session")
+def response_cache(request):
+    """Responses of the cacheable commands shared by all the tests of the
+    session, None unless `--response-cache-ttl` is set
+    """
+    ttl = request.config.getoption("--response-cache-ttl")
+    if ttl is None:
+        yield None
+        return
+    cache = ResponseCache(ttl)
+    yield cache
+    stdout_logger.info("Response cache stats: {}", cache.stats)
+
+
+@fixture
+def device_lib(connection_type, device_name, connection_pool, response_cache):
+    """Device library of the leased device. The connection is taken from
+    the pool, so the tests leasing the same device reuse it
+    """
+    device_lib = DeviceLib(connection_type, device_name, connection_pool, response_cache)
     yield device_lib
-    device_lib.connection.close_connection()
+    device_lib.close()
+
+
+def _split_option(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _is_xdist_worker(config) -> bool:
+    return hasattr(config, "workerinput")
+
+
+def _worker_id(config) -> str:
+    return config.workerinput["workerid"] if _is_xdist_worker(config) else "main"
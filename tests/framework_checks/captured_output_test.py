@@ -0,0 +1,75 @@
+import re
+import socket
+import tracemalloc
+from threading import Thread
+
+from pytest import fixture, mark
+
+from src.fake_device import LoopbackDevices, SocketConnection
+
+PROMPT = b"[admin@MikroTik] > "
+
+
+@fixture
+def devices():
+    devices = LoopbackDevices(output_size=4 * 1024 * 1024)
+    yield devices
+    devices.stop()
+
+
+def test_small_output_stays_in_memory(devices):
+    connection = devices.connect()
+    with connection.capture_command("system clock print") as output:
+        assert not output.spilled
+        assert output.decode() == "      time: 12:00:00\r\n      date: jan/01/2024\r\n  time-zone-name: UTC\r\n"
+        assert list(output.lines())[-1] == "  time-zone-name: UTC"
+    connection.close_connection()
+
+
+def test_large_output_spills_to_file(devices, tmp_path):
+    connection = devices.connect()
+    with connection.capture_command("export", max_memory=256 * 1024, spill_dir=tmp_path) as output:
+        assert output.spilled
+        assert len(output) >= 4 * 1024 * 1024
+        assert output[:23] == b"/ip firewall filter add"
+        assert output[output.rfind(b"\r\n", 0, len(output) - 2) + 2:].endswith(b"protocol=tcp\r\n")
+        assert output.find(b"comment=rule1000 ") > 0
+
+        path = tmp_path / "export.rsc"
+        output.save(path)
+        assert path.stat().st_size == len(output)
+
+    assert connection.send_command("system identity print") == "name: MikroTik"
+    connection.close_connection()
+
+
+def send_large_output(remote: socket.socket, chunks: int):
+    line = b""
+    while b"\r\n" not in line:
+        line += remote.recv(1024)
+    line = line.split(b"\r\n")[0]
+    marker = "".join(re.findall(r'"(\w+)"', line.decode())[:2]).encode()
+    remote.sendall(PROMPT + line + b"\r\n" + marker + b"\r\n")
+    chunk = b"x" * 65534 + b"\r\n"
+    for _ in range(chunks):
+        remote.sendall(chunk)
+    remote.sendall(marker + b"\r\n" + PROMPT)
+
+
+@mark.slow
+def test_memory_does_not_grow_with_output_size():
+    local, remote = socket.socketpair()
+    connection = SocketConnection(local)
+    chunks = 512  # 32 MiB
+    Thread(target=send_large_output, args=(remote, chunks), daemon=True).start()
+
+    tracemalloc.start()
+    output = connection.capture_command("log print", timeout=10, max_memory=1024 * 1024)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(output) == chunks * 65536
+    assert peak < 4 * 1024 * 1024
+    output.close()
+    connection.close_connection()
+    remote.close()
@@ -0,0 +1,110 @@
+import re
+import select
+import socket
+from threading import Thread
+from time import monotonic
+
+from pytest import fixture
+
+from src.connectors.base_connection import OutputSplitter
+from src.fake_device import LoopbackDevices, SocketConnection
+
+PROMPT = b"[admin@MikroTik] > "
+
+
+def serve_ping(remote: socket.socket, count: int, interval: float = 0.02) -> list[bytes]:
+    """Answers one ping command with a line every interval until Ctrl-C,
+    then answers `system identity print`
+    :return:
+        - received: The data received after the ping command
+    """
+    line = b""
+    while b"\r\n" not in line:
+        line += remote.recv(1024)
+    line = line.split(b"\r\n")[0]
+    marker = "".join(re.findall(r'"(\w+)"', line.decode())[:2]).encode()
+    remote.sendall(PROMPT + line + b"\r\n" + marker + b"\r\n")
+
+    received = []
+    for seq in range(count):
+        remote.sendall(f"  {seq} 10.0.0.1 56 64 {seq}ms\r\n".encode())
+        if select.select([remote], [], [], interval)[0]:
+            received.append(remote.recv(1024))
+            if b"\x03" in received[-1]:
+                remote.sendall(b"  sent=3 received=3 packet-loss=0%\r\n\r\n" + PROMPT)
+                break
+    else:
+        remote.sendall(marker + b"\r\n" + PROMPT)
+
+    line = remote.recv(1024)
+    marker = "".join(re.findall(r'"(\w+)"', line.decode())[:2]).encode()
+    remote.sendall(PROMPT + line + marker + b"\r\n  name: MikroTik\r\n" + marker + b"\r\n" + PROMPT)
+    return received
+
+
+@fixture
+def socket_pair():
+    local, remote = socket.socketpair()
+    connection = SocketConnection(local)
+    yield connection, remote
+    connection.close_connection()
+    remote.close()
+
+
+def test_output_is_streamed_as_it_arrives(socket_pair):
+    connection, remote = socket_pair
+    Thread(target=serve_ping, args=(remote, 10)).start()
+
+    start = monotonic()
+    arrivals = []
+    for line in connection.send_command_stream("ping 10.0.0.1 count=10", timeout=2):
+        arrivals.append((monotonic() - start, line))
+
+    assert [line for _, line in arrivals] == [f"  {seq} 10.0.0.1 56 64 {seq}ms" for seq in range(10)]
+    assert arrivals[0][0] < arrivals[-1][0] - 0.1
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+
+
+def test_closing_the_stream_interrupts_the_command(socket_pair):
+    connection, remote = socket_pair
+    thread = Thread(target=serve_ping, args=(remote, 1000))
+    thread.start()
+
+    start = monotonic()
+    for seq, line in enumerate(connection.send_command_stream("ping 10.0.0.1", timeout=2)):
+        if seq == 2:
+            break
+    assert monotonic() - start < 1
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+    thread.join()
+
+
+def test_chunk_stream_keeps_partial_lines(socket_pair):
+    connection, remote = socket_pair
+    Thread(target=serve_ping, args=(remote, 3)).start()
+    output = "".join(connection.send_command_stream("ping 10.0.0.1 count=3", timeout=2, lines=False))
+    assert output == "".join(f"  {seq} 10.0.0.1 56 64 {seq}ms\r\n" for seq in range(3))
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+
+
+def test_splitter_bounds_long_lines():
+    splitter = OutputSplitter(max_line_length=1000)
+    parts = []
+    for _ in range(100):
+        parts += splitter.feed(b"x" * 100)
+    parts += splitter.feed("é".encode()[:1])
+    parts += splitter.feed("é\r\nend".encode()[1:])
+    parts += splitter.flush()
+
+    assert all(len(part) <= 1100 for part in parts)
+    assert "".join(parts) == "x" * 10000 + "é" + "end"
+    assert parts[-1] == "end"
+
+
+def test_stream_of_a_failing_command_ends_with_the_error():
+    devices = LoopbackDevices()
+    connection = devices.connect()
+    assert list(connection.send_command_stream("foo", timeout=2)) == ["bad command name foo (line 1 column 1)"]
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+    connection.close_connection()
+    devices.stop()
@@ -0,0 +1,61 @@
+from time import perf_counter
+
+from pytest import raises
+
+from config import FrameworkPaths
+from src.connectors import ConnectionPool, ConnectionType
+from src.device_lib.command_tree import compile_commands, load_command_tree
+from src.device_lib.device_lib import DeviceLib
+from src.device_lib.exceptions import NoSuchCommandError, NoSuchSubCommandError
+
+DEVICE_NAME = "dummy_device"
+
+
+class EchoConnection:
+    def is_alive(self) -> bool:
+        return True
+
+    def send_command(self, command: str) -> str:
+        return command
+
+
+def create_lib() -> DeviceLib:
+    pool = ConnectionPool()
+    pool.release((DEVICE_NAME, ConnectionType.SSH), EchoConnection())
+    return DeviceLib(ConnectionType.SSH, DEVICE_NAME, pool)
+
+
+def test_all_sub_commands_are_kept():
+    lib = create_lib()
+    assert lib.system.reboot().strip() == "system reboot"
+    assert lib.system.identity.print().strip() == "system identity print"
+    assert lib.system.clock.print().strip() == "system clock print"
+    assert lib.ping("10.0.0.1", "count=1") == "ping 10.0.0.1 count=1"
+
+
+def test_missing_commands():
+    lib = create_lib()
+    with raises(NoSuchCommandError):
+        lib.interface
+    with raises(NoSuchSubCommandError, match="Subcommand halt doesn't exist under system command"):
+        lib.system.halt
+
+
+def test_tree_is_shared_between_libraries():
+    assert create_lib()._commands is create_lib()._commands is load_command_tree(FrameworkPaths.COMMANDS_YAML)
+
+
+def test_large_tree():
+    raw_commands = {
+        f"menu{menu}": {f"sub{sub}": {verb: None for verb in ("add", "print", "set", "remove")} for sub in range(50)}
+        for menu in range(50)
+    }
+    start = perf_counter()
+    root = compile_commands(raw_commands)
+    assert perf_counter() - start < 1
+
+    node = root.find("menu49 sub49 print")
+    assert node.path == "menu49 sub49 print"
+    assert len(root.children["menu0"].children) == 50
+    with raises(TypeError):
+        root.children["menu0"] = node
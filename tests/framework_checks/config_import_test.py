@@ -0,0 +1,99 @@
+from pytest import fixture, mark, raises
+
+from src.connectors import SerialConnection, SSHMode
+from src.connectors.exceptions import ReadTimeoutError
+from src.device_lib.config_import import ScriptError, import_script, parse_import_output, script_commands
+from src.fake_device import FakeSerialDevice, FakeServerFleet, FakeSSHServer, LoopbackDevices, connect
+
+SCRIPT_LINES = [f"ip address add address=10.0.{index // 256}.{index % 256}/32" for index in range(2000)]
+SCRIPT = "# generated\n/\n" + "\n".join(SCRIPT_LINES) + "\n"
+RESPONSES = dict.fromkeys(SCRIPT_LINES, "")
+
+
+@fixture
+def ssh_server_options() -> dict:
+    return {"latency": 0.005, "responses": RESPONSES}
+
+
+def test_script_commands_and_errors():
+    script = "# comment\n\nbeep\nip address add \\\n    address=10.0.0.1/24\n  beep\n"
+    assert script_commands(script) == [(3, "beep"), (4, "ip address add address=10.0.0.1/24"), (6, "  beep")]
+
+    output = (
+        "bad command name foo (line 1 column 1)\r\nfailure: already have such address\r\nno such item\r\n"
+        "input does not match any value of interface\r\n  name: MikroTik\r\n"
+    )
+    assert parse_import_output(output, first_line=7) == [
+        ScriptError("bad command name foo", 7, 1), ScriptError("failure: already have such address"),
+        ScriptError("no such item"), ScriptError("input does not match any value of interface"),
+    ]
+
+
+@mark.parametrize("mode", [SSHMode.SHELL, SSHMode.EXEC])
+def test_import_over_sftp_runs_the_script_at_once(ssh_server, mode):
+    connection = connect(ssh_server, mode=mode)
+    result = import_script(connection, SCRIPT, timeout=10)
+    connection.close_connection()
+    assert result.method == "sftp" and result.ok, result.output
+    assert "executed successfully" in result.output
+    assert result.duration < 2  # 2000 commands one by one take over 10 seconds
+    assert not ssh_server.files  # the uploaded script is removed
+
+
+def test_import_reports_the_error_line(ssh_server):
+    lines = SCRIPT_LINES[:]
+    lines[1499] = "ip address add address=bad"
+    connection = connect(ssh_server)
+    result = import_script(connection, "\n".join(lines), timeout=10)
+    connection.close_connection()
+    assert result.errors == [ScriptError("bad command name ip", 1500, 1)]
+
+
+def test_failed_cleanup_doesnt_hide_the_import_error(ssh_server, monkeypatch):
+    connection = connect(ssh_server)
+
+    def time_out(*args, **kwargs):
+        raise ReadTimeoutError("[admin@MikroTik] > ", "", 10)
+
+    def lose_connection(*args, **kwargs):
+        raise EOFError()
+
+    monkeypatch.setattr(connection, "send_command", time_out)
+    monkeypatch.setattr(connection.sftp, "remove", lose_connection)
+    with raises(ReadTimeoutError):
+        import_script(connection, SCRIPT, timeout=10, file_name="cleanup.rsc")
+    monkeypatch.undo()
+    connection.sftp.remove("cleanup.rsc")
+    connection.close_connection()
+
+
+def test_paste_reports_runtime_errors_with_their_line():
+    devices = LoopbackDevices(responses={"ip address remove 5": "no such item\r\n"})
+    connection = devices.connect()
+    result = import_script(connection, "beep\n\nip address remove 5\nsystem identity print\n", timeout=2)
+    connection.close_connection()
+    devices.stop()
+    assert result.method == "paste"
+    assert result.errors == [ScriptError("no such item", 3)]
+    assert "name: MikroTik" in result.output  # the next command runs
+    assert result.duration < 1  # no timeout waiting for the failed command
+
+
+@mark.slow
+def test_serial_pastes_the_script():
+    with FakeSerialDevice(bandwidth=None) as device:
+        connection = SerialConnection(device.port, device.username, device.password)
+        connection.open_connection()
+        result = import_script(connection, "beep\n# comment\nsystem identity \\\n  print\nfoo\n", timeout=5)
+        connection.close_connection()
+    assert result.method == "paste"
+    assert "name: MikroTik" in result.output
+    assert result.errors == [ScriptError("bad command name foo", 5, 1)]
+
+
+def test_fleet_imports_the_scripts_of_the_devices(ssh_server):
+    with FakeSSHServer(responses=RESPONSES) as other_server:
+        with FakeServerFleet({"mikrotik_rb2011u1as": ssh_server, "dummy_device": other_server}) as fleet:
+            results = fleet.import_config({"mikrotik_rb2011u1as": SCRIPT, "dummy_device": "beep\nfoo\n"}, timeout=10)
+    assert results["mikrotik_rb2011u1as"].value.ok
+    assert results["dummy_device"].value.errors == [ScriptError("bad command name foo", 2, 1)]
@@ -0,0 +1,21 @@
+from pytest import fixture
+
+from src.fake_device import FakeSSHServer
+
+
+# ########
+# Fixtures
+# ########
+
+@fixture
+def ssh_server_options() -> dict:
+    """Arguments of the `ssh_server`, overridden by the modules needing
+    other latencies or responses
+    """
+    return {}
+
+
+@fixture
+def ssh_server(ssh_server_options):
+    with FakeSSHServer(**ssh_server_options) as server:
+        yield server
@@ -0,0 +1,68 @@
+import json
+
+from pytest import fixture
+
+from src.connectors import METRICS, SyncMode
+from src.connectors.metrics import Histogram, MetricsRegistry
+from src.fake_device import LoopbackDevices
+
+
+@fixture
+def metrics():
+    METRICS.clear()
+    METRICS.enabled = True
+    yield METRICS
+    METRICS.enabled = False
+    METRICS.clear()
+
+
+@fixture
+def connection():
+    devices = LoopbackDevices(latency=0.005)
+    connection = devices.connect()
+    connection.metrics_label = "loopback"
+    yield connection
+    connection.close_connection()
+    devices.stop()
+
+
+def test_metrics_per_device_and_command(metrics, connection, tmp_path):
+    for _ in range(3):
+        connection.send_command("system identity print")
+    connection.send_command("ip address add address=10.0.0.1/24 interface=ether1", sync_mode=SyncMode.QUIET_PERIOD)
+
+    stats = metrics.as_dict()["loopback"]
+    assert set(stats) == {"system identity print", "ip address add"}
+
+    identity = stats["system identity print"]
+    assert identity["total_s"]["count"] == 3
+    assert identity["total_s"]["min"] >= 0.005
+    assert identity["phases_s"]["first_byte"]["mean"] > identity["phases_s"]["write"]["mean"]
+    assert identity["bytes_in"] > 0 and identity["bytes_out"] > 3 * len("system identity print")
+    assert identity["reads"] >= 3
+    assert stats["ip address add"]["phases_s"]["clear"]["min"] >= 0.5  # the two quiet periods
+
+    path = tmp_path / "metrics.json"
+    metrics.export_json(path)
+    assert json.loads(path.read_text()) == metrics.as_dict()
+
+
+def test_metrics_disabled(connection):
+    METRICS.clear()
+    connection.send_command("system identity print")
+    assert METRICS.as_dict() == {}
+
+
+def test_histogram_quantiles():
+    histogram = Histogram()
+    for value in [0.001] * 90 + [0.1] * 10:
+        histogram.add(value)
+    assert histogram.quantile(0.5) <= 0.002
+    assert 0.1 <= histogram.quantile(0.99) <= 0.2
+    assert histogram.max == 0.1
+
+
+def test_command_name():
+    assert MetricsRegistry.command_name("/system reboot") == "/system reboot"
+    assert MetricsRegistry.command_name("ping 10.0.0.1 count=1") == "ping"
+    assert MetricsRegistry.command_name('ip address print where comment="a b"') == "ip address print where"
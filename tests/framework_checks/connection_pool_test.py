@@ -0,0 +1,46 @@
+from time import sleep
+
+from src.connectors import ConnectionPool
+
+KEY = ("dummy_device", "ssh")
+
+
+class StubConnection:
+    def __init__(self):
+        self.alive = False
+
+    def open_connection(self):
+        self.alive = True
+
+    def close_connection(self):
+        self.alive = False
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+
+def test_pool_reuses_released_connections():
+    pool = ConnectionPool()
+    first = pool.acquire(KEY, StubConnection)
+    pool.release(KEY, first)
+    assert pool.acquire(KEY, StubConnection) is first
+    assert (pool.stats.hits, pool.stats.misses) == (1, 1)
+
+
+def test_pool_discards_dead_connections():
+    pool = ConnectionPool()
+    first = pool.acquire(KEY, StubConnection)
+    pool.release(KEY, first)
+    first.alive = False
+    assert pool.acquire(KEY, StubConnection) is not first
+    assert (pool.stats.discarded, pool.stats.misses) == (1, 2)
+
+
+def test_pool_evicts_idle_connections():
+    pool = ConnectionPool(max_idle=0.1)
+    first = pool.acquire(KEY, StubConnection)
+    pool.release(KEY, first)
+    sleep(0.2)
+    assert pool.acquire(KEY, StubConnection) is not first
+    assert not first.alive
+    assert pool.stats.evictions == 1
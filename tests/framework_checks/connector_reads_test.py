@@ -0,0 +1,100 @@
+from pytest import raises
+
+from src.connectors.base_connection import BaseConnection, ReceiveBuffer
+from src.connectors.exceptions import ReadTimeoutError
+from src.connectors.prompt_matcher import PromptMatcher
+
+
+class ChunkedConnection(BaseConnection):
+    """Connection returning the predefined chunks one read at a time"""
+
+    def __init__(self, *chunks: bytes):
+        super().__init__()
+        self.prompt = self.SHELL_PROMPT
+        self.chunks = list(chunks)
+
+    def open_connection(self):
+        pass
+
+    def close_connection(self):
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+    def output_available(self) -> bool:
+        return bool(self.chunks)
+
+    def get_read_timeout(self) -> float:
+        return 0
+
+    def set_read_timeout(self, timeout: float):
+        pass
+
+    def write(self, data: str):
+        pass
+
+    def read(self, count: int = 1) -> bytes:
+        return self.chunks.pop(0) if self.chunks else b""
+
+    def _wait_for_shutdown(self, deadline: float):
+        pass
+
+    def _wait_for_boot(self, deadline: float):
+        pass
+
+
+def test_read_until_match_split_across_chunks():
+    connection = ChunkedConnection(b"Log", b"in: adm", b"in\r\nPass", b"word: rest")
+    assert connection.read_until("Login: ", timeout=1) == "Login: "
+    assert connection.read_until("Password: ", timeout=1) == "admin\r\nPassword: "
+    assert connection.read_until("rest", timeout=1) == "rest"
+
+
+def test_read_until_regexp_in_a_long_line_split_across_chunks():
+    connection = ChunkedConnection(*[b"#" * 1000] * 100, b" 4", b"2% done", b"\r\n")
+    assert connection.read_until_regexp(r"\d+% done", timeout=1).endswith("# 42% done")
+
+
+def test_search_rescans_a_long_line_only_by_the_match_window():
+    class RecordingPattern:
+        def __init__(self):
+            self.positions = []
+
+        def search(self, data, position):
+            self.positions.append(position)
+            return None
+
+    buffer = ReceiveBuffer()
+    pattern = RecordingPattern()
+    for _ in range(100):
+        buffer.feed(b"#" * 1000)
+        buffer.search(pattern, max_length=64)
+    assert pattern.positions == [0] + [1000 * count - 63 for count in range(1, 100)]
+
+
+def test_read_until_prompt_keeps_data_after_prompt():
+    connection = ChunkedConnection(b"name: MikroTik\r\n[admin@Mikro", b"Tik] > beep\r\n[admin@MikroTik] > ")
+    assert connection.read_until_prompt(timeout=1) == "name: MikroTik\r\n[admin@MikroTik] > "
+    assert connection.read_until_prompt(timeout=1) == "beep\r\n[admin@MikroTik] > "
+
+
+def test_read_until_timeout_reports_read_output():
+    connection = ChunkedConnection(b"partial output")
+    with raises(ReadTimeoutError) as error:
+        connection.read_until("never", timeout=0.1)
+    assert error.value.got == "partial output"
+
+
+def test_prompt_matcher_handles_split_utf8_sequences():
+    data = "ім'я: Мікротік\r\n[admin@MikroTik] > ".encode()
+    matcher = PromptMatcher(BaseConnection.SHELL_PROMPT, max_prompt_length=32)
+    ends = [matcher.feed(data[index:index + 1]) for index in range(len(data))]
+    assert ends[-1] == len(data)
+    assert data[matcher.start:matcher.end] == b"[admin@MikroTik] > "
+
+
+def test_extract_response_uses_prompt_offset():
+    connection = ChunkedConnection(b"system identity print\r\n  name: MikroTik\r\n[admin@MikroTik] > ")
+    data, prompt_start = connection._read_until_prompt_match(timeout=1)
+    assert connection._extract_response("system identity print", data, prompt_start).strip() == "name: MikroTik"
@@ -0,0 +1,164 @@
+import asyncio
+import re
+import socket
+from threading import Thread, Timer
+from time import monotonic, process_time
+
+from pytest import fixture, mark, raises
+
+from src.connectors.async_connection import AsyncBaseConnection
+from src.connectors.base_connection import SyncMode
+from src.connectors.exceptions import ReadTimeoutError
+from src.fake_device import SocketConnection
+
+
+@fixture
+def socket_pair():
+    local, remote = socket.socketpair()
+    connection = SocketConnection(local)
+    yield connection, remote
+    connection.close_connection()
+    remote.close()
+
+
+@mark.slow
+def test_waiting_for_output_does_not_spin(socket_pair):
+    connection, _ = socket_pair
+    start_cpu, start_wall = process_time(), monotonic()
+    with raises(ReadTimeoutError):
+        connection.read_until_prompt(timeout=5)
+    cpu_time, wall_time = process_time() - start_cpu, monotonic() - start_wall
+
+    assert wall_time >= 5
+    assert cpu_time < 0.1 * wall_time
+
+
+def test_read_wakes_up_on_output(socket_pair):
+    connection, remote = socket_pair
+    Timer(0.2, remote.sendall, (b"name: MikroTik\r\n[admin@MikroTik] > ",)).start()
+    start = monotonic()
+    assert connection.read_until("MikroTik] > ", timeout=5).endswith("[admin@MikroTik] > ")
+    assert monotonic() - start < 1
+
+
+def test_clear_output_buffer_waits_for_quiet_period(socket_pair):
+    connection, remote = socket_pair
+    remote.sendall(b"stale output")
+    Timer(0.2, remote.sendall, (b"more stale output",)).start()
+    start = monotonic()
+    connection.clear_output_buffer(timeout=0.5)
+    assert monotonic() - start >= 0.7
+    assert not connection.output_available()
+
+
+SENTINEL_LINE = re.compile(r':put \("(\w+)" \. "(\w+)"\); (.*); :put \("\w+" \. "\w+"\)')
+
+
+def answer_commands(remote: socket.socket, *responses: bytes, wrap: int | None = None):
+    """Answers the commands the way RouterOS does: echo, output, prompt. An
+    unknown command is a syntax error, nothing of its line runs. A `failure:`
+    stops the line after the command
+    :param wrap: The terminal width the echo is wrapped at
+    """
+    received = b""
+    for response in responses:
+        while b"\r\n" not in received:
+            received += remote.recv(1024)
+        line, received = received.split(b"\r\n", 1)
+        echo = b"[admin@MikroTik] > " + line
+        if wrap:
+            echo = b"\r\n".join(echo[index:index + wrap] for index in range(0, len(echo), wrap))
+        remote.sendall(echo + b"\r\n")
+        sentinel = SENTINEL_LINE.fullmatch(line.decode())
+        if sentinel is None:
+            remote.sendall(response + b"[admin@MikroTik] > ")
+            continue
+        marker = (sentinel.group(1) + sentinel.group(2) + "\r\n").encode()
+        command = sentinel.group(3)
+        if response.startswith(b"bad command name"):
+            column = line.decode().index(command) + 1
+            remote.sendall(response + f" (line 1 column {column})\r\n".encode())
+        elif response.startswith(b"failure:"):
+            remote.sendall(marker + response)
+        else:
+            remote.sendall(marker + response + marker)
+        remote.sendall(b"[admin@MikroTik] > ")
+
+
+def test_sentinel_sync_returns_without_quiet_periods(socket_pair):
+    connection, remote = socket_pair
+    Thread(target=answer_commands, args=(remote, b"  name: MikroTik\r\n")).start()
+    start = monotonic()
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+    assert monotonic() - start < 0.4
+
+
+def test_quiet_period_sync_is_still_available(socket_pair):
+    connection, remote = socket_pair
+    Thread(target=answer_commands, args=(remote, b"  name: MikroTik\r\n")).start()
+    response = connection.send_command("system identity print", timeout=2, sync_mode=SyncMode.QUIET_PERIOD)
+    assert response == "name: MikroTik"
+
+
+def test_async_connection_sends_commands_concurrently():
+    pairs = [socket.socketpair() for _ in range(20)]
+    for _, remote in pairs:
+        Timer(0.2, answer_commands, (remote, b"  name: MikroTik\r\n")).start()
+
+    async def send_all():
+        connections = [AsyncBaseConnection(SocketConnection(local)) for local, _ in pairs]
+        return await asyncio.gather(*(conn.send_command("system identity print", timeout=2) for conn in connections))
+
+    start = monotonic()
+    assert asyncio.run(send_all()) == ["name: MikroTik"] * len(pairs)
+    assert monotonic() - start < 1
+    for sockets in pairs:
+        for sock in sockets:
+            sock.close()
+
+
+def test_pipelined_commands_are_split_by_markers(socket_pair):
+    connection, remote = socket_pair
+    responses = [f"  response {index}\r\n".encode() for index in range(10)]
+    Thread(target=answer_commands, args=(remote, *responses)).start()
+    commands = [f"command {index}" for index in range(10)]
+    assert connection.send_commands(commands, timeout=2, pipeline_depth=4) == [
+        f"response {index}" for index in range(10)
+    ]
+
+
+def test_failing_commands_return_the_error(socket_pair):
+    connection, remote = socket_pair
+    Thread(target=answer_commands, args=(
+        remote, b"bad command name foo", b"failure: already have such address\r\n", b"  name: MikroTik\r\n"
+    )).start()
+    start = monotonic()
+    assert connection.send_command("foo bar", timeout=2) == "bad command name foo (line 1 column 1)"
+    assert connection.send_command("ip address add address=10.0.0.1/24", timeout=2) == (
+        "failure: already have such address"
+    )
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+    assert monotonic() - start < 0.5  # no timeout waiting for the marker
+
+
+def test_wrapped_echo_does_not_leak_into_the_response(socket_pair):
+    connection, remote = socket_pair
+    Thread(target=answer_commands, args=(remote, b"  comment: long\r\n"), kwargs={"wrap": 80}).start()
+    command = "ip firewall filter print where comment=" + "x" * 100
+    assert connection.send_command(command, timeout=2) == "comment: long"
+
+
+def test_failing_command_in_a_batch_doesnt_stall_the_rest(socket_pair):
+    connection, remote = socket_pair
+    responses = [f"  response {index}\r\n".encode() for index in range(10)]
+    responses[3] = b"bad command name command"
+    responses[6] = b"failure: no such item\r\n"
+    Thread(target=answer_commands, args=(remote, *responses)).start()
+    start = monotonic()
+    results = connection.send_commands([f"command {index}" for index in range(10)], timeout=2, pipeline_depth=4)
+    assert monotonic() - start < 0.5
+    assert results[3] == "bad command name command (line 1 column 1)"
+    assert results[6] == "failure: no such item"
+    assert [result for index, result in enumerate(results) if index not in (3, 6)] == [
+        f"response {index}" for index in range(10) if index not in (3, 6)
+    ]
@@ -0,0 +1,50 @@
+from time import monotonic, sleep
+
+from src.connectors import ConnectionType
+from src.device_lib.device_fleet import DeviceFleet
+
+DEVICE_DELAYS = {"mikrotik_rb2011u1as": 0.3, "dummy_device": 0.2}
+
+
+class DelayedConnection:
+    def __init__(self, device_name: str):
+        self.device_name = device_name
+
+    def send_command(self, command: str, timeout: float) -> str:
+        sleep(DEVICE_DELAYS[self.device_name])
+        if command == "fail":
+            raise TimeoutError(command)
+        return f"{self.device_name}: {command}"
+
+
+class DelayedLib:
+    def __init__(self, connection_type: ConnectionType, device_name: str, pool=None, response_cache=None):
+        sleep(DEVICE_DELAYS[device_name])
+        self.connection = DelayedConnection(device_name)
+
+    def send_command(self, command: str, timeout: float) -> str:
+        return self.connection.send_command(command, timeout)
+
+    def close(self):
+        pass
+
+
+class DelayedFleet(DeviceFleet):
+    lib_class = DelayedLib
+
+
+def test_fleet_runs_devices_in_parallel():
+    start = monotonic()
+    with DelayedFleet(ConnectionType.SSH, DEVICE_DELAYS) as fleet:
+        results = fleet.send_command("beep")
+    assert monotonic() - start < 0.9
+    assert {name: result.value for name, result in results.items()} == {
+        "mikrotik_rb2011u1as": "mikrotik_rb2011u1as: beep", "dummy_device": "dummy_device: beep"
+    }
+
+
+def test_fleet_reports_errors_per_device():
+    with DelayedFleet(ConnectionType.SSH, DEVICE_DELAYS) as fleet:
+        results = fleet.send_command({"mikrotik_rb2011u1as": "fail", "dummy_device": "beep"})
+    assert isinstance(results["mikrotik_rb2011u1as"].error, TimeoutError)
+    assert results["dummy_device"].ok
@@ -0,0 +1,110 @@
+from multiprocessing import get_context
+from time import monotonic, sleep
+
+from pytest import raises
+
+from config import FrameworkPaths
+from src.devices.device_lease import DeviceLeases
+from src.devices.device_registry import DeviceRegistry
+from src.devices.exceptions import DeviceLeaseTimeoutError
+
+DEVICES_YAML = """\
+default:
+  ip: null
+  serial_connected: false
+  tags: []
+  capabilities: []
+router1:
+  ip: 10.0.0.1
+  tags: [lab1]
+router2:
+  ip: 10.0.0.2
+  serial_connected: true
+  tags: [lab1, lte]
+  capabilities: [wifi]
+router3:
+  serial_connected: true
+  tags: [lab2]
+"""
+
+
+def try_lease(lock_dir, device_name) -> bool:
+    lease = DeviceLeases(lock_dir).try_acquire(device_name)
+    if lease is None:
+        return False
+    lease.release()
+    return True
+
+
+def run_tests(lock_dir, device_names, tests, duration) -> list[tuple[str, float, float]]:
+    """Runs the tests of a worker, each leasing a device for the duration
+    :return:
+        - leases: The device, start and end of every lease
+    """
+    leases = DeviceLeases(lock_dir, poll_interval=0.005)
+    intervals = []
+    for _ in range(tests):
+        with leases.acquire(device_names, timeout=10) as lease:
+            start = monotonic()
+            sleep(duration)
+            intervals.append((lease.device_name, start, monotonic()))
+    return intervals
+
+
+def test_lease_excludes_other_processes(tmp_path):
+    leases = DeviceLeases(tmp_path)
+    with get_context("spawn").Pool(1) as pool:
+        with leases.acquire(["router1"]) as lease:
+            assert lease.device_name == "router1"
+            assert not pool.apply(try_lease, (tmp_path, "router1"))
+            assert pool.apply(try_lease, (tmp_path, "router2"))
+        assert lease.released
+        assert pool.apply(try_lease, (tmp_path, "router1"))
+
+
+def test_acquire_times_out(tmp_path):
+    with DeviceLeases(tmp_path).acquire(["router1"]):
+        with raises(DeviceLeaseTimeoutError):
+            DeviceLeases(tmp_path, poll_interval=0.01).acquire(["router1"], timeout=0.05)
+
+
+def test_workers_spread_across_devices(tmp_path):
+    workers, tests, duration = 4, 5, 0.05
+    elapsed = {}
+    with get_context("spawn").Pool(workers) as pool:
+        pool.map(sleep, [0] * workers)  # the workers are started
+        for devices in (["router1"], ["router1", "router2", "router3", "router4"]):
+            start = monotonic()
+            results = pool.starmap(run_tests, [(tmp_path, devices, tests, duration)] * workers)
+            elapsed[len(devices)] = monotonic() - start
+
+            intervals = sorted(interval for worker in results for interval in worker)
+            assert len(intervals) == workers * tests
+            for (device, _, end), (next_device, next_start, _) in zip(intervals, intervals[1:]):
+                assert device != next_device or end <= next_start  # never two leases at once
+
+    assert elapsed[1] >= workers * tests * duration
+    assert elapsed[4] < elapsed[1] / 2
+
+
+def test_usage_stats(tmp_path):
+    leases = DeviceLeases(tmp_path)
+    for _ in range(2):
+        with leases.acquire(["router1"]):
+            sleep(0.01)
+    usage = leases.stats.as_dict()["devices"]["router1"]
+    assert usage["leases"] == 2
+    assert usage["busy_time"] >= 0.02
+    assert 0 < usage["utilisation"] <= 1
+
+
+def test_select_devices(tmp_path, monkeypatch):
+    monkeypatch.setattr(FrameworkPaths, "CACHE_DIR", tmp_path / "cache")
+    path = tmp_path / "devices.yaml"
+    path.write_text(DEVICES_YAML)
+    devices = DeviceRegistry(path)
+    assert devices.select() == ["router1", "router2", "router3"]
+    assert devices.select(tags=["lab1"]) == ["router1", "router2"]
+    assert devices.select(capabilities=["serial"]) == ["router2", "router3"]
+    assert devices.select(tags=["lab1"], capabilities=["ssh", "wifi"]) == ["router2"]
+    assert devices.select(tags=["lab3"]) == []
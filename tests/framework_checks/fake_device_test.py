@@ -0,0 +1,81 @@
+import asyncio
+
+from pytest import fixture, mark
+
+from src.connectors import SerialConnection, SSHMode, SyncMode
+from src.connectors.async_connection import AsyncSSHConnection
+from src.fake_device import FakeSerialDevice, RouterOSDialect, connect
+
+
+@fixture
+def ssh_server_options() -> dict:
+    return {"output_size": 256 * 1024}
+
+
+@fixture
+def ssh_connection(ssh_server):
+    connection = connect(ssh_server)
+    yield connection
+    connection.close_connection()
+
+
+def test_ssh_shell_commands(ssh_connection):
+    assert ssh_connection.send_command("system identity print") == "name: MikroTik"
+    assert ssh_connection.send_command("system identity print", sync_mode=SyncMode.QUIET_PERIOD) == "name: MikroTik"
+    assert ssh_connection.send_commands(["beep", "system identity print"]) == ["", "name: MikroTik"]
+
+
+def test_ssh_shell_large_output(ssh_connection):
+    output = ssh_connection.send_command("export")
+    assert len(output) >= 256 * 1024
+    assert output.startswith("/ip firewall filter add") and output.endswith("protocol=tcp")
+
+
+def test_ssh_exec_mode(ssh_server):
+    connection = connect(ssh_server, mode=SSHMode.EXEC)
+    assert connection.send_command("system identity print; beep") == "name: MikroTik"
+    assert list(connection.send_command_stream("system clock print"))[-1] == "  time-zone-name: UTC"
+    with connection.capture_command("export", max_memory=64 * 1024) as output:
+        assert output.spilled and len(output) >= 256 * 1024
+    connection.close_connection()
+
+
+def test_async_ssh_connections(ssh_server):
+    long_text = "x" * 100_000  # sent in several packets
+
+    async def run_all() -> list[list[str]]:
+        connections = [
+            AsyncSSHConnection(ssh_server.host, ssh_server.username, ssh_server.password, ssh_server.port)
+            for _ in range(5)
+        ]
+        await asyncio.gather(*(connection.open_connection() for connection in connections))
+
+        async def run(connection: AsyncSSHConnection) -> list[str]:
+            responses = [
+                await connection.send_command("system identity print"),
+                await connection.send_command(f':put "{long_text}"'),
+                await connection.send_command("system identity print", sync_mode=SyncMode.QUIET_PERIOD),
+            ]
+            await connection.close_connection()
+            return responses
+
+        return await asyncio.gather(*(run(connection) for connection in connections))
+
+    assert asyncio.run(run_all()) == [["name: MikroTik", long_text, "name: MikroTik"]] * 5
+
+
+def test_command_line_stops_at_the_first_error():
+    dialect = RouterOSDialect(responses={"ip address remove 5": "no such item\r\n"})
+    assert dialect.run("system identity print; foo; beep") == "bad command name foo (line 1 column 24)\r\n"
+    assert dialect.run("ip address remove 5; system identity print") == "no such item\r\n"
+    output, _ = dialect.feed(b':put "a"; ip address remove 5; :put "b"\r\n')
+    assert output.decode().split("\r\n")[1:] == ["a", "no such item", "[admin@MikroTik] > "]
+
+
+@mark.slow
+def test_serial_login_and_commands():
+    with FakeSerialDevice() as device:
+        connection = SerialConnection(device.port, device.username, device.password)
+        connection.open_connection()
+        assert connection.send_command("system identity print") == "name: MikroTik"
+        connection.close_connection()
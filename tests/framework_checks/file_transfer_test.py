@@ -0,0 +1,123 @@
+import hashlib
+import os
+import socket
+from pathlib import Path
+from threading import Timer
+from time import monotonic
+
+from pytest import fixture, raises
+
+from src.connectors import FileTransfer, RateLimiter
+from src.connectors.exceptions import ChecksumMismatchError, FileTransferNotSupportedError
+from src.connectors.file_transfer import CHUNK_SIZE
+from src.fake_device import FakeServerFleet, FakeSSHServer, SocketConnection, connect
+
+DATA = os.urandom(1024 * 1024 + 123)  # not a multiple of the chunk size
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class RecordingLimiter(RateLimiter):
+    """Rate limiter recording when the charged bytes were let through"""
+
+    def __init__(self, bytes_per_second: float):
+        super().__init__(bytes_per_second)
+        self.charges: list[tuple[float, int]] = []
+
+    def consume(self, count: int):
+        super().consume(count)
+        self.charges.append((monotonic(), count))
+
+
+@fixture
+def ssh_server_options() -> dict:
+    return {"link_latency": 0.005}
+
+
+@fixture
+def connection(ssh_server):
+    connection = connect(ssh_server)
+    yield connection
+    connection.close_connection()
+
+
+@fixture
+def firmware(tmp_path) -> Path:
+    path = tmp_path / "routeros.npk"
+    path.write_bytes(DATA)
+    return path
+
+
+def test_upload_and_download(ssh_server, connection, firmware, tmp_path):
+    transfer = FileTransfer(connection, segment_size=256 * 1024)
+    uploaded = transfer.upload(firmware)
+    assert bytes(ssh_server.files["routeros.npk"]) == DATA and "routeros.npk.part" not in ssh_server.files
+    assert uploaded.sha256 == SHA256 and uploaded.transferred == len(DATA)
+
+    downloaded = transfer.download("routeros.npk", tmp_path / "backup" / "routeros.npk", expected_sha256=SHA256)
+    assert (tmp_path / "backup" / "routeros.npk").read_bytes() == DATA
+    assert downloaded.sha256 == SHA256 and not list((tmp_path / "backup").glob("*.part"))
+
+
+def test_upload_resumes_the_partial_file(ssh_server, connection, firmware):
+    ssh_server.files["routeros.npk.part"] = bytearray(DATA[:300_000])
+    result = FileTransfer(connection).upload(firmware)
+    assert result.transferred == len(DATA) - 294_912  # from the last complete chunk
+    assert result.sha256 == SHA256 and bytes(ssh_server.files["routeros.npk"]) == DATA
+
+    ssh_server.files["routeros.npk.part"] = bytearray(os.urandom(300_000))  # of another file
+    assert FileTransfer(connection).upload(firmware).transferred == len(DATA)
+    assert bytes(ssh_server.files["routeros.npk"]) == DATA
+
+
+def test_download_resumes_and_checks_the_checksum(ssh_server, connection, tmp_path):
+    ssh_server.files["backup.backup"] = bytearray(DATA)
+    (tmp_path / "backup.backup.part").write_bytes(DATA[:500_000])
+    result = FileTransfer(connection).download("backup.backup", tmp_path / "backup.backup", expected_sha256=SHA256)
+    assert result.transferred == len(DATA) - 491_520 and result.sha256 == SHA256
+    assert (tmp_path / "backup.backup").read_bytes() == DATA
+
+    with raises(ChecksumMismatchError):
+        FileTransfer(connection).download("backup.backup", tmp_path / "other.backup", expected_sha256="0" * 64)
+    assert not list(tmp_path.glob("other.backup*"))
+
+
+def test_download_is_paced_per_chunk(ssh_server, connection, tmp_path):
+    ssh_server.files["backup.backup"] = bytearray(DATA)
+    limiter = RecordingLimiter(2 * 1024 * 1024)
+    start = monotonic()
+    FileTransfer(connection, limiter).download("backup.backup", tmp_path / "backup.backup")
+    assert monotonic() - start >= (len(DATA) - limiter.burst) / limiter.rate - 0.05
+    assert max(count for _, count in limiter.charges) <= CHUNK_SIZE
+    charged = 0
+    for charged_at, count in limiter.charges:  # never more than the burst ahead of the cap
+        charged += count
+        assert charged <= limiter.burst + (charged_at - start) * limiter.rate + CHUNK_SIZE
+
+
+def test_interrupted_upload_continues_after_reconnect(ssh_server, connection, firmware):
+    Timer(0.3, ssh_server.drop_sessions).start()
+    result = FileTransfer(connection, RateLimiter(2 * 1024 * 1024)).upload(firmware)
+    assert result.transferred < len(DATA)  # the second attempt resumed
+    assert bytes(ssh_server.files["routeros.npk"]) == DATA and connection.reconnect_times
+
+
+def test_connections_without_sftp_are_rejected():
+    local, remote = socket.socketpair()
+    with local, remote, raises(FileTransferNotSupportedError):
+        FileTransfer(SocketConnection(local))
+
+
+def test_fleet_transfers_under_the_bandwidth_cap(firmware, tmp_path):
+    with FakeSSHServer() as first, FakeSSHServer() as second:
+        servers = {"mikrotik_rb2011u1as": first, "dummy_device": second}
+        with FakeServerFleet(servers) as fleet:
+            start = monotonic()
+            uploads = fleet.upload_file(firmware, bandwidth=4 * 1024 * 1024)
+            elapsed = monotonic() - start
+            downloads = fleet.download_file("routeros.npk", tmp_path / "downloads")
+
+    assert elapsed >= 2 * len(DATA) / (4 * 1024 * 1024) - 0.2  # both uploads shared the cap
+    for device_name in servers:
+        assert uploads[device_name].value.sha256 == SHA256
+        assert downloads[device_name].value.sha256 == SHA256
+        assert (tmp_path / "downloads" / device_name / "routeros.npk").read_bytes() == DATA
@@ -0,0 +1,18 @@
+import subprocess
+import sys
+from pathlib import Path
+
+FRAMEWORK_ROOT = Path(__file__).parents[2]
+FRAMEWORK_MODULES = ("config", "src.connectors", "src.devices", "src.device_lib.device_lib")
+LAZY_DEPENDENCIES = ("paramiko", "serial", "yaml", "loguru")
+
+
+def test_framework_import_leaves_heavy_dependencies_out_of_sys_modules():
+    script = (
+        f"import sys, {', '.join(FRAMEWORK_MODULES)}\n"
+        "print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))"
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", script], cwd=FRAMEWORK_ROOT, capture_output=True, text=True, check=True
+    )
+    assert set(process.stdout.split()).isdisjoint(LAZY_DEPENDENCIES)
@@ -0,0 +1,109 @@
+from pytest import fixture
+
+from src.device_lib.command_tree import compile_commands
+from src.device_lib.device_lib import Command
+from src.device_lib.print_parser import parse_print
+from src.fake_device import LoopbackDevices
+
+PROPERTIES = """\
+                   uptime: 1d2h3m4s
+                  version: 7.11 (stable)
+              free-memory: 30.0MiB
+        architecture-name: arm
+                board-name: hAP ac^2
+"""
+
+TERSE = """\
+Flags: X - disabled, I - invalid, D - dynamic
+ 0   ;;; defconf
+     address=192.168.88.1/24 network=192.168.88.0 interface=bridge actual-interface=bridge
+ 1 D address=10.0.0.5/24 network=10.0.0.0 interface=ether1 actual-interface=ether1
+ 2 X address=10.1.0.1/24 network=10.1.0.0 interface=ether2 comment="lab \\"b\\" side"
+"""
+
+DETAIL = """\
+Flags: X - disabled, R - running
+ 0  R name="ether1" default-name="ether1" type="ether" mtu=1500 actual-mtu=1500
+      mac-address=48:8F:5A:00:00:01 last-link-up-time=jan/01/2024 12:00:00
+
+ 1  X name="ether2" default-name="ether2" type="ether" mtu=1500
+      mac-address=48:8F:5A:00:00:02
+"""
+
+AS_VALUE = ".id=*1;address=192.168.88.1/24;comment=lab side;.id=*a;address=10.0.0.5/24;comment=a;b"
+
+TABLE = """\
+Flags: D - DYNAMIC; A - ACTIVE; c - CONNECT, s - STATIC
+Columns: DST-ADDRESS, GATEWAY, DISTANCE
+#     DST-ADDRESS    GATEWAY   DISTANCE
+0  As 0.0.0.0/0      10.0.0.1         1
+  DAc 10.0.0.0/24    ether1           0
+;;; backup
+2   s 10.9.0.0/16                     5
+"""
+
+
+def test_properties():
+    [record] = parse_print(PROPERTIES)
+    assert record["version"] == "7.11 (stable)"
+    assert record["board-name"] == "hAP ac^2"
+    assert record.index is None
+
+
+def test_terse_items_with_comment_and_quotes():
+    records = parse_print(TERSE)
+    assert [record.index for record in records] == [0, 1, 2]
+    assert records[0].comment == "defconf"
+    assert records[0]["interface"] == "bridge"
+    assert records[1].flags == "D"
+    assert records[2]["comment"] == 'lab "b" side'
+    assert records.flag_names["X"] == "disabled"
+    assert records.with_flag("dynamic") == [records[1]]
+
+
+def test_detail_items_wrapped_over_lines():
+    records = parse_print(DETAIL)
+    assert len(records) == 2
+    assert records[0]["name"] == "ether1"
+    assert records[0]["mac-address"] == "48:8F:5A:00:00:01"
+    assert records[0]["last-link-up-time"] == "jan/01/2024 12:00:00"
+    assert records[0].has_flag("R")
+    assert records[1]["mac-address"] == "48:8F:5A:00:00:02"
+
+
+def test_as_value():
+    records = parse_print(AS_VALUE)
+    assert [record["address"] for record in records] == ["192.168.88.1/24", "10.0.0.5/24"]
+    assert [record.index for record in records] == [1, 10]
+    assert [record["comment"] for record in records] == ["lab side", "a;b"]
+
+
+def test_table_with_flags_and_comments():
+    records = parse_print(TABLE)
+    assert records[0] == {"dst-address": "0.0.0.0/0", "gateway": "10.0.0.1", "distance": "1"}
+    assert (records[0].index, records[0].flags) == (0, "As")
+    assert (records[1].index, records[1].flags) == (None, "DAc")
+    assert records[2].comment == "backup"
+    assert (records[2].index, records[2]["gateway"]) == (2, "")
+    assert records.with_flag("active") == records[:2]
+
+
+def test_empty_output():
+    assert parse_print("") == []
+    assert parse_print("Flags: X - disabled\n") == []
+
+
+@fixture
+def connection():
+    devices = LoopbackDevices(responses={"ip address print terse": TERSE.replace("\n", "\r\n")})
+    connection = devices.connect()
+    yield connection
+    connection.close_connection()
+    devices.stop()
+
+
+def test_command_returns_records(connection):
+    tree = compile_commands({"ip": {"address": {"print": None}}, "system": {"identity": {"print": None}}})
+    assert Command(tree, connection).system.identity.print.records() == [{"name": "MikroTik"}]
+    addresses = Command(tree, connection).ip.address.print.records("terse")
+    assert [record["network"] for record in addresses] == ["192.168.88.0", "10.0.0.0", "10.1.0.0"]
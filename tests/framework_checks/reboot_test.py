@@ -0,0 +1,69 @@
+from time import monotonic
+
+from pytest import mark, raises
+
+from src.connectors import SerialConnection, SSHMode
+from src.connectors.exceptions import RebootTimeoutError
+from src.fake_device import FakeSerialDevice, FakeServerFleet, FakeSSHServer, LoopbackDevices, connect
+
+
+@mark.parametrize("mode", [SSHMode.SHELL, SSHMode.EXEC])
+def test_ssh_reboot_follows_the_port_and_logs_in(mode):
+    with FakeSSHServer(shutdown_time=0.3, boot_time=0.5) as server:
+        connection = connect(server, mode=mode)
+        report = connection.reboot(timeout=10)
+        assert server.reboots == 1
+        assert report.down >= 0.3  # not reconnected to the device shutting down
+        assert report.up - report.down >= 0.4 and report.ready >= report.up  # down is noticed by polling
+        assert report.downtime == report.ready - report.down
+        assert connection.send_command("system identity print") == "name: MikroTik"
+        connection.close_connection()
+
+
+def test_ssh_reboot_times_out_when_the_device_is_not_back():
+    with FakeSSHServer(boot_time=60) as server:
+        connection = connect(server)
+        with raises(RebootTimeoutError) as error:
+            connection.reboot(timeout=0.5)
+        assert error.value.phase == "up"
+
+
+@mark.slow
+def test_serial_reboot_watches_the_console():
+    with FakeSerialDevice(boot_time=0.5) as device:
+        connection = SerialConnection(device.port, device.username, device.password)
+        connection.open_connection()
+        report = connection.reboot(timeout=10)
+        assert device.reboots == 1
+        assert report.up - report.down >= 0.4 and report.ready >= report.up
+        assert connection.send_command("system identity print") == "name: MikroTik"
+        connection.close_connection()
+
+
+def test_fleet_reboots_devices_in_parallel():
+    boot_times = {"mikrotik_rb2011u1as": 1.0, "dummy_device": 1.5}
+    servers = {name: FakeSSHServer(boot_time=boot_time) for name, boot_time in boot_times.items()}
+    for server in servers.values():
+        server.start()
+    try:
+        with FakeServerFleet(servers) as fleet:
+            start = monotonic()
+            results = fleet.reboot(timeout=10)
+            elapsed = monotonic() - start
+            assert fleet.send_command("system identity print")["dummy_device"].value == "name: MikroTik"
+    finally:
+        for server in servers.values():
+            server.__exit__()
+
+    assert elapsed < sum(boot_times.values())  # about the slowest device, not the sum
+    for name, boot_time in boot_times.items():
+        assert results[name].ok and results[name].value.downtime >= boot_time - 0.1
+
+
+def test_loopback_device_goes_down_for_good():
+    devices = LoopbackDevices()
+    connection = devices.connect()
+    with raises(RebootTimeoutError) as error:
+        connection.reboot(timeout=2)  # down once the session is closed, never back
+    assert error.value.phase == "up"
+    devices.stop()
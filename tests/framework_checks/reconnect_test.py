@@ -0,0 +1,151 @@
+import re
+import socket
+from collections.abc import Callable
+from threading import Thread
+from time import monotonic
+
+from pytest import mark, raises
+
+from src.connectors import SSHConnection, SSHMode, Validation
+from src.connectors.exceptions import ConnectionClosedError
+from src.fake_device import SocketConnection, connect, create_connection
+
+PROMPT = b"[admin@MikroTik] > "
+
+
+def session(*actions: str) -> Callable[[socket.socket], None]:
+    """Serves one connection, for every command line either
+        - answer: echoes it and answers with the identity
+        - echo_close: echoes it and closes the connection
+        - close: closes the connection
+    """
+    def serve(remote: socket.socket):
+        with remote:
+            for action in actions:
+                line = b""
+                while b"\r\n" not in line:
+                    line += remote.recv(1024)
+                line = line.split(b"\r\n")[0]
+                if action == "close":
+                    return
+                remote.sendall(PROMPT + line + b"\r\n")
+                if action == "echo_close":
+                    return
+                marker = "".join(re.findall(r'"(\w+)"', line.decode())[:2]).encode()
+                remote.sendall(marker + b"\r\n  name: MikroTik\r\n" + marker + b"\r\n" + PROMPT)
+    return serve
+
+
+class ReopenedConnection(SocketConnection):
+    """Socket pair connection, every opening is served by the next session"""
+
+    def __init__(self, *sessions: Callable[[socket.socket], None]):
+        self.sessions = iter(sessions)
+        super().__init__(self._new_socket())
+        self.validation = Validation.NONE
+        self.reconnect_delay = 0.01
+
+    def _new_socket(self) -> socket.socket:
+        local, remote = socket.socketpair()
+        Thread(target=next(self.sessions), args=(remote,), daemon=True).start()
+        return local
+
+    def open_connection(self):
+        if self.sock.fileno() == -1:
+            self.sock = self._new_socket()
+            self.sock.setblocking(False)
+        self.validate_connection()
+
+    def read(self, count: int = 1) -> bytes:
+        try:
+            data = self.sock.recv(count)
+        except BlockingIOError:
+            return b""
+        if not data:
+            raise ConnectionClosedError()
+        return data
+
+
+def count_full_validations(connection: SSHConnection) -> list[str]:
+    validations = []
+    run_test_command = connection._run_test_command
+
+    def counted():
+        validations.append(connection.metrics_label)
+        return run_test_command()
+
+    connection._run_test_command = counted
+    return validations
+
+
+@mark.parametrize("mode", (SSHMode.SHELL, SSHMode.EXEC))
+def test_lost_connection_is_reopened(ssh_server, mode):
+    connection = connect(ssh_server, mode=mode)
+    validations = count_full_validations(connection)
+    assert connection.ping()
+
+    ssh_server.drop_sessions()
+    assert connection.send_command("system identity print") == "name: MikroTik"
+    assert len(connection.reconnect_times) == 1
+    assert validations == []  # the device was validated by the first connection
+    connection.close_connection()
+
+
+def test_unanswered_command_is_sent_again():
+    connection = ReopenedConnection(session("close"), session("answer"))
+    connection.open_connection()
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+    assert len(connection.reconnect_times) == 1
+    connection.close_connection()
+
+
+def test_echoed_command_is_not_sent_again():
+    connection = ReopenedConnection(session("echo_close"), session("answer"))
+    connection.open_connection()
+    with raises(ConnectionClosedError):
+        connection.send_command("system reboot", timeout=2)
+    assert len(connection.reconnect_times) == 1
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+    connection.close_connection()
+
+
+def test_echoed_command_is_retried_if_allowed():
+    connection = ReopenedConnection(session("echo_close"), session("answer"))
+    connection.retry_sent_commands = True
+    connection.open_connection()
+    assert connection.send_command("system identity print", timeout=2) == "name: MikroTik"
+    connection.close_connection()
+
+
+def test_validation_is_cached_per_device(ssh_server):
+    SSHConnection.clear_validation_cache()
+    first = connect(ssh_server)
+    second = create_connection(ssh_server)
+    validations = count_full_validations(second)
+    second.open_connection()
+    assert validations == []
+
+    SSHConnection.clear_validation_cache()
+    third = create_connection(ssh_server)
+    validations = count_full_validations(third)
+    third.open_connection()
+    assert validations == [third.metrics_label]
+
+    fourth = create_connection(ssh_server)
+    fourth.validation = Validation.NONE
+    fourth.open_connection()
+    for connection in (first, second, third, fourth):
+        connection.close_connection()
+
+
+def test_reconnect_gives_up_with_backoff(ssh_server):
+    connection = connect(ssh_server)
+    connection.reconnect_attempts = 4
+    ssh_server.stop()
+    assert not connection.ping()
+
+    start = monotonic()
+    with raises(OSError):
+        connection.send_command("system identity print")
+    assert monotonic() - start < 4 * 0.01 * 2 ** 3 + 1
+    assert connection.reconnect_times == []
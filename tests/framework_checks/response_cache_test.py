@@ -0,0 +1,119 @@
+from time import sleep
+
+from src.connectors import ConnectionPool, ConnectionType
+from src.device_lib.device_fleet import DeviceFleet
+from src.device_lib.device_lib import DeviceLib
+from src.device_lib.response_cache import ResponseCache
+
+DEVICE_NAME = "dummy_device"
+
+
+class CountingConnection:
+    def __init__(self):
+        self.sent = []
+
+    def is_alive(self) -> bool:
+        return True
+
+    def send_command(self, command: str, timeout: float = 15) -> str:
+        self.sent.append(command)
+        return f"response {len(self.sent)}"
+
+    def send_commands(self, commands: list[str], timeout: float, pipeline_depth: int | None = None) -> list[str]:
+        return [self.send_command(command) for command in commands]
+
+
+def create_lib(cache: ResponseCache | None) -> tuple[DeviceLib, CountingConnection]:
+    connection = CountingConnection()
+    pool = ConnectionPool()
+    pool.release((DEVICE_NAME, ConnectionType.SSH), connection)
+    return DeviceLib(ConnectionType.SSH, DEVICE_NAME, pool, cache), connection
+
+
+def test_cacheable_command_reuses_response():
+    cache = ResponseCache(ttl=60)
+    lib, connection = create_lib(cache)
+
+    first = lib.system.identity.print()
+    assert lib.system.identity.print() == first
+    lib.system.clock.print()
+    assert lib.system.identity.print() == first
+    assert len(connection.sent) == 2
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+
+def test_clock_is_never_cached():
+    cache = ResponseCache(ttl=60)
+    lib, connection = create_lib(cache)
+    assert lib.system.clock.print() != lib.system.clock.print()
+    assert len(connection.sent) == 2
+
+
+def test_mutating_command_invalidates_device():
+    cache = ResponseCache(ttl=60)
+    lib, connection = create_lib(cache)
+    cache.put("other_device", "system identity print", "other")
+
+    first = lib.system.identity.print()
+    lib.send_commands(["ip address add address=10.0.0.1/24 interface=ether1"])
+    assert lib.system.identity.print() != first
+    assert cache.get("other_device", "system identity print") == "other"
+
+
+def test_no_cache_by_default():
+    lib, connection = create_lib(None)
+    lib.system.identity.print()
+    lib.system.identity.print()
+    assert len(connection.sent) == 2
+
+
+def test_cache_expiry_and_size_limit():
+    cache = ResponseCache(ttl=0.1, max_size=2)
+    cache.put(DEVICE_NAME, "a", "1")
+    cache.put(DEVICE_NAME, "b", "2")
+    cache.get(DEVICE_NAME, "a")
+    cache.put(DEVICE_NAME, "c", "3")
+    assert cache.get(DEVICE_NAME, "b") is None  # the least recently used
+    assert cache.get(DEVICE_NAME, "a") == "1"
+    sleep(0.15)
+    assert cache.get(DEVICE_NAME, "c") is None
+    assert cache.stats.evictions == 1
+
+
+def test_mutating_commands():
+    assert ResponseCache.is_mutating("/system reboot")
+    assert ResponseCache.is_mutating("ip address set 0 comment=test")
+    assert ResponseCache.is_mutating(":put 1; /interface disable ether2")
+    assert ResponseCache.is_mutating("ip dhcp-client release 0")
+    assert ResponseCache.is_mutating("system backup save name=x")
+    assert ResponseCache.is_mutating("interface ethernet reset-counters")
+    assert ResponseCache.is_mutating("system package update install")
+    assert ResponseCache.is_mutating("certificate sign x")
+    assert ResponseCache.is_mutating("tool fetch url=x")
+    assert ResponseCache.is_mutating("export file=backup")
+    assert ResponseCache.is_mutating("interface monitor-traffic ether1")
+    assert ResponseCache.is_mutating("/ip address set [find] disabled=yes")
+    assert not ResponseCache.is_mutating("ip address print where comment=set")
+    assert not ResponseCache.is_mutating("system identity print")
+    assert not ResponseCache.is_mutating("export verbose")
+    assert not ResponseCache.is_mutating("interface monitor-traffic ether1 once")
+    assert not ResponseCache.is_mutating("/ip address get [find address=10.0.0.1/24] comment")
+
+
+def test_cacheable_command_with_file_is_not_cached():
+    cache = ResponseCache(ttl=60)
+    lib, connection = create_lib(cache)
+    lib.system.identity.print()
+    lib.system.identity.print("file=identity")
+    lib.system.identity.print()
+    assert len(connection.sent) == 3
+
+
+def test_fleet_send_invalidates_cache():
+    cache = ResponseCache(ttl=60)
+    lib, connection = create_lib(cache)
+    first = lib.system.identity.print()
+    fleet = DeviceFleet(ConnectionType.SSH, [DEVICE_NAME], response_cache=cache)
+    fleet.libs[DEVICE_NAME] = lib
+    fleet.send_command("system identity set name=router")
+    assert lib.system.identity.print() != first
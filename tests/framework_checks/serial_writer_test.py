@@ -0,0 +1,126 @@
+import os
+from threading import Thread
+from time import monotonic, sleep
+
+import serial
+from pytest import approx, fixture
+
+from src.connectors import SerialConnection
+from src.connectors import serial_connection
+
+
+@fixture
+def pty_serial():
+    """Serial connection to a pseudo-terminal, the other end is drained"""
+    controller, terminal = os.openpty()
+    received = bytearray()
+
+    def drain():
+        try:
+            while data := os.read(controller, 65536):
+                received.extend(data)
+        except OSError:
+            pass  # the terminal end is closed
+
+    connection = SerialConnection(os.ttyname(terminal), "admin")
+    connection.connection.open()
+    Thread(target=drain, daemon=True).start()
+    yield connection, received
+    connection.connection.close()
+    os.close(terminal)
+    os.close(controller)
+
+
+def test_lines_are_written_without_per_write_delay(pty_serial):
+    connection, received = pty_serial
+    lines = [f"/ip address add address=10.0.0.{index}/32 interface=lo" for index in range(200)]
+    start = monotonic()
+    for line in lines:
+        connection.writeln(line)
+    assert monotonic() - start < 1
+
+    throughput, efficiency = connection.write_throughput()
+    assert connection.bytes_written == sum(len(line) + 2 for line in lines)
+    assert throughput > 0 and efficiency > 0
+
+
+def test_coalesced_lines_are_written_in_order(pty_serial):
+    connection, received = pty_serial
+    lines = [f"line {index}" for index in range(100)]
+    connection.write_lines(lines)
+    max_time = monotonic() + 2
+    while len(received) < connection.bytes_written and monotonic() < max_time:
+        sleep(0.01)
+    assert bytes(received).replace(b"\r", b"").split(b"\n")[:100] == [line.encode() for line in lines]
+
+
+class FakeLine:
+    """Serial port transmitting the queued bytes at the line rate of a fake
+    clock, which advances only on sleeps
+    """
+
+    port = "fake"
+    is_open = rtscts = xonxoff = False
+    baudrate, bytesize, stopbits, parity = 9600, serial.EIGHTBITS, serial.STOPBITS_ONE, serial.PARITY_NONE
+    rate = 960  # bytes per second of 9600 8N1
+
+    def __init__(self):
+        self.now = 0.0
+        self.out_waiting = 0
+        self.sleeps = []
+
+    def write(self, data: bytes):
+        self.out_waiting += len(data)
+
+    def close(self):
+        pass
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        self.out_waiting = max(0, self.out_waiting - round(seconds * self.rate))
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_writes_are_paced_and_timed_until_sent(monkeypatch):
+    line = FakeLine()
+    monkeypatch.setattr(serial_connection, "sleep", line.sleep)
+    monkeypatch.setattr(serial_connection, "monotonic", line.monotonic)
+    connection = SerialConnection("fake", "admin", write_chunk_size=256)
+    connection.connection = line
+
+    connection.write("x" * 1000)
+    assert line.sleeps == approx([256 / line.rate] * 3 + [232 / line.rate])
+    assert line.out_waiting == 0
+    throughput, efficiency = connection.write_throughput()
+    assert throughput == approx(line.rate) and efficiency == approx(1)
+
+
+def test_lines_wait_for_the_echo_of_the_previous_line():
+    controller, terminal = os.openpty()
+    lines = [f"/system script add name=script{index}" for index in range(3)]
+    events = []
+
+    def echo():
+        received = b""
+        while len(events) < 2 * len(lines):
+            received += os.read(controller, 1024)
+            *complete, received = received.split(b"\r\n")
+            events.extend(("received", line) for line in complete)
+            for line in complete:
+                sleep(0.1)
+                os.write(controller, line + b"\r\n")
+                events.append(("echoed", line))
+
+    connection = SerialConnection(os.ttyname(terminal), "admin")
+    connection.connection.open()
+    Thread(target=echo, daemon=True).start()
+    try:
+        connection.write_lines(lines, wait_for_echo=True, timeout=2)
+    finally:
+        connection.connection.close()
+        os.close(terminal)
+        os.close(controller)
+    assert events == [(event, line.encode()) for line in lines for event in ("received", "echoed")]
@@ -5,11 +5,11 @@ from src.device_lib.device_lib import DeviceLib
 
 
 @fixture(scope="function", autouse=True)
-def device_lib(request, device_name):
+def device_lib(request, device_name, connection_pool):
     connection_type = request.node.callspec.params.get("connection_type_under_test")
-    device_lib = DeviceLib(connection_type, device_name)
+    device_lib = DeviceLib(connection_type, device_name, connection_pool)
     yield device_lib
-    device_lib.connection.close_connection()
+    device_lib.close()
 
 
 @mark.parametrize(
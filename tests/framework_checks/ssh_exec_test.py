@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+
+from pytest import fixture, raises
+
+from src.connectors import SSHMode, SyncMode
+from src.connectors.exceptions import ReadTimeoutError
+from src.fake_device import connect
+
+
+def slow_response(command: str) -> str:
+    sleep(2)
+    return "done\r\n"
+
+
+@fixture
+def ssh_server_options() -> dict:
+    return {"latency": 0.2, "responses": {"slow": slow_response}}
+
+
+@fixture
+def connection(ssh_server):
+    connection = connect(ssh_server, mode=SSHMode.EXEC)
+    yield connection
+    connection.close_connection()
+
+
+def test_exec_commands_run_concurrently(connection):
+    start = monotonic()
+    with ThreadPoolExecutor(8) as executor:
+        responses = list(executor.map(connection.send_command, ["system identity print"] * 8))
+    assert responses == ["name: MikroTik"] * 8
+    assert monotonic() - start < 0.2 * 4  # not one after another
+
+
+def test_exec_command_times_out(connection):
+    start = monotonic()
+    with raises(ReadTimeoutError):
+        connection.send_command("slow", timeout=0.5)
+    assert monotonic() - start < 1.5
+    assert connection.send_command("system identity print") == "name: MikroTik"
+
+
+def test_shell_options_are_rejected_in_exec_mode(connection):
+    with raises(ValueError):
+        connection.send_command("system identity print", sync_mode=SyncMode.QUIET_PERIOD)
+    assert connection.send_commands(["beep", "system identity print"], pipeline_depth=1) == ["", "name: MikroTik"]
+
+
+def test_sent_flag_of_the_reconnect_is_per_thread(connection):
+    connection._response_started = True  # a command of this thread was sent
+    with ThreadPoolExecutor(1) as executor:
+        assert executor.submit(lambda: connection._response_started).result() is False
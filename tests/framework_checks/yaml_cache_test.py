@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import fixture
+
+from config import FrameworkPaths, yaml_cache
+from config.yaml_cache import load_yaml
+
+
+@fixture
+def parse_count(monkeypatch):
+    calls = []
+    parse_yaml = yaml_cache.parse_yaml
+    monkeypatch.setattr(yaml_cache, "parse_yaml", lambda content: calls.append(content) or parse_yaml(content))
+    return calls
+
+
+@fixture
+def yaml_file(tmp_path):
+    path = tmp_path / "devices.yaml"
+    path.write_text("router:\n  ip: 10.0.0.1\n")
+    return path
+
+
+def test_unchanged_file_is_parsed_once(yaml_file, tmp_path, parse_count):
+    cache_dir = tmp_path / "cache"
+    assert load_yaml(yaml_file, cache_dir) == {"router": {"ip": "10.0.0.1"}}
+    assert load_yaml(yaml_file, cache_dir) == {"router": {"ip": "10.0.0.1"}}
+    assert len(parse_count) == 1
+
+
+def test_changed_file_is_parsed_again(yaml_file, tmp_path, parse_count):
+    cache_dir = tmp_path / "cache"
+    load_yaml(yaml_file, cache_dir)
+    yaml_file.write_text("router:\n  ip: 10.0.0.2\n")
+    assert load_yaml(yaml_file, cache_dir) == {"router": {"ip": "10.0.0.2"}}
+
+    stat = yaml_file.stat()
+    os.utime(yaml_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))  # touched, same content
+    assert load_yaml(yaml_file, cache_dir) == {"router": {"ip": "10.0.0.2"}}
+    assert len(parse_count) == 2
+
+
+def test_broken_cache_is_ignored(yaml_file, tmp_path):
+    cache_dir = tmp_path / "cache"
+    load_yaml(yaml_file, cache_dir)
+    for cache_file in cache_dir.iterdir():
+        cache_file.write_bytes(b"garbage")
+    assert load_yaml(yaml_file, cache_dir) == {"router": {"ip": "10.0.0.1"}}
+
+
+def test_concurrent_workers(yaml_file, tmp_path):
+    cache_dir = tmp_path / "cache"
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda _: load_yaml(yaml_file, cache_dir), range(32)))
+    assert all(result == {"router": {"ip": "10.0.0.1"}} for result in results)
+    assert len(list(cache_dir.iterdir())) == 1  # no temporary files left
+
+
+def test_default_cache_dir_is_read_at_call_time(yaml_file, tmp_path, monkeypatch, parse_count):
+    monkeypatch.setattr(FrameworkPaths, "CACHE_DIR", tmp_path / "cache")
+    load_yaml(yaml_file)
+    load_yaml(yaml_file, use_cache=False)
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    assert len(parse_count) == 2